@@ -0,0 +1,77 @@
+"""Benchmarking puzzle solutions with repeated runs: warmup, adaptive sampling, and outlier rejection."""
+
+from dataclasses import dataclass
+from typing import Any, NamedTuple, Optional
+
+from aoctool.history import RunRecord
+from aoctool.stats import Summary, reject_outliers, summarize
+from aoctool.utils import flatten_dict
+
+
+# name of the metric used to decide when enough runs have been made: the sum of the phase timings reported by the main program
+# (which excludes process startup), or the wall time of the process if no timings were reported
+TOTAL_METRIC = 'total'
+
+
+@dataclass
+class BenchmarkConfig:
+    """Settings for benchmarking a puzzle solution.
+    After some warmup runs (whose measurements are discarded), runs are repeated until the confidence interval for the median total time is narrow enough, or the time budget or maximum number of runs is exhausted."""
+    warmup: int = 1                       # number of warmup runs
+    min_runs: int = 5                     # minimum number of measured runs
+    max_runs: int = 100                   # maximum number of measured runs
+    max_time: float = 10.0                # time budget for the measured runs (seconds)
+    target_ci: float = 0.02               # target half-width of the confidence interval for the median, relative to the median
+    confidence: float = 0.95              # confidence level of the interval
+    outlier_k: Optional[float] = 1.5      # outliers are beyond this many interquartile ranges from the quartiles (None to keep all runs)
+    affinity: Optional[list[int]] = None  # CPUs to pin the runs to
+
+    def __post_init__(self) -> None:
+        if (self.warmup < 0) or (self.min_runs < 1) or (self.max_runs < self.min_runs):
+            raise ValueError('Invalid number of runs (need warmup >= 0 and 1 <= min_runs <= max_runs)')
+
+
+def get_benchmark_metrics(run_info: dict[str, Any]) -> dict[str, float]:
+    """Gets the timing metrics (in seconds) of a run from its run info: the time of each phase, the total, and the process's wall time."""
+    flat = flatten_dict(run_info)
+    metrics = {key: float(val) for (key, val) in flat.items() if key.startswith('timings.') and isinstance(val, int | float)}
+    wall_time = flat.get('resources.wall_time')
+    if (wall_time is not None):
+        metrics['resources.wall_time'] = float(wall_time)
+    if metrics:
+        phase_times = [val for (key, val) in metrics.items() if key.startswith('timings.')]
+        metrics[TOTAL_METRIC] = sum(phase_times) if phase_times else metrics['resources.wall_time']
+    return metrics
+
+def format_metric(name: str, val: float) -> str:
+    """Formats the value of a metric for display, with units appropriate to the kind of metric (memory or time)."""
+    if name.endswith('max_rss'):
+        return f'{val / (1 << 20):.1f} MiB'
+    if name.startswith('timings.') or name.endswith('_time') or (name == TOTAL_METRIC):
+        (unit, scale) = next(((unit, scale) for (unit, scale) in [('s', 1.0), ('ms', 1e-3)] if (val >= scale)), ('µs', 1e-6))
+        return f'{val / scale:.3f} {unit}'
+    return f'{val:g}'
+
+def summarize_metrics(samples: list[dict[str, float]], config: BenchmarkConfig) -> dict[str, Summary]:
+    """Summarizes each metric over a list of runs' metrics, after rejecting outliers (separately for each metric)."""
+    names = dict.fromkeys(name for metrics in samples for name in metrics)  # preserves order
+    summaries = {}
+    for name in names:
+        values = [metrics[name] for metrics in samples if (name in metrics)]
+        if (config.outlier_k is not None):
+            values = reject_outliers(values, config.outlier_k)
+        summaries[name] = summarize(values, config.confidence)
+    return summaries
+
+
+class BenchmarkResult(NamedTuple):
+    """Result of benchmarking a puzzle solution."""
+    part: int
+    solution: Optional[int]
+    records: list[RunRecord]       # record of each measured run
+    summaries: dict[str, Summary]  # summary of each metric (after rejecting outliers)
+    converged: bool                # whether the target confidence interval width was attained
+
+    @property
+    def num_runs(self) -> int:
+        return len(self.records)
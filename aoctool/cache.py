@@ -0,0 +1,179 @@
+"""Local caches used to avoid redundant work."""
+
+from dataclasses import dataclass
+import fcntl
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import threading
+import time
+from typing import Any, Iterable, NamedTuple, Optional
+
+from aoctool.utils import AnyPath, Part
+
+
+# time (seconds) for which the cached state of a puzzle whose first part has not been answered is trusted before it is checked against the AoC server
+PUZZLE_STATE_TTL = 900.0
+
+
+def hash_files(paths: Iterable[Path], root: Path, extra: Iterable[str] = ()) -> str:
+    """Computes a SHA-256 hash of the names (relative to a root directory, which need not contain them) and contents of some files, along with some extra strings."""
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(os.path.relpath(path, root).encode() + b'\0')
+        h.update(hashlib.sha256(path.read_bytes()).digest())
+    for s in extra:
+        h.update(s.encode() + b'\0')
+    return h.hexdigest()
+
+def hash_file(path: AnyPath) -> str:
+    """Computes a SHA-256 hash of a file's contents."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+@dataclass
+class BuildCache:
+    """Cache of build artifacts (e.g. executables), indexed by a key computed from the build inputs.
+    Artifacts are stored by the hash of their contents, so identical artifacts are only stored once."""
+    cache_dir: Path
+
+    @property
+    def index_dir(self) -> Path:
+        """Directory of files mapping each build key to an artifact hash."""
+        return self.cache_dir / 'builds'
+
+    @property
+    def artifact_dir(self) -> Path:
+        """Directory of content-addressed artifacts."""
+        return self.cache_dir / 'artifacts'
+
+    def get_artifact_path(self, key: str) -> Optional[Path]:
+        """Gets the path to the cached artifact for a build key, if it exists."""
+        index_path = self.index_dir / key
+        if index_path.exists():
+            artifact_path = self.artifact_dir / index_path.read_text().strip()
+            if artifact_path.exists():
+                return artifact_path
+        return None
+
+    def put(self, key: str, path: Path) -> Path:
+        """Stores an artifact in the cache under the given build key.
+        Returns the path to the stored artifact."""
+        artifact_hash = hash_file(path)
+        artifact_path = self.artifact_dir / artifact_hash
+        if (not artifact_path.exists()):
+            self.artifact_dir.mkdir(parents = True, exist_ok = True)
+            # copy then rename, so concurrent readers never see a partial file
+            tmp_path = artifact_path.with_name(f'.{artifact_hash}.{os.getpid()}')
+            shutil.copy2(path, tmp_path)
+            tmp_path.replace(artifact_path)
+        self.index_dir.mkdir(parents = True, exist_ok = True)
+        (self.index_dir / key).write_text(artifact_hash)
+        return artifact_path
+
+    def restore(self, key: str, dest_path: Path) -> bool:
+        """Copies the cached artifact for a build key to the destination path.
+        Returns True if the artifact was found."""
+        artifact_path = self.get_artifact_path(key)
+        if (artifact_path is None):
+            return False
+        dest_path.parent.mkdir(parents = True, exist_ok = True)
+        tmp_path = dest_path.with_name(f'.{dest_path.name}.{os.getpid()}')
+        shutil.copy2(artifact_path, tmp_path)
+        tmp_path.replace(dest_path)
+        return True
+
+
+class CachedAnswer(NamedTuple):
+    """Answer to a puzzle part, as stored in the answer cache."""
+    solution: int
+    wall_time: Optional[float] = None  # time taken by the run which computed the answer (seconds)
+
+
+@dataclass
+class AnswerCache:
+    """Cache of puzzle answers, indexed by a key computed from the executable, the input data, and the puzzle part."""
+    cache_dir: Path
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        """Gets the cached answer for a key, if it exists."""
+        try:
+            with open(self.cache_dir / f'{key}.json') as f:
+                return CachedAnswer(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def put(self, key: str, answer: CachedAnswer) -> None:
+        """Stores an answer in the cache under the given key."""
+        self.cache_dir.mkdir(parents = True, exist_ok = True)
+        path = self.cache_dir / f'{key}.json'
+        # write then rename, so concurrent readers never see a partial file
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}')
+        with open(tmp_path, 'w') as f:
+            json.dump(answer._asdict(), f)
+        tmp_path.replace(path)
+
+
+def get_user_cache_dir() -> Path:
+    """Gets the directory of caches shared by all puzzle output directories (respecting XDG_CACHE_HOME)."""
+    return Path(os.environ.get('XDG_CACHE_HOME') or (Path.home() / '.cache')) / 'aoctool'
+
+def get_puzzle_state_key(token: str, year: int, day: int) -> str:
+    """Gets the key of a puzzle's state in the puzzle state cache.
+    Users are identified by a hash of their session token, so the token itself is not stored."""
+    user = hashlib.sha256(token.encode()).hexdigest()[:16]
+    return f'{user}/{year}/{day:02d}'
+
+
+class PuzzleState(NamedTuple):
+    """State of a puzzle for some user, as stored in the puzzle state cache."""
+    answers: dict[str, str]  # correct answers to the solved parts, keyed by part number
+    updated: float           # time the state was last checked against the AoC server (seconds since the epoch)
+
+    @property
+    def current_part(self) -> Part:
+        return 2 if ('1' in self.answers) else 1
+
+    def is_fresh(self, ttl: float = PUZZLE_STATE_TTL) -> bool:
+        """Returns True if the state can be used without checking it against the AoC server.
+        Once the first part is answered the current part can no longer change, so the state never expires."""
+        return ('1' in self.answers) or (time.time() - self.updated < ttl)
+
+
+@dataclass
+class PuzzleStateCache:
+    """Cache of the answered parts of puzzles, so that the current part of a puzzle can be determined without a request to the AoC server.
+    States are stored in a single JSON file mapping keys (see get_puzzle_state_key) to states."""
+    path: Path
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Optional[PuzzleState]:
+        """Gets the cached state for a key, if it exists."""
+        try:
+            return PuzzleState(**self._load()[key])
+        except (KeyError, TypeError):
+            return None
+
+    def put(self, key: str, state: PuzzleState) -> None:
+        """Stores a puzzle's state in the cache under the given key."""
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        # the file lock keeps concurrent writers (in other threads or processes) from losing each other's updates
+        with open(self.path.with_name(self.path.name + '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            data = self._load()
+            data[key] = state._asdict()
+            # write then rename, so concurrent readers never see a partial file
+            tmp_path = self.path.with_name(f'.{self.path.name}.{os.getpid()}.{threading.get_ident()}')
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent = 4, sort_keys = True)
+            tmp_path.replace(self.path)
@@ -0,0 +1,193 @@
+"""Benchmarks solutions over repeated runs, and tests the measurements for regressions against a baseline from the run history, or compares them across languages."""
+
+from argparse import ArgumentParser, Namespace
+from collections import Counter
+from dataclasses import replace
+from fnmatch import fnmatch
+from pathlib import Path
+from statistics import median
+import sys
+from typing import Any, NamedTuple, Optional
+
+from aoctool.benchmark import BenchmarkConfig, BenchmarkResult, format_metric, get_benchmark_metrics
+from aoctool.drivers import aoc_builder_from_args, get_driver
+from aoctool.history import RunRecord, get_git_revision, get_host_info, new_session_id
+from aoctool.stats import mann_whitney_u
+from aoctool.utils import log, parse_languages, parser_config
+
+
+# metrics compared by default (as patterns matched against the dot-separated metric names)
+DEFAULT_METRICS = ['timings.*', 'resources.wall_time', 'resources.max_rss']
+
+# minimum number of baseline runs to test against (with fewer, a Mann-Whitney U test can hardly ever be significant)
+MIN_BASELINE_RUNS = 5
+
+
+class MetricComparison(NamedTuple):
+    """Comparison of a metric between baseline runs and current runs."""
+    metric: str
+    baseline_median: float
+    current_median: float
+    change: float     # relative change in the median
+    p_value: float    # p-value of a one-sided test that the current values tend to be greater
+    regression: bool  # whether the increase is both statistically significant and larger than the threshold
+
+
+class LanguageComparison(NamedTuple):
+    """Comparison of a metric between a language's runs and those of a reference language."""
+    metric: str
+    language: str
+    ratio: float    # ratio of the language's median to the reference language's median
+    p_value: float  # p-value of a two-sided test that the values differ
+
+
+def select_baseline(records: list[RunRecord], spec: str, session: str, scaffold_dir: Path, host: Optional[dict[str, Any]] = None, min_runs: int = MIN_BASELINE_RUNS) -> list[RunRecord]:
+    """Given the chronological records of a puzzle solution's runs, selects the ones to use as a baseline, excluding the current session.
+    If host info is given, runs on other machines are also excluded, since their measurements are not comparable.
+    The spec is one of:
+        - 'last': the most recent session with at least min_runs runs (e.g. from the bench command), or failing that, the most recent min_runs runs (e.g. single runs from run --profile)
+        - 'tag:<name>': all runs with the given tag
+        - 'rev:<revision>': all runs made at the given git revision (of the repository containing the scaffold)"""
+    others = [record for record in records if (record.session != session) and ((host is None) or (record.host == host))]
+    (kind, sep, val) = spec.partition(':')
+    if (spec == 'last'):
+        session_sizes = Counter(record.session for record in others)
+        for record in reversed(others):
+            if (session_sizes[record.session] >= min_runs):
+                return [other for other in others if (other.session == record.session)]
+        return others[-min_runs:]
+    if (kind == 'tag') and sep:
+        return [record for record in others if (record.tag == val)]
+    if (kind == 'rev') and sep:
+        rev = get_git_revision(scaffold_dir, val) or val
+        return [record for record in others if (record.git_revision is not None) and record.git_revision.startswith(rev)]
+    raise ValueError(f'Invalid baseline {spec!r} (expected last, tag:<name>, or rev:<revision>)')
+
+def compare_metrics(baseline: list[RunRecord], current: list[RunRecord], patterns: list[str], alpha: float = 0.05, threshold: float = 0.0) -> list[MetricComparison]:
+    """Compares metrics (those whose names match any of the given patterns) between baseline runs and current runs.
+    An increase in a metric is flagged as a regression if a Mann-Whitney U test is significant at level alpha, and the median increases by more than the threshold (a fraction)."""
+    baseline_metrics = [record.metrics for record in baseline]
+    current_metrics = [record.metrics for record in current]
+    names = {name for metrics in current_metrics for name in metrics if any(fnmatch(name, pattern) for pattern in patterns)}
+    comparisons = []
+    for name in sorted(names):
+        xs = [metrics[name] for metrics in current_metrics if (name in metrics)]
+        ys = [metrics[name] for metrics in baseline_metrics if (name in metrics)]
+        if (not ys):
+            continue
+        (current_median, baseline_median) = (median(xs), median(ys))
+        change = (current_median - baseline_median) / baseline_median if (baseline_median != 0) else 0.0
+        p_value = mann_whitney_u(xs, ys, alternative = 'greater').p_value
+        comparisons.append(MetricComparison(name, baseline_median, current_median, change, p_value, (p_value < alpha) and (change > threshold)))
+    return comparisons
+
+def compare_languages(results: dict[str, BenchmarkResult], metrics: list[str]) -> list[LanguageComparison]:
+    """Compares the benchmark results (for a single part of a puzzle) of each language against those of the first language.
+    For each metric, computes the ratio of the medians and the p-value of a two-sided Mann-Whitney U test."""
+    (ref_language, *languages) = list(results)
+    ref_result = results[ref_language]
+    comparisons = []
+    for metric in metrics:
+        if (metric not in ref_result.summaries):
+            continue
+        ref_values = [val for record in ref_result.records if ((val := get_benchmark_metrics(record.run_info).get(metric)) is not None)]
+        for language in languages:
+            result = results[language]
+            if (metric not in result.summaries):
+                continue
+            values = [val for record in result.records if ((val := get_benchmark_metrics(record.run_info).get(metric)) is not None)]
+            ref_median = ref_result.summaries[metric].median
+            ratio = result.summaries[metric].median / ref_median if (ref_median != 0) else float('nan')
+            comparisons.append(LanguageComparison(metric, language, ratio, mann_whitney_u(values, ref_values).p_value))
+    return comparisons
+
+def print_comparisons(comparisons: list[MetricComparison]) -> None:
+    width = max([len('metric')] + [len(comp.metric) for comp in comparisons])
+    print(f'{"metric":<{width}}  {"baseline":>12}  {"current":>12}  {"change":>8}  {"p-value":>8}')
+    for comp in comparisons:
+        flag = '  SLOWER' if comp.regression else ''
+        print(f'{comp.metric:<{width}}  {format_metric(comp.metric, comp.baseline_median):>12}  {format_metric(comp.metric, comp.current_median):>12}  {comp.change:>+8.1%}  {comp.p_value:>8.4f}{flag}')
+
+def print_summaries(result: BenchmarkResult) -> None:
+    width = max([len('metric')] + [len(name) for name in result.summaries])
+    print(f'{"metric":<{width}}  {"n":>4}  {"min":>12}  {"median":>12}  {"mean":>12}  {"stddev":>12}  {"CI (median)":>27}')
+    for (name, summ) in result.summaries.items():
+        ci = f'[{format_metric(name, summ.ci_low)}, {format_metric(name, summ.ci_high)}]'
+        print(f'{name:<{width}}  {summ.n:>4}  {format_metric(name, summ.minimum):>12}  {format_metric(name, summ.median):>12}  {format_metric(name, summ.mean):>12}  {format_metric(name, summ.stddev):>12}  {ci:>27}')
+
+def print_language_comparisons(ref_language: str, comparisons: list[LanguageComparison]) -> None:
+    width = max([len('metric')] + [len(comp.metric) for comp in comparisons])
+    lang_width = max([len('language')] + [len(comp.language) for comp in comparisons])
+    print(f'{"metric":<{width}}  {"language":<{lang_width}}  {f"vs. {ref_language}":>12}  {"p-value":>8}')
+    for comp in comparisons:
+        print(f'{comp.metric:<{width}}  {comp.language:<{lang_width}}  {comp.ratio:>11.3f}x  {comp.p_value:>8.4f}')
+
+
+def configure_parser(parser: ArgumentParser) -> None:
+    parser_config['date'](parser)
+    parser.add_argument('-l', '--language', type = parse_languages, required = True, help = 'comma-separated language(s) to benchmark (the first is the reference for comparing languages)')
+    parser_config['session'](parser)
+    parser_config['output_dir'](parser)
+    parser_config['variant'](parser)
+    parser_config['limits'](parser)
+    parser.add_argument('--part', type = int, nargs = '+', choices = (1, 2), default = [1, 2], help = 'which part(s) of the puzzle to run')
+    parser.add_argument('--warmup', type = int, default = 1, help = 'number of warmup runs (not measured)')
+    parser.add_argument('--min-runs', type = int, default = 5, help = 'minimum number of measured runs of each part')
+    parser.add_argument('-n', '--max-runs', type = int, default = 30, help = 'maximum number of measured runs of each part')
+    parser.add_argument('--max-time', type = float, default = 10.0, help = 'time budget (seconds) for the measured runs of each part')
+    parser.add_argument('--target-ci', type = float, default = 0.02, help = 'stop once the confidence interval for the median total time is within this fraction of the median')
+    parser.add_argument('--keep-outliers', action = 'store_true', help = 'do not reject outliers when summarizing runs')
+    parser.add_argument('--tag', help = 'tag to label the runs with in the history (so they can be used as a baseline later)')
+    parser.add_argument('--compare', default = 'last', metavar = 'BASELINE', help = "baseline to compare against: 'last' (most recent session), 'tag:<name>', or 'rev:<git revision>'")
+    parser.add_argument('--metric', nargs = '+', default = DEFAULT_METRICS, help = 'metrics to compare (patterns matching dot-separated names)')
+    parser.add_argument('--alpha', type = float, default = 0.05, help = 'significance level for detecting slowdowns')
+    parser.add_argument('--threshold', type = float, default = 0.02, help = 'minimum relative increase in the median to flag as a slowdown')
+
+def run(args: Namespace) -> None:
+    (ref_language, *_) = args.language
+    ref_builder = aoc_builder_from_args(Namespace(**{**vars(args), 'language': ref_language}))
+    builders = [replace(ref_builder, driver = get_driver(language, args.variant)) for language in args.language]
+    config = BenchmarkConfig(
+        warmup = args.warmup,
+        min_runs = args.min_runs,
+        max_runs = args.max_runs,
+        max_time = args.max_time,
+        target_ci = args.target_ci,
+        outlier_k = None if args.keep_outliers else 1.5,
+        affinity = args.affinity,
+    )
+    session = new_session_id()
+    host = get_host_info()
+    num_regressions = 0
+    for part in args.part:
+        results: dict[str, BenchmarkResult] = {}
+        for builder in builders:
+            language = builder.driver.language
+            builder.do_compile()
+            try:
+                result = builder.do_benchmark(part = part, config = config, session = session, tag = args.tag)
+            except RuntimeError as e:
+                log(f'{e}, skipping it ({language})')
+                continue
+            results[language] = result
+            status = 'converged' if result.converged else 'did not converge'
+            print(f'\nPart {part} ({language}): solution {result.solution}, {result.num_runs} run(s), {status}')
+            print_summaries(result)
+            records = builder.history.get_records(builder.puzzle.year, builder.puzzle.day, language, builder.driver.variant, part)
+            baseline = select_baseline(records, args.compare, session, builder.scaffold_dir, host = host)
+            print(f'\nComparison with {len(baseline)} baseline run(s) ({args.compare})')
+            if (not baseline):
+                print('No baseline runs (on this host) to compare against')
+                continue
+            if (len(baseline) < MIN_BASELINE_RUNS):
+                log(f'Warning: only {len(baseline)} baseline run(s), too few for a slowdown to be detected as significant (benchmark the baseline with at least {MIN_BASELINE_RUNS} runs)')
+            comparisons = compare_metrics(baseline, result.records, args.metric, alpha = args.alpha, threshold = args.threshold)
+            print_comparisons(comparisons)
+            num_regressions += sum(comp.regression for comp in comparisons)
+        if (len(results) > 1):
+            (ref_result, *_) = results.values()
+            print(f'\nPart {part}: comparison of languages')
+            print_language_comparisons(next(iter(results)), compare_languages(results, list(ref_result.summaries)))
+    if (num_regressions > 0):
+        log(f'Detected {num_regressions} significant slowdown(s)')
+        sys.exit(1)
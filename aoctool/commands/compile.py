@@ -1,4 +1,4 @@
-"""Compile a source file to an executable for a particular programming language."""
+"""Compiles a scaffolded solution, reusing the previous build when nothing it depends on has changed."""
 
 from argparse import ArgumentParser, Namespace
 
@@ -10,7 +10,9 @@ def configure_parser(parser: ArgumentParser) -> None:
     parser_config['date'](parser)
     parser_config['language'](parser)
     parser_config['output_dir'](parser)
+    parser_config['variant'](parser)
+    parser.add_argument('--no-cache', action = 'store_true', help = 'always recompile, even if the build inputs are unchanged')
 
 def run(args: Namespace) -> None:
     builder = aoc_builder_from_args(args)
-    builder.do_compile()
+    builder.do_compile(use_cache = not args.no_cache)
@@ -1,16 +1,45 @@
-"""Download data from Advent of Code website."""
+"""Downloads puzzle inputs and descriptions, either for a single puzzle or in bulk over a range of years and days."""
 
 from argparse import ArgumentParser, Namespace
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.client import HTTPConnection, HTTPException, HTTPResponse, HTTPSConnection
+import json
 from pathlib import Path
+import queue
 import shutil
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Literal
+from urllib.parse import urlsplit
 
-from aoctool.utils import Part, Puzzle, log, make_directory, parser_config
+from aoctool.cache import hash_file
+from aoctool.utils import Part, get_default_session_cookie, log, make_directory, parse_days, parse_years, parser_config
+
+
+if TYPE_CHECKING:
+    from aoctool.puzzle import Puzzle
+
+
+AOC_URL = 'https://adventofcode.com'
+USER_AGENT = 'github.com/jeremander/aoc-tool by jeremys@nessiness.com'
+
+# name of the file in each puzzle directory storing validators (ETag, Last-Modified) and hashes of downloaded files
+DOWNLOAD_METADATA_FILENAME = '.download.json'
+
+# outcome of downloading a single file
+DownloadStatus = Literal['downloaded', 'unchanged', 'failed']
+
+
+def puzzle_is_unlocked(year: int, day: int) -> bool:
+    """Returns True if the puzzle has been released (puzzles unlock at midnight EST)."""
+    return datetime(year, 12, day, 5, tzinfo = timezone.utc) <= datetime.now(timezone.utc)
 
 
 @dataclass
 class DataDownloader:
-    puzzle: Puzzle
+    puzzle: 'Puzzle'
     output_dir: Path
 
     @property
@@ -31,19 +60,208 @@ class DataDownloader:
         _ = self.puzzle.input_data  # ensures input data is downloaded
         shutil.copy(self.puzzle.input_data_path, self.input_data_path)
         log(f'Saved {self.input_data_path}')
-        part = self.puzzle.current_part  # ensures description is downloaded
+        part = self.puzzle.current_part
+        prose_path = getattr(self.puzzle, f'prose{part - 1}_path')
+        if (not prose_path.exists()):  # state was cached: check the server, which ensures the description is downloaded
+            part = self.puzzle.fetch_current_part()
+            prose_path = getattr(self.puzzle, f'prose{part - 1}_path')
         description_path = self.get_description_path(part)
-        prose_path_attr = f'prose{part - 1}_path'
-        shutil.copy(getattr(self.puzzle, prose_path_attr), description_path)
+        shutil.copy(prose_path, description_path)
         log(f'Saved {description_path}')
 
 
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
+    Tokens accumulate at a fixed rate, up to a maximum burst size; each request consumes one token."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_time) * self.rate)
+                self.last_time = now
+                if (self.tokens >= 1):
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class ConnectionPool:
+    """Thread-safe pool of persistent (keep-alive) HTTP connections to a single host."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0) -> None:
+        parts = urlsplit(base_url)
+        self.conn_cls = HTTPSConnection if (parts.scheme == 'https') else HTTPConnection
+        self.host = parts.netloc
+        self.timeout = timeout
+        self.idle: queue.LifoQueue[HTTPConnection] = queue.LifoQueue()
+
+    def request(self, path: str, headers: dict[str, str]) -> tuple[HTTPResponse, bytes]:
+        """Makes a GET request, returning the response and its body.
+        The connection is returned to the pool afterward (retrying once on a fresh connection if a pooled one was closed by the server).
+        A connection which fails (including with a malformed or truncated response) is closed and discarded."""
+        for attempt in range(2):
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self.conn_cls(self.host, timeout = self.timeout)
+            try:
+                conn.request('GET', path, headers = headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (OSError, HTTPException):
+                conn.close()
+                if (attempt == 1):
+                    raise
+                continue
+            self.idle.put(conn)
+            return (resp, body)
+        raise AssertionError('unreachable')
+
+    def close(self) -> None:
+        while (not self.idle.empty()):
+            self.idle.get_nowait().close()
+
+
+@dataclass
+class BulkDownloader:
+    """Downloads the input data and descriptions for many puzzles concurrently.
+    Requests share a pool of HTTP connections and are subject to a token-bucket rate limit.
+    Files are revalidated with conditional requests (ETag/If-Modified-Since), and input files whose local hash matches the one recorded when downloaded are skipped entirely."""
+    token: str
+    output_dir: Path
+    base_url: str = AOC_URL
+    max_workers: int = 4
+    rate: float = 1.0  # requests per second
+    burst: int = 4
+    pool: ConnectionPool = field(init = False)
+    bucket: TokenBucket = field(init = False)
+
+    def __post_init__(self) -> None:
+        self.pool = ConnectionPool(self.base_url)
+        self.bucket = TokenBucket(self.rate, self.burst)
+
+    def get_puzzle_dir(self, year: int, day: int) -> Path:
+        return self.output_dir / str(year) / f'{day:02d}'
+
+    def _fetch(self, url_path: str, validators: dict[str, Any]) -> tuple[DownloadStatus, dict[str, str], bytes]:
+        """Makes a conditional request for a page, given the validators recorded when it was last downloaded."""
+        headers = {'Cookie': f'session={self.token}', 'User-Agent': USER_AGENT}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        self.bucket.acquire()
+        (resp, body) = self.pool.request(url_path, headers)
+        if (resp.status == 304):
+            return ('unchanged', {}, b'')
+        if (resp.status != 200):
+            log(f'Failed to download {self.base_url}{url_path} (HTTP status {resp.status})')
+            return ('failed', {}, b'')
+        resp_headers = {key.lower(): val for (key, val) in resp.getheaders()}
+        return ('downloaded', resp_headers, body)
+
+    def _save(self, path: Path, data: bytes, headers: dict[str, str], metadata: dict[str, Any]) -> DownloadStatus:
+        """Saves downloaded data to a file and records its validators and hash in the metadata."""
+        unchanged = path.exists() and (path.read_bytes() == data)
+        if (not unchanged):
+            path.write_bytes(data)
+            log(f'Saved {path}')
+        metadata[path.name] = {'etag': headers.get('etag'), 'last_modified': headers.get('last-modified'), 'sha256': hash_file(path)}
+        return 'unchanged' if unchanged else 'downloaded'
+
+    def _load_metadata(self, path: Path) -> dict[str, Any]:
+        # a missing or corrupt metadata file is treated as empty, so the puzzle's files are revalidated and the metadata rewritten
+        try:
+            metadata = json.loads(path.read_text())
+            return metadata if isinstance(metadata, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _get_validators(self, path: Path, metadata: dict[str, Any]) -> dict[str, Any]:
+        return metadata.get(path.name, {}) if path.exists() else {}
+
+    def download_puzzle(self, year: int, day: int) -> dict[str, DownloadStatus]:
+        """Downloads the input data and description for a single puzzle.
+        Returns a dict from file type ('input' or 'description') to download status."""
+        puzzle_dir = self.get_puzzle_dir(year, day)
+        puzzle_dir.mkdir(parents = True, exist_ok = True)
+        metadata_path = puzzle_dir / DOWNLOAD_METADATA_FILENAME
+        metadata = self._load_metadata(metadata_path)
+        statuses: dict[str, DownloadStatus] = {}
+        # input data never changes, so a file matching its recorded hash need not be requested at all
+        input_path = puzzle_dir / 'input.txt'
+        validators = self._get_validators(input_path, metadata)
+        if validators.get('sha256') and (hash_file(input_path) == validators['sha256']):
+            statuses['input'] = 'unchanged'
+        else:
+            (statuses['input'], headers, body) = self._fetch(f'/{year}/day/{day}/input', validators)
+            if (statuses['input'] == 'downloaded'):
+                statuses['input'] = self._save(input_path, body, headers, metadata)
+        # the description gains a second part once the first is solved, so it is always revalidated
+        description_path = self._get_latest_description_path(puzzle_dir)
+        (statuses['description'], headers, body) = self._fetch(f'/{year}/day/{day}', self._get_validators(description_path, metadata))
+        if (statuses['description'] == 'downloaded'):
+            # name the file after the number of parts the page contains
+            num_parts = min(2, max(1, body.count(b'<article class="day-desc">')))
+            statuses['description'] = self._save(puzzle_dir / f'description.part{num_parts}.html', body, headers, metadata)
+        metadata_path.write_text(json.dumps(metadata, indent = 4))
+        return statuses
+
+    def _get_latest_description_path(self, puzzle_dir: Path) -> Path:
+        part2_path = puzzle_dir / 'description.part2.html'
+        return part2_path if part2_path.exists() else (puzzle_dir / 'description.part1.html')
+
+    def download(self, puzzles: list[tuple[int, int]]) -> dict[tuple[int, int], dict[str, DownloadStatus]]:
+        """Downloads data for many (year, day) puzzles concurrently.
+        Returns a dict from each puzzle to its download statuses."""
+        log(f'Downloading data and descriptions for {len(puzzles)} puzzle(s)')
+        results = {}
+        try:
+            with ThreadPoolExecutor(max_workers = self.max_workers) as pool:
+                futures = {pool.submit(self.download_puzzle, year, day): (year, day) for (year, day) in puzzles}
+                for (future, puzzle) in futures.items():
+                    try:
+                        results[puzzle] = future.result()
+                    except (OSError, HTTPException) as e:
+                        log(f'Failed to download {puzzle[0]}-12-{puzzle[1]:02d}: {type(e).__name__}: {e}')
+                        results[puzzle] = {'input': 'failed', 'description': 'failed'}
+        finally:
+            self.pool.close()
+        counts = {status: sum(list(result.values()).count(status) for result in results.values()) for status in ('downloaded', 'unchanged', 'failed')}
+        log(f'Files downloaded: {counts["downloaded"]}, unchanged: {counts["unchanged"]}, failed: {counts["failed"]}')
+        return results
+
+
 def configure_parser(parser: ArgumentParser) -> None:
-    parser_config['date'](parser)
+    now = datetime.now()
+    parser.add_argument('-y', '--year', type = parse_years, default = [now.year], help = "year(s), e.g. 2023, 2015-2023, or 'all'")
+    parser.add_argument('-d', '--day', type = parse_days, default = [now.day], help = "day(s) of December, e.g. 1, 1-10, or 'all'")
     parser_config['session'](parser)
     parser_config['output_dir'](parser)
+    parser.add_argument('-j', '--jobs', type = int, default = 4, help = 'maximum number of concurrent downloads (when downloading multiple puzzles)')
+    parser.add_argument('--rate', type = float, default = 1.0, help = 'maximum average number of requests per second (when downloading multiple puzzles)')
 
 def run(args: Namespace) -> None:
-    puzzle = Puzzle.from_args(args)
-    downloader = DataDownloader(puzzle, args.output_dir)
-    downloader.download()
\ No newline at end of file
+    puzzles = [(year, day) for year in args.year for day in args.day if puzzle_is_unlocked(year, day)]
+    if (not puzzles):
+        log('No puzzles have been released for the given dates')
+    elif (len(args.year) == len(args.day) == 1):
+        from aoctool.puzzle import Puzzle
+        (args.year, args.day) = (args.year[0], args.day[0])
+        puzzle = Puzzle.from_args(args)
+        downloader = DataDownloader(puzzle, args.output_dir)
+        downloader.download()
+    else:
+        token = args.session or get_default_session_cookie()
+        bulk_downloader = BulkDownloader(token, args.output_dir, max_workers = args.jobs, rate = args.rate)
+        bulk_downloader.download(puzzles)
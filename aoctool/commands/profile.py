@@ -0,0 +1,134 @@
+"""Compiles and runs every scaffolded solution found in an output directory on a pool of processes, and writes their run diagnostics to a JSON or CSV file."""
+
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+import json
+import os
+from pathlib import Path
+import time
+from typing import Any, NamedTuple, Optional
+
+from aoctool.drivers import AoCBuilder, get_driver
+from aoctool.runner import ResourceLimits
+from aoctool.scheduler import CompileResult, compile_all
+from aoctool.utils import VALID_LANGUAGES, Part, flatten_dict, get_default_session_cookie, log, parse_int_range, parse_languages, parser_config
+
+
+# a row of diagnostics for a single (puzzle, language, part) job
+Row = dict[str, Any]
+
+
+class ProfileJob(NamedTuple):
+    """Specifies a puzzle solution (scaffolded for a particular language) to be compiled and run."""
+    year: int
+    day: int
+    language: str
+
+
+def find_profile_jobs(output_dir: Path, years: Optional[list[int]] = None, days: Optional[list[int]] = None, languages: Optional[list[str]] = None) -> list[ProfileJob]:
+    """Finds all scaffolded puzzle directories within the output root directory, optionally filtering by year, day, and language.
+    Expects the directory structure <output_dir>/<year>/<day>/<language>."""
+    jobs = []
+    for year_dir in sorted(output_dir.glob('[0-9][0-9][0-9][0-9]')):
+        year = int(year_dir.name)
+        if (years is not None) and (year not in years):
+            continue
+        for day_dir in sorted(year_dir.glob('[0-9][0-9]')):
+            day = int(day_dir.name)
+            if (days is not None) and (day not in days):
+                continue
+            for language in VALID_LANGUAGES:
+                if (languages is not None) and (language not in languages):
+                    continue
+                if (day_dir / language).is_dir():
+                    jobs.append(ProfileJob(year, day, language))
+    return jobs
+
+def get_profile_builder(job: ProfileJob, output_dir: Path, token: str, variant: str, limits: ResourceLimits) -> AoCBuilder:
+    """Gets the builder for a puzzle solution, with the given build variant and resource limits."""
+    from aoctool.puzzle import Puzzle
+    puzzle = Puzzle.from_token(job.year, job.day, token)
+    return AoCBuilder(get_driver(job.language, variant), puzzle, output_dir, limits = limits)
+
+def run_profile_job(job: ProfileJob, output_dir: Path, token: str, parts: list[Part], variant: str, limits: ResourceLimits, compile_result: CompileResult) -> list[Row]:
+    """Runs a single (compiled) puzzle solution for each of the given parts, subject to resource limits.
+    Returns a list of diagnostic rows (one per part), also recording each successful run in the run history.
+    This is run within a worker process, so all errors are caught and recorded in the rows."""
+    base_row: Row = {'year': job.year, 'day': job.day, 'language': job.language, 'compile_time': compile_result.compile_time}
+    if (compile_result.error is not None):
+        base_row['error'] = compile_result.error
+        return [{**base_row, 'part': part} for part in parts]
+    builder = get_profile_builder(job, output_dir, token, variant, limits)
+    rows = []
+    for part in parts:
+        row = {**base_row, 'part': part}
+        t0 = time.perf_counter()
+        try:
+            result = builder._get_run_result(part = part, profile = True)
+        except Exception as e:
+            row['error'] = f'{type(e).__name__}: {e}'
+        else:
+            row.update(run_time = time.perf_counter() - t0, returncode = result.returncode, solution = result.solution)
+            if (result.returncode == 0):
+                row['run_info'] = builder.record_run(result, part).run_info
+            elif (result.limit_exceeded is not None):
+                row['error'] = f'exceeded {result.limit_exceeded} limit'
+                row['run_info'] = builder.get_run_info(result)
+            else:
+                row['error'] = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'nonzero exit code'
+        rows.append(row)
+    return rows
+
+def write_diagnostics(rows: list[Row], path: Path) -> None:
+    """Saves diagnostic rows to a JSON or CSV file (depending on the file extension).
+    For CSV, nested fields are flattened into dot-separated column names."""
+    if (path.suffix == '.csv'):
+        flat_rows = [flatten_dict(row) for row in rows]
+        fieldnames: dict[str, None] = {}  # preserves insertion order
+        for row in flat_rows:
+            fieldnames.update(dict.fromkeys(row))
+        with open(path, 'w', newline = '') as f:
+            writer = csv.DictWriter(f, fieldnames = list(fieldnames))
+            writer.writeheader()
+            writer.writerows(flat_rows)
+    else:
+        with open(path, 'w') as f:
+            json.dump(rows, f, indent = 4)
+    log(f'Saved {path}')
+
+
+def configure_parser(parser: ArgumentParser) -> None:
+    parser.add_argument('-y', '--year', type = parse_int_range, help = 'year(s) to include, e.g. 2022 or 2015-2023 (default: all)')
+    parser.add_argument('-d', '--day', type = parse_int_range, help = 'day(s) to include, e.g. 1-10,12 (default: all)')
+    parser.add_argument('-l', '--language', type = parse_languages, help = 'comma-separated language(s) to include (default: all)')
+    parser_config['session'](parser)
+    parser_config['output_dir'](parser)
+    parser_config['variant'](parser)
+    parser_config['limits'](parser)
+    parser.add_argument('--part', type = int, nargs = '+', choices = (1, 2), default = [1, 2], help = 'which part(s) of each puzzle to run')
+    parser.add_argument('-j', '--jobs', type = int, default = os.cpu_count(), help = 'maximum number of parallel jobs')
+    parser.add_argument('--diagnostics', type = Path, help = 'output diagnostics file (.json or .csv) (default: <output_dir>/diagnostics.json)')
+
+def run(args: Namespace) -> None:
+    token = args.session or get_default_session_cookie()
+    jobs = find_profile_jobs(args.output_dir, years = args.year, days = args.day, languages = args.language)
+    if (not jobs):
+        raise FileNotFoundError(f'No scaffolded puzzle directories found in {args.output_dir}')
+    log(f'Profiling {len(jobs)} puzzle solution(s) with up to {args.jobs} parallel job(s)')
+    limits = ResourceLimits(args.timeout, args.max_memory, args.cpus, args.affinity)
+    # compile everything first, so that builds (which are themselves parallel) do not compete with runs or oversubscribe the CPUs
+    builders = [get_profile_builder(job, args.output_dir, token, args.variant, limits) for job in jobs]
+    compile_results = compile_all(builders, args.jobs)
+    rows = []
+    with ProcessPoolExecutor(max_workers = args.jobs) as pool:
+        futures = {pool.submit(run_profile_job, job, args.output_dir, token, args.part, args.variant, limits, compile_result): job for (job, compile_result) in zip(jobs, compile_results)}
+        for future in as_completed(futures):
+            job = futures[future]
+            job_rows = future.result()
+            num_ok = sum(row.get('returncode') == 0 for row in job_rows)
+            log(f'Finished {job.year}-12-{job.day:02d} ({job.language}): {num_ok}/{len(job_rows)} part(s) succeeded')
+            rows.extend(job_rows)
+    rows.sort(key = lambda row: (row['year'], row['day'], row['language'], row['part']))
+    diagnostics_path = args.diagnostics or (args.output_dir / 'diagnostics.json')
+    write_diagnostics(rows, diagnostics_path)
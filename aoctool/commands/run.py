@@ -1,24 +1,31 @@
-"""Run an executable to compute the puzzle solution."""
+"""Runs a compiled solution on the puzzle input (optionally under a profiler), or submits its answer."""
 
 from argparse import ArgumentParser, Namespace
+from typing import Optional, cast
 
 from aoctool.drivers import aoc_builder_from_args
-from aoctool.utils import parser_config
+from aoctool.utils import PROFILERS, Profiler, parser_config
 
 
 def configure_parser(parser: ArgumentParser) -> None:
     parser_config['date'](parser)
     parser_config['language'](parser)
     parser_config['output_dir'](parser)
+    parser_config['variant'](parser)
+    parser_config['limits'](parser)
     parser.add_argument('--part', type = int, choices = (1, 2), help = 'which part of the puzzle to run')
     parser.add_argument('--submit', action = 'store_true', help = 'submit solution to AoC server')
-    parser.add_argument('--profile', action = 'store_true', help = 'run in profile mode')
+    parser.add_argument('--no-cache', action = 'store_true', help = 'always run the executable, even if it has already computed the solution from the same input data')
+    parser.add_argument('--log-output', action = 'store_true', help = 'save the full output of the executable to compressed log files in the scaffold directory, if it is too long to keep in memory')
+    parser.add_argument('--profile', nargs = '?', const = True, default = False, choices = PROFILERS, metavar = 'PROFILER', help = 'run in profile mode, optionally under a profiler (cpu or mem)')
 
 def run(args: Namespace) -> None:
     builder = aoc_builder_from_args(args)
     if args.submit:
         if (args.part is not None):
             raise ValueError('Cannot specify --part when submitting')
-        builder.do_submit()
+        builder.do_submit(use_cache = not args.no_cache)
     else:
-        builder.do_run(part = args.part, profile = args.profile)
+        # --profile with no argument is True, and without the flag is False
+        profiler: Optional[Profiler] = cast(Profiler, args.profile) if (args.profile in PROFILERS) else None
+        builder.do_run(part = args.part, profile = bool(args.profile), profiler = profiler, use_cache = not args.no_cache)
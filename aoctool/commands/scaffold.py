@@ -1,19 +1,53 @@
-"""Create a scaffold for solving a puzzle in a particular programming language."""
+"""Creates scaffolds for one or more days in each requested language, optionally within a project shared by the whole season."""
 
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
 
 from aoctool.drivers import DRIVERS, AoCBuilder
-from aoctool.utils import Puzzle, parser_config
+from aoctool.utils import DEFAULT_INPUT_MODE, INPUT_MODES, InputMode, get_default_session_cookie, log, parse_days, parse_languages, parser_config
 
 
+def scaffold_all(builders: list[AoCBuilder], force: bool = False, shared: bool = False, input_mode: InputMode = DEFAULT_INPUT_MODE, max_workers: int = 1) -> list[AoCBuilder]:
+    """Creates scaffolds for many (puzzle, language) pairs, running the toolchains' project setup commands concurrently on a thread pool.
+    Templates are compiled once and shared by all scaffolds.
+    Returns the builders whose scaffolds could not be created."""
+    if shared:  # set up each shared project before any of the scaffolds that will join it
+        projects = {(builder.season_dir, builder.driver.language): builder for builder in builders}
+        for builder in projects.values():
+            builder.do_setup_shared_project()
+    failed = []
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+        futures = {pool.submit(builder.do_scaffold, force = force, input_mode = input_mode): builder for builder in builders}
+        for (future, builder) in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                log(f'Failed to scaffold {builder.scaffold_dir}: {e}')
+                failed.append(builder)
+    return failed
+
 def configure_parser(parser: ArgumentParser) -> None:
-    parser_config['date'](parser)
-    parser_config['language'](parser)
+    now = datetime.now()
+    parser.add_argument('-y', '--year', type = int, default = now.year, help = 'year')
+    parser.add_argument('-d', '--day', type = parse_days, default = [now.day], help = "day(s) of December, e.g. 1, 1-10, or 'all'")
+    parser.add_argument('-l', '--language', type = parse_languages, required = True, help = "programming language(s) of choice, e.g. python, python,rust, or 'all'")
+    parser_config['session'](parser)
     parser_config['output_dir'](parser)
     parser.add_argument('-f', '--force', action = 'store_true', help = 'force overwrite of scaffold file')
+    parser.add_argument('--shared', action = 'store_true', help = "use a project shared by all of the season's puzzles (e.g. a Cargo workspace, or a Python virtualenv)")
+    parser.add_argument('--input-mode', choices = INPUT_MODES, default = DEFAULT_INPUT_MODE, help = 'how the main program receives the input data: by reading a file path, from stdin, from an inherited file descriptor, or by memory-mapping a file path')
+    parser.add_argument('-j', '--jobs', type = int, default = os.cpu_count(), help = 'maximum number of scaffolds to create concurrently')
 
 def run(args: Namespace) -> None:
-    driver = DRIVERS[args.language]
-    puzzle = Puzzle.from_args(args)
-    builder = AoCBuilder(driver, puzzle, args.output_dir)
-    builder.do_scaffold(force = args.force)
+    from aoctool.puzzle import Puzzle
+    token = args.session or get_default_session_cookie()
+    builders = [AoCBuilder(DRIVERS[language], Puzzle.from_token(args.year, day, token), args.output_dir) for day in args.day for language in args.language]
+    if (len(builders) == 1):
+        builders[0].do_scaffold(force = args.force, shared = args.shared, input_mode = args.input_mode)
+        return
+    failed = scaffold_all(builders, force = args.force, shared = args.shared, input_mode = args.input_mode, max_workers = args.jobs)
+    log(f'Created {len(builders) - len(failed)} of {len(builders)} scaffold(s)')
+    if failed:
+        raise ValueError(f'Failed to create {len(failed)} scaffold(s)')
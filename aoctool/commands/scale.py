@@ -0,0 +1,101 @@
+"""Times a solution on inputs generated at growing multiples of the puzzle input size, and fits its empirical complexity."""
+
+from argparse import ArgumentParser, Namespace
+from statistics import median
+from typing import Optional
+
+from aoctool.benchmark import TOTAL_METRIC, format_metric, get_benchmark_metrics
+from aoctool.drivers import AoCBuilder, aoc_builder_from_args
+from aoctool.scaling import DEFAULT_FACTORS, GENERATORS, ComplexityFit, Generator, ScalePoint, fit_complexity, get_generator
+from aoctool.utils import Part, log, parser_config
+
+
+# name of the directory (within each puzzle directory) where the generated inputs are saved
+SCALE_DIRNAME = 'scale'
+
+# minimum number of input sizes needed to fit a complexity
+MIN_POINTS = 3
+
+# times below this (in seconds) are likely dominated by noise and fixed costs
+MIN_RELIABLE_TIME = 1e-3
+
+
+def parse_factors(s: str) -> list[float]:
+    """Parses a comma-separated list of positive size factors."""
+    factors = sorted({float(tok) for tok in s.split(',')})
+    if any(factor <= 0 for factor in factors):
+        raise ValueError('size factors must be positive')
+    return factors
+
+def measure_scaling(builder: AoCBuilder, part: Part, generator: Generator, factors: list[float], repeat: int = 3, max_time: Optional[float] = None) -> list[ScalePoint]:
+    """Runs the (compiled) solution on inputs generated from the puzzle input at each size factor (in increasing order), repeating each run.
+    Stops early when a run fails, or once the median time at some size exceeds max_time (in seconds)."""
+    input_data = builder.input_data_path.read_text()
+    scale_dir = builder.puzzle_dir / SCALE_DIRNAME
+    scale_dir.mkdir(exist_ok = True)
+    points: list[ScalePoint] = []
+    for factor in sorted(factors):
+        input_path = scale_dir / f'input_x{factor:g}.txt'
+        input_path.write_text(generator(input_data, factor))
+        times: list[float] = []
+        rss: list[int] = []
+        for _ in range(repeat):
+            result = builder._get_run_result(part = part, profile = True, input_path = input_path)
+            if (result.returncode != 0):
+                reason = f'exceeded {result.limit_exceeded} limit' if result.limit_exceeded else f'exit code {result.returncode}'
+                log(f'Run on input {input_path} failed ({reason}), so larger inputs are skipped')
+                return points
+            times.append(get_benchmark_metrics(builder.get_run_info(result))[TOTAL_METRIC])
+            if (result.resources is not None):
+                rss.append(result.resources.max_rss)
+        point = ScalePoint(factor, input_path.stat().st_size, median(times), round(median(rss)) if rss else None)
+        points.append(point)
+        if (max_time is not None) and (point.time > max_time):
+            log(f'Time {point.time:.3f} s exceeds {max_time:g} s, so larger inputs are skipped')
+            break
+    return points
+
+def print_points(points: list[ScalePoint]) -> None:
+    print(f'{"factor":>8}  {"size":>12}  {"time":>12}  {"max RSS":>12}')
+    for point in points:
+        rss = '' if (point.max_rss is None) else format_metric('max_rss', point.max_rss)
+        print(f'{point.factor:>8g}  {point.size:>12,}  {format_metric(TOTAL_METRIC, point.time):>12}  {rss:>12}')
+
+def print_fit(fit: ComplexityFit, input_size: int, extrapolate: list[float]) -> None:
+    print(f'\nFitted power law: time ~ n^{fit.exponent:.2f} (R^2 = {fit.r_squared:.3f})')
+    print(f'Best-fitting complexity class: {fit.complexity}')
+    for factor in extrapolate:
+        size = round(factor * input_size)
+        print(f'Extrapolated time for {factor:g}x the input ({size:,} bytes): {format_metric(TOTAL_METRIC, fit.predict(size))}')
+
+
+def configure_parser(parser: ArgumentParser) -> None:
+    parser_config['date'](parser)
+    parser_config['language'](parser)
+    parser_config['session'](parser)
+    parser_config['output_dir'](parser)
+    parser_config['variant'](parser)
+    parser_config['limits'](parser)
+    parser.add_argument('--part', type = int, choices = (1, 2), help = 'which part of the puzzle to run')
+    parser.add_argument('--factors', type = parse_factors, default = DEFAULT_FACTORS, help = 'comma-separated multiples of the input size at which to run')
+    parser.add_argument('--generator', help = f'input generator: one of {list(GENERATORS)}, or the path to a Python file defining generate(input_data, factor); if omitted, uses scale.py in the puzzle directory if it exists, otherwise lines')
+    parser.add_argument('-r', '--repeat', type = int, default = 3, help = 'number of runs at each size (the median time is used)')
+    parser.add_argument('--max-time', type = float, default = 10.0, help = 'skip larger inputs once the time at some size exceeds this many seconds')
+    parser.add_argument('--extrapolate', type = parse_factors, default = [10.0, 100.0], help = 'comma-separated multiples of the input size at which to extrapolate the time')
+
+def run(args: Namespace) -> None:
+    builder = aoc_builder_from_args(args)
+    if (not builder.input_data_path.exists()):
+        raise FileNotFoundError(f'Input data {builder.input_data_path} has not been downloaded')
+    part = args.part or builder.puzzle.current_part
+    generator = get_generator(args.generator, builder.puzzle_dir)
+    builder.do_compile()
+    points = measure_scaling(builder, part, generator, args.factors, repeat = args.repeat, max_time = args.max_time)
+    print_points(points)
+    if (len(points) < MIN_POINTS):
+        log(f'At least {MIN_POINTS} input sizes are needed to estimate the complexity')
+        return
+    if any(point.time < MIN_RELIABLE_TIME for point in points):
+        log(f'Warning: some times are below {format_metric(TOTAL_METRIC, MIN_RELIABLE_TIME)}, so the estimate may be unreliable (try larger factors)')
+    fit = fit_complexity([point.size for point in points], [point.time for point in points])
+    print_fit(fit, builder.input_data_path.stat().st_size, args.extrapolate)
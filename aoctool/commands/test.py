@@ -0,0 +1,192 @@
+"""Checks solutions against the answers to the puzzle examples (and optionally the real input), in batches run concurrently."""
+
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+import json
+import os
+from pathlib import Path
+import sys
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from aoctool.benchmark import TOTAL_METRIC, get_benchmark_metrics
+from aoctool.drivers import AoCBuilder, aoc_builder_from_args, get_driver
+from aoctool.drivers._base import BatchJob, RunResult
+from aoctool.scheduler import compile_all
+from aoctool.utils import VALID_LANGUAGES, Part, log, parse_languages, parser_config
+
+
+if TYPE_CHECKING:
+    from aoctool.puzzle import Puzzle
+
+
+# name of the directory (within each puzzle directory) where the puzzle's examples are cached
+EXAMPLES_DIRNAME = 'examples'
+
+# name of the real puzzle input in the results
+REAL_INPUT_NAME = 'input'
+
+
+class Example(NamedTuple):
+    """An example from the puzzle description, with its input data saved to a file."""
+    name: str
+    input_path: Path
+    answers: tuple[Optional[str], Optional[str]]  # expected answers to parts 1 and 2 (None if not given)
+
+
+class Check(NamedTuple):
+    """A single check: running a language's solution for one part of the puzzle on some input."""
+    language: str
+    input_name: str
+    input_path: Optional[Path]  # None for the real input
+    part: Part
+    expected: Optional[str]     # expected answer (None if unknown)
+
+
+class CheckResult(NamedTuple):
+    """Result of a check."""
+    check: Check
+    status: str                  # 'pass', 'fail', 'error', or 'ran' (no expected answer)
+    solution: Optional[int]
+    solve_time: Optional[float]  # total time of the phases of the run, excluding process startup (seconds)
+    error: Optional[str] = None
+
+
+def get_examples(puzzle: 'Puzzle', examples_dir: Path, refresh: bool = False) -> list[Example]:
+    """Gets the puzzle's examples, which are cached in a directory (with one input file per example).
+    The examples are fetched with aocd (which extracts them from the puzzle description, downloading it if necessary) only if refresh = True, they are not cached, or they were cached before the current part was unlocked (since its description may add examples and answers)."""
+    index_path = examples_dir / 'examples.json'
+    current_part = puzzle.current_part
+    index = None
+    if (not refresh) and index_path.exists():
+        with open(index_path) as f:
+            index = json.load(f)
+        if (index['part'] < current_part):
+            index = None
+    if (index is None):
+        log(f'Fetching examples for puzzle {puzzle.date_string}')
+        examples_dir.mkdir(parents = True, exist_ok = True)
+        answers = []
+        for (i, example) in enumerate(puzzle.examples, start = 1):
+            (examples_dir / f'example{i}.txt').write_text(example.input_data)
+            answers.append([example.answer_a, example.answer_b])
+        index = {'part': current_part, 'answers': answers}
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent = 4)
+    return [
+        Example(f'example{i}', examples_dir / f'example{i}.txt', (answer_a, answer_b))
+        for (i, (answer_a, answer_b)) in enumerate(index['answers'], start = 1)
+    ]
+
+def get_checks(languages: list[str], examples: list[Example], parts: list[Part], real_answers: Optional[dict[str, str]] = None) -> list[Check]:
+    """Gets the checks to run for each language: each part on each example (for which the part has an answer), then each part on the real input (if real_answers is given, mapping parts to their known answers)."""
+    checks: list[Check] = []
+    for example in examples:
+        for part in parts:
+            if (example.answers[part - 1] is not None):
+                checks.extend(Check(language, example.name, example.input_path, part, example.answers[part - 1]) for language in languages)
+    if (real_answers is not None):
+        for part in parts:
+            checks.extend(Check(language, REAL_INPUT_NAME, None, part, real_answers.get(str(part))) for language in languages)
+    return checks
+
+def get_check_result(builder: AoCBuilder, check: Check, result: RunResult) -> CheckResult:
+    """Evaluates the result of running a check."""
+    solve_time = get_benchmark_metrics(builder.get_run_info(result)).get(TOTAL_METRIC)
+    if (result.returncode != 0):
+        if (result.limit_exceeded is not None):
+            error = f'exceeded {result.limit_exceeded} limit'
+        else:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'nonzero exit code'
+        return CheckResult(check, 'error', None, solve_time, error)
+    if (check.expected is None):
+        status = 'ran'
+    else:
+        status = 'pass' if (str(result.solution) == check.expected) else 'fail'
+    return CheckResult(check, status, result.solution, solve_time)
+
+def run_check_batch(builder: AoCBuilder, checks: list[Check]) -> list[CheckResult]:
+    """Runs a batch of checks with a (compiled) builder for their language (with a single process, if the solution supports it).
+    This is run within a worker thread, so all errors are caught and recorded in the results."""
+    try:
+        results = builder.run_jobs([BatchJob(check.part, check.input_path) for check in checks])
+    except Exception as e:
+        return [CheckResult(check, 'error', None, None, f'{type(e).__name__}: {e}') for check in checks]
+    return [get_check_result(builder, check, result) for (check, result) in zip(checks, results)]
+
+def run_checks(builders: dict[str, AoCBuilder], checks: list[Check], max_workers: int = 1) -> list[CheckResult]:
+    """Compiles the solution for each language (sharing max_workers job slots between the builds), then runs the checks concurrently on a pool of worker threads.
+    Each language's checks are split into batches (enough to keep the workers busy), each of which is run by a single process.
+    Checks for languages that fail to compile are recorded as errors.
+    Returns the results in the same order as the checks."""
+    results: list[Optional[CheckResult]] = [None] * len(checks)
+    compile_errors = {language: res.error for (language, res) in zip(builders, compile_all(list(builders.values()), max_workers))}
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+        num_batches = max(1, max_workers // len(builders))
+        futures: dict[tuple[int, ...], Future[list[CheckResult]]] = {}
+        for (language, builder) in builders.items():
+            indices = [i for (i, check) in enumerate(checks) if (check.language == language)]
+            if (compile_errors[language] is not None):
+                for i in indices:
+                    results[i] = CheckResult(checks[i], 'error', None, None, f'compilation failed ({compile_errors[language]})')
+                continue
+            for k in range(num_batches):
+                if (batch := indices[k::num_batches]):
+                    key = tuple(batch)
+                    futures[key] = pool.submit(run_check_batch, builder, [checks[i] for i in batch])
+        for (key, future) in futures.items():
+            for (i, res) in zip(key, future.result()):
+                results[i] = res
+    return [res for res in results if (res is not None)]
+
+def print_results(results: list[CheckResult]) -> None:
+    header = ['language', 'input', 'part', 'status', 'time', 'expected', 'solution']
+    rows = [header]
+    for res in results:
+        time_str = '' if (res.solve_time is None) else f'{res.solve_time:.3f} s'
+        # the last column holds the error message for failed runs
+        solution = res.error if (res.status == 'error') else str(res.solution)
+        rows.append([res.check.language, res.check.input_name, str(res.check.part), res.status.upper(), time_str, res.check.expected or '', solution or ''])
+    widths = [max(len(row[j]) for row in rows) for j in range(len(header) - 1)]
+    for row in rows:
+        cells = [val.ljust(width) if (j < 4) else val.rjust(width) for (j, (val, width)) in enumerate(zip(row, widths))]
+        print('  '.join(cells + [row[-1]]))
+
+
+def configure_parser(parser: ArgumentParser) -> None:
+    parser_config['date'](parser)
+    parser.add_argument('-l', '--language', type = parse_languages, help = 'comma-separated language(s) to test (default: all scaffolded languages)')
+    parser_config['session'](parser)
+    parser_config['output_dir'](parser)
+    parser_config['variant'](parser)
+    parser_config['limits'](parser)
+    parser.add_argument('--part', type = int, nargs = '+', choices = (1, 2), help = 'which part(s) of the puzzle to check (default: all unlocked parts)')
+    parser.add_argument('-j', '--jobs', type = int, default = os.cpu_count() or 1, help = 'maximum number of concurrent processes running checks')
+    parser.add_argument('--examples-only', action = 'store_true', help = 'only check the examples, not the real input')
+    parser.add_argument('--refresh-examples', action = 'store_true', help = 'fetch the examples again, even if they are cached')
+
+def run(args: Namespace) -> None:
+    ref_builder = aoc_builder_from_args(Namespace(**{**vars(args), 'language': VALID_LANGUAGES[0]}))
+    languages = args.language or [language for language in VALID_LANGUAGES if (ref_builder.puzzle_dir / language).is_dir()]
+    if (not languages):
+        raise FileNotFoundError(f'No scaffolded solutions found in {ref_builder.puzzle_dir}')
+    builders = {language: replace(ref_builder, driver = get_driver(language, args.variant)) for language in languages}
+    puzzle = ref_builder.puzzle
+    parts: list[Part] = args.part or list(range(1, puzzle.current_part + 1))
+    examples = get_examples(puzzle, ref_builder.puzzle_dir / EXAMPLES_DIRNAME, refresh = args.refresh_examples)
+    if (not examples):
+        log(f'No examples found for puzzle {puzzle.date_string}')
+    real_answers = None
+    if (not args.examples_only):
+        if ref_builder.input_data_path.exists():
+            real_answers = puzzle.local_answers
+        else:
+            log(f'Input data {ref_builder.input_data_path} has not been downloaded, so only the examples are checked')
+    checks = get_checks(languages, examples, parts, real_answers)
+    log(f'Running {len(checks)} check(s) with up to {args.jobs} concurrent job(s)')
+    results = run_checks(builders, checks, max_workers = args.jobs)
+    print_results(results)
+    counts = {status: sum(res.status == status for res in results) for status in ['pass', 'fail', 'error', 'ran']}
+    log(f"{counts['pass']} passed, {counts['fail']} failed, {counts['error']} error(s), {counts['ran']} without an expected answer")
+    if (counts['fail'] + counts['error'] > 0):
+        sys.exit(1)
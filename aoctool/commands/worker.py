@@ -0,0 +1,20 @@
+"""Starts or stops a persistent process which keeps a solution loaded between runs, for languages whose driver supports one."""
+
+from argparse import ArgumentParser, Namespace
+
+from aoctool.drivers import aoc_builder_from_args
+from aoctool.utils import parser_config
+
+
+def configure_parser(parser: ArgumentParser) -> None:
+    parser_config['date'](parser)
+    parser_config['language'](parser)
+    parser_config['output_dir'](parser)
+    parser.add_argument('--stop', action = 'store_true', help = 'stop a running worker')
+
+def run(args: Namespace) -> None:
+    builder = aoc_builder_from_args(args)
+    if args.stop:
+        builder.do_stop_worker()
+    else:
+        builder.do_start_worker()
@@ -1,19 +1,48 @@
 from argparse import Namespace
+from collections.abc import Mapping
+from dataclasses import replace
+from importlib import import_module
+from typing import Iterator
 
-from aoctool.drivers._base import AoCBuilder
-from aoctool.drivers.haskell import HaskellDriver
-from aoctool.drivers.python import PythonDriver
-from aoctool.drivers.rust import RustDriver
-from aoctool.utils import Puzzle
+from aoctool.drivers._base import DEFAULT_VARIANT, AoCBuilder, LanguageDriver
+from aoctool.runner import ResourceLimits
 
 
-DRIVERS = {
-    'haskell': HaskellDriver(),
-    'python': PythonDriver(),
-    'rust': RustDriver(),
-}
+class DriverRegistry(Mapping[str, LanguageDriver]):
+    """Mapping from language names to drivers.
+    Each driver's module is only imported the first time the driver is accessed, since some of them import slow third-party libraries."""
+
+    def __init__(self, paths: dict[str, str]) -> None:
+        # paths are of the form 'module:ClassName'
+        self.paths = paths
+        self.drivers: dict[str, LanguageDriver] = {}
+
+    def __getitem__(self, language: str) -> LanguageDriver:
+        if (language not in self.drivers):
+            (module_name, cls_name) = self.paths[language].split(':')
+            self.drivers[language] = getattr(import_module(module_name), cls_name)()
+        return self.drivers[language]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+DRIVERS = DriverRegistry({
+    'haskell': 'aoctool.drivers.haskell:HaskellDriver',
+    'python': 'aoctool.drivers.python:PythonDriver',
+    'rust': 'aoctool.drivers.rust:RustDriver',
+})
+
+def get_driver(language: str, variant: str = DEFAULT_VARIANT) -> LanguageDriver:
+    """Gets the driver for a language, configured with the given build variant."""
+    return replace(DRIVERS[language], variant = variant)
 
 def aoc_builder_from_args(args: Namespace) -> AoCBuilder:
-    driver = DRIVERS[args.language]
+    from aoctool.puzzle import Puzzle
+    driver = get_driver(args.language, getattr(args, 'variant', DEFAULT_VARIANT))
     puzzle = Puzzle.from_args(args)
-    return AoCBuilder(driver, puzzle, args.output_dir)
+    limits = ResourceLimits(getattr(args, 'timeout', None), getattr(args, 'max_memory', None), getattr(args, 'cpus', None), getattr(args, 'affinity', None))
+    return AoCBuilder(driver, puzzle, args.output_dir, limits = limits, log_output = getattr(args, 'log_output', False))
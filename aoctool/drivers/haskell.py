@@ -1,23 +1,120 @@
 from pathlib import Path
+import re
 import subprocess
+from typing import TYPE_CHECKING, Any, Optional
 
-from aoctool.drivers._base import LanguageDriver
-from aoctool.utils import Puzzle, command2str, log
+from aoctool.drivers._base import LanguageDriver, RunInfo
+from aoctool.profiling import TOP_N, get_profile_path, write_collapsed_stacks
+from aoctool.utils import DEFAULT_INPUT_MODE, InputMode, Profiler, command2str, log
+
+
+if TYPE_CHECKING:
+    from aoctool.puzzle import Puzzle
+    from aoctool.scheduler import JobServer
+
+
+# extra GHC options for each build variant
+GHC_OPTIONS = {
+    'release': [],
+    'O2': ['-O2'],
+    'threaded': ['-O2', '-threaded'],
+    # add cost centres to all top-level functions
+    'profile': ['-fprof-auto'],
+}
+
+# extra cabal options for each build variant
+CABAL_OPTIONS = {
+    # compile with -prof (along with profiling versions of all dependencies)
+    'profile': ['--enable-profiling'],
+}
+
+# packages needed by the main program (in addition to base, bytestring, and deepseq) for each input mode
+INPUT_MODE_DEPENDENCIES = {
+    'path': [],
+    'stdin': [],
+    'fd': ['unix'],
+    'mmap': ['mmap'],
+}
+
+# patterns for extracting statistics from the output of the GHC runtime's '-s' flag
+RTS_STAT_PATTERNS = {
+    'bytes_allocated': re.compile(r'^\s*([\d,]+) bytes allocated in the heap', re.MULTILINE),
+    'bytes_copied': re.compile(r'^\s*([\d,]+) bytes copied during GC', re.MULTILINE),
+    'max_residency': re.compile(r'^\s*([\d,]+) bytes maximum residency', re.MULTILINE),
+}
+RTS_GEN_PATTERN = re.compile(r'^\s*Gen\s+\d+\s+(\d+) colls', re.MULTILINE)
+RTS_TIME_PATTERN = re.compile(r'^\s*(MUT|GC|Total)\s+time\s+([\d.]+)s\s+\(\s*([\d.]+)s elapsed\)', re.MULTILINE)
+
+# patterns for extracting totals from the cost-centre report (.prof file) written by the GHC runtime's '-p' flag
+PROF_TOTAL_TIME_PATTERN = re.compile(r'total time\s+=\s+([\d.]+) secs')
+PROF_TOTAL_ALLOC_PATTERN = re.compile(r'total alloc\s+=\s+([\d,]+) bytes')
+
+
+def parse_prof_report(text: str) -> tuple[dict[str, Any], dict[str, float]]:
+    """Parses a GHC cost-centre report (.prof file).
+    Returns a summary (totals, and the cost centres with the most time), and the call stacks of cost centres, with the time (in microseconds) spent in each."""
+    total_time = float(match.group(1)) if (match := PROF_TOTAL_TIME_PATTERN.search(text)) else 0.0
+    summary: dict[str, Any] = {'profiler': 'cpu', 'total_time': total_time}
+    if (match := PROF_TOTAL_ALLOC_PATTERN.search(text)):
+        summary['total_alloc'] = int(match.group(1).replace(',', ''))
+    top = []
+    stacks: dict[str, float] = {}
+    path: list[str] = []
+    # the report has two tables: cost centres sorted by time, then the tree of cost centre stacks
+    table = 0
+    for line in text.splitlines():
+        if line.lstrip().startswith('COST CENTRE'):
+            table += 1
+            continue
+        tokens = line.split()
+        if (table == 0) or (not tokens):
+            continue
+        # SRC may contain spaces, but the columns before and after it do not
+        (name, module) = tokens[:2]
+        if (table == 1) and (len(tokens) >= 5):
+            (time_pct, alloc_pct) = map(float, tokens[-2:])
+            top.append({'function': f'{module}.{name}', 'source': ' '.join(tokens[2:-2]), 'self_time': time_pct / 100 * total_time, 'time_fraction': time_pct / 100, 'alloc_fraction': alloc_pct / 100})
+        elif (table == 2) and (len(tokens) >= 9):
+            depth = len(line) - len(line.lstrip(' '))
+            path[depth:] = [f'{module}.{name}']
+            stack = ';'.join(path)
+            stacks[stack] = stacks.get(stack, 0.0) + float(tokens[-4]) / 100 * total_time * 1e6
+    summary['top'] = top[:TOP_N]
+    return (summary, stacks)
 
 
 class HaskellDriver(LanguageDriver):
 
     language = 'haskell'
     file_extension = 'hs'
-    is_compiled = True
+    compiled = True
+    manifest_patterns = ['*.cabal', 'cabal.project*']
+    toolchain_version_cmds = [['ghc', '--numeric-version'], ['cabal', '--numeric-version']]
+    variants = list(GHC_OPTIONS)
+    profilers = ['cpu']
+    input_types = {'path': 'ByteString', 'stdin': 'ByteString', 'fd': 'ByteString', 'mmap': 'ByteString'}
 
-    def get_src_path(self, puzzle: Puzzle, scaffold_dir: Path) -> Path:
+    def get_src_path(self, puzzle: 'Puzzle', scaffold_dir: Path) -> Path:
         # Haskell requires module names to start with a capital letter
         path = super().get_src_path(puzzle, scaffold_dir)
         return path.with_name(path.name.capitalize())
 
-    def make_scaffold(self, puzzle: Puzzle, input_data_path: Path, scaffold_dir: Path) -> None:
-        super().make_scaffold(puzzle, input_data_path, scaffold_dir)
+    def get_project_dir(self, scaffold_dir: Path) -> Optional[Path]:
+        """If the scaffold directory belongs to a season-level cabal project, returns the project directory.
+        Otherwise, returns None."""
+        project_dir = scaffold_dir.parent.parent
+        return project_dir if (project_dir / 'cabal.project').exists() else None
+
+    def make_shared_project(self, season_dir: Path) -> None:
+        # create a cabal.project whose package glob matches each day's cabal file, so new days are included automatically
+        project_path = season_dir / 'cabal.project'
+        if (not project_path.exists()):
+            with open(project_path, 'w') as f:
+                print(f'packages: */{self.language}/*.cabal', file = f)
+            log(f'Created {project_path}')
+
+    def make_scaffold(self, puzzle: 'Puzzle', input_data_path: Path, scaffold_dir: Path, input_mode: InputMode = DEFAULT_INPUT_MODE) -> None:
+        super().make_scaffold(puzzle, input_data_path, scaffold_dir, input_mode = input_mode)
         src_path = self.get_src_path(puzzle, scaffold_dir)
         # use 'cabal init' to create a cabal file in the same directory as the source file
         name = src_path.stem.lower()
@@ -32,17 +129,94 @@ class HaskellDriver(LanguageDriver):
         changelog_path = scaffold_dir / 'CHANGELOG.md'
         changelog_path.unlink()
         # (also needs to be removed from cabal file)
+        # the main program also depends on deepseq, to force evaluation when timing, on bytestring, to read jobs in batch mode, and on any packages needed to read the input
+        dependencies = ['bytestring', 'deepseq', *INPUT_MODE_DEPENDENCIES[input_mode]]
         with open(manifest_path, 'r+') as f:
-            lines = [line for line in f if (not line.startswith('extra-doc-files'))]
+            lines = []
+            for line in f:
+                if line.startswith('extra-doc-files'):
+                    continue
+                if line.lstrip().startswith('build-depends:'):
+                    line = line.rstrip() + ''.join(f', {dep}' for dep in dependencies) + '\n'
+                lines.append(line)
             f.seek(0)
             f.write(''.join(lines))
             f.truncate(f.tell())
 
+    def get_build_inputs(self, scaffold_dir: Path) -> list[Path]:
+        paths = super().get_build_inputs(scaffold_dir)
+        project_dir = self.get_project_dir(scaffold_dir)
+        if (project_dir is not None):
+            paths += sorted(project_dir.glob('cabal.project*'))
+        return paths
+
     def get_exec_path(self, src_path: Path, build_dir: Path) -> Path:
         return build_dir / src_path.stem.lower()
 
-    def compile_source(self, scaffold_dir: Path, src_path: Path, build_dir: Path) -> None:
-        cmd = ['cabal', 'install', '--builddir', 'build', '--installdir', 'build', '--overwrite-policy', 'always']
+    def get_build_flags(self) -> list[str]:
+        # -rtsopts is needed so that runtime statistics can be collected
+        ghc_options = ['-rtsopts', *GHC_OPTIONS[self.variant]]
+        return [*CABAL_OPTIONS.get(self.variant, []), '--ghc-options=' + ' '.join(ghc_options)]
+
+    def get_shared_build_dir(self, scaffold_dir: Path, build_dir: Path) -> Optional[Path]:
+        project_dir = self.get_project_dir(scaffold_dir)
+        return None if (project_dir is None) else (project_dir / 'dist-newstyle' / self.variant)
+
+    def compile_source(self, scaffold_dir: Path, src_path: Path, build_dir: Path, jobserver: Optional['JobServer'] = None) -> None:
+        project_dir = self.get_project_dir(scaffold_dir)
+        if (project_dir is None):
+            cmd = ['cabal', 'install', *self.get_build_flags(), '--builddir', str(build_dir.resolve())]
+        else:  # build only this day's executable, within the project's shared build directory
+            name = src_path.stem.lower()
+            cmd = ['cabal', 'install', f'exe:{name}', *self.get_build_flags(), '--builddir', str((project_dir / 'dist-newstyle' / self.variant).resolve())]
+        cmd += ['--installdir', str(build_dir.resolve()), '--overwrite-policy', 'always']
+        if (jobserver is None):
+            self._run_cabal(cmd, scaffold_dir)
+        else:
+            # cabal does not understand the jobserver protocol, so it takes whatever tokens are free, as a fixed number of parallel jobs
+            with jobserver.extra_tokens(jobserver.num_jobs - 1) as num_extra:
+                self._run_cabal(cmd + [f'--jobs={num_extra + 1}'], scaffold_dir)
+
+    def _run_cabal(self, cmd: list[str], scaffold_dir: Path) -> None:
         cmd_str = f'cd {scaffold_dir} && ' + command2str(cmd)
         log(cmd_str)
         subprocess.run(cmd, cwd = scaffold_dir, stdout = subprocess.DEVNULL)
+
+    def get_run_args(self, exec_path: Path) -> list[str]:
+        # have the runtime report statistics (on stderr) when the program exits
+        rts_opts = ['-s', '-N'] if (self.variant == 'threaded') else ['-s']
+        return [str(exec_path), '+RTS', *rts_opts, '-RTS']
+
+    def get_profile_run_args(self, exec_path: Path, profiler: Profiler, output_prefix: Path) -> list[str]:
+        if (profiler != 'cpu'):
+            return super().get_profile_run_args(exec_path, profiler, output_prefix)
+        if (self.variant != 'profile'):
+            raise ValueError('Profiling Haskell executables requires the profile build variant (compile and run with --variant profile)')
+        # have the runtime write a cost-centre report to <prefix>.prof
+        return [str(exec_path), '+RTS', '-s', '-p', f'-po{output_prefix.resolve()}', '-RTS']
+
+    def load_profile(self, output_prefix: Path) -> Optional[dict[str, Any]]:
+        prof_path = get_profile_path(output_prefix, '.prof')
+        if (not prof_path.exists()):
+            return None
+        (summary, stacks) = parse_prof_report(prof_path.read_text())
+        collapsed_path = get_profile_path(output_prefix, '.collapsed')
+        write_collapsed_stacks(stacks, collapsed_path)
+        return {**summary, 'prof': str(prof_path), 'collapsed': str(collapsed_path)}
+
+    def parse_run_info(self, stderr: str) -> RunInfo:
+        run_info = super().parse_run_info(stderr)
+        rts: dict[str, float] = {}
+        for (key, pattern) in RTS_STAT_PATTERNS.items():
+            if (match := pattern.search(stderr)):
+                rts[key] = int(match.group(1).replace(',', ''))
+        gen_matches = RTS_GEN_PATTERN.findall(stderr)
+        if gen_matches:
+            rts['gc_count'] = sum(map(int, gen_matches))
+        for (name, cpu_time, elapsed_time) in RTS_TIME_PATTERN.findall(stderr):
+            key = {'MUT': 'mutator', 'GC': 'gc', 'Total': 'total'}[name]
+            rts[f'{key}_time'] = float(cpu_time)
+            rts[f'{key}_elapsed'] = float(elapsed_time)
+        if rts:
+            run_info['rts'] = rts
+        return run_info
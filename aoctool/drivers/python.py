@@ -1,18 +1,169 @@
+import fcntl
+import hashlib
+import json
+import os
 from pathlib import Path
+import re
+import shutil
+import socket
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Optional
 
-from aoctool.drivers._base import LanguageDriver
-from aoctool.utils import Puzzle, command2str, log
+import tomllib
+
+from aoctool.cache import hash_files
+from aoctool.drivers._base import DEFAULT_VARIANT, LanguageDriver, RunInfo
+from aoctool.profiling import get_profile_path
+from aoctool.runner import ProcessResult, ResourceUsage
+from aoctool.utils import DEFAULT_INPUT_MODE, InputMode, Part, Profiler, command2str, log
+
+
+if TYPE_CHECKING:
+    from aoctool.puzzle import Puzzle
+    from aoctool.scheduler import JobServer
+
+
+WORKER_SCRIPT_PATH = Path(__file__).with_name('python_worker.py')
+WORKER_STARTUP_TIMEOUT = 60  # seconds
+PROFILER_SCRIPT_PATH = Path(__file__).with_name('python_profiler.py')
+LOADER_SCRIPT_PATH = Path(__file__).with_name('python_loader.py')
+
+# backend running the solution for each build variant:
+#   - cpython: the interpreter in the scaffold's Poetry environment
+#   - pypy: the PyPy interpreter (pypy3, which must be on the PATH), in a virtualenv with the scaffold's dependencies
+#   - mypyc, cython: the solution module is compiled ahead of time to an extension module, which CPython imports in place of the source
+PYTHON_BACKENDS = {
+    DEFAULT_VARIANT: 'cpython',
+    'pypy': 'pypy',
+    'mypyc': 'mypyc',
+    'cython': 'cython',
+}
+
+# arguments to the scaffold environment's interpreter compiling a module to an extension module in the current directory, for each ahead-of-time backend
+COMPILE_CMDS = {
+    'mypyc': ['-m', 'mypyc'],
+    'cython': ['-m', 'Cython.Build.Cythonize', '--inplace', '-3'],
+}
+
+# name of the virtualenv (in the season directory) shared by all of a season's Python scaffolds
+SHARED_ENV_DIRNAME = '.venv'
+
+# name of the file (in a managed virtualenv) recording the hash of the manifests whose dependencies are installed
+ENV_STATE_FILENAME = 'aoctool_sync.json'
+
+# name of the file (in a managed virtualenv) locked while checking and installing its dependencies
+ENV_LOCK_FILENAME = 'aoctool_sync.lock'
+
+# PyPy interpreter, used to create the virtualenv of the pypy backend
+PYPY_CMD = 'pypy3'
+
+# name of the PyPy virtualenv (in each scaffold directory) into which the scaffold's dependencies are installed
+PYPY_ENV_DIRNAME = '.venv-pypy'
+
+# name of the file (in each scaffold directory) caching the path to the interpreter of the scaffold's Poetry environment
+PYTHON_ENV_FILENAME = '.python_env.json'
+
+# guards installation into a managed virtualenv by threads of this process (within the file lock, which guards it between processes)
+_env_lock = threading.Lock()
+
+# arguments to the scaffold environment's interpreter reporting the version of each additional toolchain program, for each backend run by CPython
+BACKEND_VERSION_ARGS = {
+    'cpython': [],
+    'mypyc': [['-m', 'mypy', '--version']],
+    'cython': [['-m', 'cython', '--version']],
+}
+
+
+def poetry_constraint_to_pep440(constraint: str) -> str:
+    """Converts a Poetry version constraint (e.g. '^1.2', '~1.2.3', '1.2', '>=1,<2', '*') to a PEP 440 version specifier (which is empty for any version)."""
+    constraint = constraint.strip()
+    if (constraint in ['', '*']):
+        return ''
+    if (match := re.fullmatch(r'([\^~])(\d+(?:\.\d+)*)', constraint)):
+        (op, version) = match.groups()
+        parts = [int(part) for part in version.split('.')]
+        if (op == '^'):  # the first nonzero component (or the last component) is fixed
+            i = next((i for (i, part) in enumerate(parts) if (part != 0)), len(parts) - 1)
+        else:  # the minor version is fixed (or the major version, if only it is given)
+            i = min(1, len(parts) - 1)
+        upper = parts[:i] + [parts[i] + 1]
+        return f'>={version},<' + '.'.join(map(str, upper))
+    if re.fullmatch(r'\d+(?:\.\d+)*', constraint):
+        return f'=={constraint}'
+    return constraint.replace(' ', '')
+
+def get_manifest_requirements(manifest_path: Path) -> list[str]:
+    """Gets the dependencies declared in a pyproject.toml file (either PEP 621 dependencies or Poetry dependencies), as PEP 508 requirement strings."""
+    with open(manifest_path, 'rb') as f:
+        manifest = tomllib.load(f)
+    reqs = list(manifest.get('project', {}).get('dependencies', []))
+    for (name, spec) in manifest.get('tool', {}).get('poetry', {}).get('dependencies', {}).items():
+        if (name == 'python'):
+            continue
+        constraint = spec.get('version', '*') if isinstance(spec, dict) else spec
+        reqs.append(name + poetry_constraint_to_pep440(constraint))
+    return reqs
+
+def _venv_python(venv_dir: Path) -> Path:
+    return venv_dir / 'bin' / 'python'
+
+def _write_json(data: dict[str, Any], path: Path) -> None:
+    """Writes a JSON file atomically, so that concurrent readers never see a partial file."""
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}')
+    tmp_path.write_text(json.dumps(data))
+    tmp_path.replace(path)
+
+def _read_cached_python(cache_path: Path, key: str) -> Optional[Path]:
+    """Reads the cached path to an environment's interpreter, if the cache is valid for the given manifest key (and the interpreter still exists)."""
+    if cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+        if (cached.get('key') == key) and Path(cached['python']).exists():
+            return Path(cached['python'])
+    return None
+
+def sync_env(venv_dir: Path, manifest_paths: list[Path], root: Path) -> None:
+    """Installs the dependencies declared in the given manifests (with paths relative to root) into a virtualenv, if any of the manifests have changed since the last installation."""
+    key = hash_files(manifest_paths, root)
+    state_path = venv_dir / ENV_STATE_FILENAME
+    # the file lock excludes other processes (e.g. parallel profiling jobs), as well as the key check and installation of other threads
+    with open(venv_dir / ENV_LOCK_FILENAME, 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        with _env_lock:
+            if state_path.exists() and (json.loads(state_path.read_text()).get('key') == key):
+                return
+            reqs = sorted({req for path in manifest_paths for req in get_manifest_requirements(path)})
+            if reqs:
+                # all the requirements are installed together, so that they are resolved jointly
+                cmd = [str(_venv_python(venv_dir)), '-m', 'pip', 'install', '--quiet', *reqs]
+                log(command2str(cmd))
+                if (subprocess.run(cmd, stdout = subprocess.DEVNULL).returncode != 0):
+                    raise RuntimeError(f'Failed to install dependencies into virtualenv {venv_dir}')
+            _write_json({'key': key, 'requirements': reqs}, state_path)
+
+def _send_worker_request(socket_path: Path, request: dict[str, Any]) -> dict[str, Any]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as f:
+            return json.loads(f.readline())
 
 
 class PythonDriver(LanguageDriver):
 
     language = 'python'
     file_extension = 'py'
-    is_compiled = False
+    compiled = False  # though some backends compile the solution module (see is_compiled)
+    manifest_patterns = ['pyproject.toml', 'poetry.lock']
+    variants = list(PYTHON_BACKENDS)
+    input_types = {'path': 'str', 'stdin': 'bytes', 'fd': 'bytes', 'mmap': 'memoryview'}
+    profilers = ['cpu', 'mem']
 
-    def make_scaffold(self, puzzle: Puzzle, input_data_path: Path, scaffold_dir: Path) -> None:
-        super().make_scaffold(puzzle, input_data_path, scaffold_dir)
+    def make_scaffold(self, puzzle: 'Puzzle', input_data_path: Path, scaffold_dir: Path, input_mode: InputMode = DEFAULT_INPUT_MODE) -> None:
+        super().make_scaffold(puzzle, input_data_path, scaffold_dir, input_mode = input_mode)
         manifest_path = scaffold_dir / 'pyproject.toml'
         src_path = self.get_src_path(puzzle, scaffold_dir)
         # use 'poetry init' to create a pyproject.toml file in the same directory as the source file
@@ -24,11 +175,192 @@ class PythonDriver(LanguageDriver):
         assert manifest_path.exists()
         log(f'Created {manifest_path}')
 
+    @property
+    def backend(self) -> str:
+        """Name of the backend running the solution."""
+        return PYTHON_BACKENDS[self.variant]
+
+    @property
+    def is_compiled(self) -> bool:
+        return self.backend in COMPILE_CMDS
+
+    def get_toolchain_version_cmds(self, scaffold_dir: Path) -> list[list[str]]:
+        if (self.backend == 'pypy'):
+            return [[PYPY_CMD, '--version']]
+        # the versions are those of the interpreter (and compiler) in the environment which builds and runs the solution, rather than those on the PATH
+        python = str(self.get_python_path(scaffold_dir))
+        return [[python, '--version']] + [[python, *args] for args in BACKEND_VERSION_ARGS[self.backend]]
+
+    def get_shared_env_dir(self, scaffold_dir: Path) -> Optional[Path]:
+        """If the scaffold directory belongs to a season whose Python scaffolds share a virtualenv, returns the virtualenv's directory.
+        Otherwise, returns None."""
+        venv_dir = scaffold_dir.parent.parent / SHARED_ENV_DIRNAME
+        return venv_dir if (venv_dir / 'pyvenv.cfg').exists() else None
+
+    def make_shared_project(self, season_dir: Path) -> None:
+        # create a virtualenv into which every day's dependencies are installed, so that runs need not go through Poetry
+        venv_dir = season_dir / SHARED_ENV_DIRNAME
+        if (not (venv_dir / 'pyvenv.cfg').exists()):
+            cmd = [sys.executable, '-m', 'venv', str(venv_dir)]
+            log(command2str(cmd))
+            subprocess.run(cmd, check = True)
+            log(f'Created shared virtualenv {venv_dir}')
+
+    def sync_shared_env(self, venv_dir: Path) -> None:
+        """Installs the dependencies of every Python scaffold in the season into the shared virtualenv, if any of their manifests have changed since the last installation."""
+        season_dir = venv_dir.parent
+        sync_env(venv_dir, sorted(season_dir.glob(f'[0-9][0-9]/{self.language}/pyproject.toml')), season_dir)
+
+    def get_pypy_path(self, scaffold_dir: Path) -> Path:
+        """Gets the path to the interpreter of the scaffold's PyPy virtualenv, first creating it (if necessary) and installing any new dependencies into it."""
+        if (shutil.which(PYPY_CMD) is None):
+            raise RuntimeError(f'The pypy variant requires PyPy ({PYPY_CMD}), which was not found')
+        venv_dir = scaffold_dir / PYPY_ENV_DIRNAME
+        with _env_lock:
+            if (not (venv_dir / 'pyvenv.cfg').exists()):
+                cmd = [PYPY_CMD, '-m', 'venv', str(venv_dir)]
+                log(command2str(cmd))
+                subprocess.run(cmd, check = True)
+        sync_env(venv_dir, [scaffold_dir / 'pyproject.toml'], scaffold_dir)
+        return _venv_python(venv_dir)
+
+    def get_python_path(self, scaffold_dir: Path) -> Path:
+        """Gets the path to the interpreter of the scaffold's environment: the season's shared virtualenv if there is one (first installing any new dependencies into it), otherwise the scaffold's own Poetry environment.
+        The Poetry environment's interpreter is resolved once, and cached in the scaffold directory until its manifests change, so that runs need not pay for Poetry's startup."""
+        venv_dir = self.get_shared_env_dir(scaffold_dir)
+        if (venv_dir is not None):
+            self.sync_shared_env(venv_dir)
+            return _venv_python(venv_dir)
+        key = hash_files([path for pattern in self.manifest_patterns for path in scaffold_dir.glob(pattern)], scaffold_dir)
+        cache_path = scaffold_dir / PYTHON_ENV_FILENAME
+        if (python_path := _read_cached_python(cache_path, key)):
+            return python_path
+        # concurrent runs of the same scaffold (e.g. by the test command) resolve the environment only once, rather than racing to create it
+        with _env_lock:
+            if (python_path := _read_cached_python(cache_path, key)):
+                return python_path
+            cmd = ['poetry', 'run', 'python', '-c', 'import sys; print(sys.executable)']
+            log(f'cd {scaffold_dir} && ' + command2str(cmd))
+            proc = subprocess.run(cmd, cwd = scaffold_dir, capture_output = True, text = True)
+            if (proc.returncode != 0) or (not proc.stdout.strip()):
+                raise RuntimeError(f'Failed to find the Poetry environment for {scaffold_dir}\n{proc.stderr}')
+            python_path = Path(proc.stdout.strip().splitlines()[-1])
+            _write_json({'key': key, 'python': str(python_path)}, cache_path)
+        return python_path
+
     def get_exec_path(self, src_path: Path, build_dir: Path) -> Path:
+        if self.is_compiled:  # extension module, given a suffix which any CPython can import
+            return build_dir / f'{src_path.stem}.so'
         return src_path.with_name('main.py')
 
-    def compile_source(self, scaffold_dir: Path, src_path: Path, build_dir: Path) -> None:
-        pass
+    def compile_source(self, scaffold_dir: Path, src_path: Path, build_dir: Path, jobserver: Optional['JobServer'] = None) -> None:
+        if (self.backend == 'pypy'):  # set up the environment, so that a missing interpreter or dependency is reported before running
+            self.get_pypy_path(scaffold_dir)
+        if (not self.is_compiled):
+            return
+        # remove the extension modules of any previous build, so that a failed build cannot leave one behind to be mistaken for its output
+        for path in [self.get_exec_path(src_path, build_dir), *build_dir.glob(f'{src_path.stem}.*.so')]:
+            path.unlink(missing_ok = True)
+        # compile a copy of the source in the build directory, so that the compiler's output (and intermediate files) are kept there
+        build_src_path = build_dir / src_path.name
+        shutil.copy(src_path, build_src_path)
+        cmd = [str(self.get_python_path(scaffold_dir)), *COMPILE_CMDS[self.backend], build_src_path.name]
+        log(f'cd {build_dir} && ' + command2str(cmd))
+        try:
+            returncode = subprocess.run(cmd, cwd = build_dir).returncode
+        finally:
+            build_src_path.unlink()
+        if (returncode != 0):
+            raise RuntimeError(f'Failed to compile {src_path} with {self.backend} (exit code {returncode})')
+        # the compiler names the module with the interpreter's platform-specific suffix (e.g. .cpython-311-x86_64-linux-gnu.so)
+        ext_paths = list(build_dir.glob(f'{src_path.stem}.*.so'))
+        if (len(ext_paths) != 1):
+            raise RuntimeError(f'Expected {self.backend} to produce one extension module for {src_path}, found {len(ext_paths)}')
+        ext_paths[0].replace(self.get_exec_path(src_path, build_dir))
 
     def get_run_args(self, exec_path: Path) -> list[str]:
-        return ['poetry', 'run', 'python', str(exec_path)]
+        if self.is_compiled:
+            # the build directory of a variant is <scaffold_dir>/build/<variant>
+            main_path = exec_path.parents[2] / 'main.py'
+            return [str(self.get_python_path(main_path.parent)), str(LOADER_SCRIPT_PATH), str(exec_path), str(main_path)]
+        if (self.backend == 'pypy'):
+            return [str(self.get_pypy_path(exec_path.parent)), str(exec_path)]
+        return [str(self.get_python_path(exec_path.parent)), str(exec_path)]
+
+    def get_profile_run_args(self, exec_path: Path, profiler: Profiler, output_prefix: Path) -> list[str]:
+        if (self.backend != 'cpython'):
+            raise ValueError(f'Profiling Python solutions requires the default build variant (the {self.backend} backend is not supported)')
+        # run the solution through a wrapper script, which profiles each phase (parse, part1, part2) separately
+        return [str(self.get_python_path(exec_path.parent)), str(PROFILER_SCRIPT_PATH), profiler, str(output_prefix.resolve()), str(exec_path)]
+
+    def parse_run_info(self, stderr: str) -> RunInfo:
+        run_info = super().parse_run_info(stderr)
+        # record the backend, since timings are only comparable between runs with the same one
+        run_info['backend'] = self.backend
+        return run_info
+
+    def load_profile(self, output_prefix: Path) -> Optional[dict[str, Any]]:
+        # the wrapper script saves a summary as JSON, which is moved into the run info
+        summary_path = get_profile_path(output_prefix, '.json')
+        if (not summary_path.exists()):
+            return None
+        with open(summary_path) as f:
+            summary = json.load(f)
+        summary_path.unlink()
+        return summary
+
+    def get_worker_socket_path(self, scaffold_dir: Path) -> Path:
+        """Gets the path of the Unix socket used by the persistent worker for a scaffold directory.
+        (This is kept in the temp directory, since socket paths have a short maximum length.)"""
+        key = hashlib.sha1(str(scaffold_dir.resolve()).encode()).hexdigest()[:16]
+        return Path(tempfile.gettempdir()) / f'aoctool-worker-{key}.sock'
+
+    def _ping_worker(self, socket_path: Path) -> bool:
+        try:
+            return _send_worker_request(socket_path, {'command': 'ping'}).get('status') == 'ok'
+        except OSError:
+            return False
+
+    def start_worker(self, scaffold_dir: Path) -> None:
+        socket_path = self.get_worker_socket_path(scaffold_dir)
+        if self._ping_worker(socket_path):
+            log(f'Worker is already running at {socket_path}')
+            return
+        # run the worker in the puzzle's own environment
+        cmd = [str(self.get_python_path(scaffold_dir)), str(WORKER_SCRIPT_PATH), str(scaffold_dir.resolve()), str(socket_path)]
+        cmd_str = f'cd {scaffold_dir} && ' + command2str(cmd)
+        log(cmd_str)
+        log_path = socket_path.with_suffix('.log')
+        with open(log_path, 'w') as log_file:
+            proc = subprocess.Popen(cmd, cwd = scaffold_dir, stdin = subprocess.DEVNULL, stdout = log_file, stderr = subprocess.STDOUT, start_new_session = True)
+        t0 = time.perf_counter()
+        while (not self._ping_worker(socket_path)):
+            if (proc.poll() is not None) or (time.perf_counter() - t0 > WORKER_STARTUP_TIMEOUT):
+                proc.kill()
+                raise RuntimeError(f'Failed to start worker (see {log_path})')
+            time.sleep(0.05)
+        log(f'Started worker (PID {proc.pid}) listening at {socket_path}')
+
+    def stop_worker(self, scaffold_dir: Path) -> None:
+        socket_path = self.get_worker_socket_path(scaffold_dir)
+        if self._ping_worker(socket_path):
+            _send_worker_request(socket_path, {'command': 'stop'})
+            # wait for the worker to shut down and remove its socket
+            t0 = time.perf_counter()
+            while socket_path.exists() and (time.perf_counter() - t0 < WORKER_STARTUP_TIMEOUT):
+                time.sleep(0.01)
+            log(f'Stopped worker listening at {socket_path}')
+        else:
+            log(f'No worker is running for {scaffold_dir}')
+
+    def run_in_worker(self, scaffold_dir: Path, part: Part) -> Optional[ProcessResult]:
+        if (self.backend != 'cpython'):  # the worker runs the source with CPython
+            return None
+        socket_path = self.get_worker_socket_path(scaffold_dir)
+        if (not socket_path.exists()):
+            return None
+        try:
+            response = _send_worker_request(socket_path, {'command': 'run', 'part': part})
+        except OSError:  # stale socket
+            return None
+        return ProcessResult(response['returncode'], response['stdout'], response['stderr'], ResourceUsage(**response['resources']))
@@ -0,0 +1,35 @@
+"""Runs a Python puzzle solution's main program, with the solution module imported from a compiled extension module (built by mypyc or Cython) rather than from its source file.
+
+The extension module is imported first, under the name of the solution module, so that the main program's import of that module finds it already loaded.
+
+Since this script is run within the puzzle's own Python environment, it must not import anything from aoctool.
+
+Usage: python python_loader.py <extension_path> <main_path> <args...>
+"""
+
+import importlib.util
+from pathlib import Path
+import runpy
+import sys
+
+
+def load_extension(ext_path: Path) -> None:
+    # the module name is the file name up to the first dot (e.g. aoc202301.so -> aoc202301)
+    name = ext_path.name.split('.')[0]
+    # the extension may depend on a shared runtime library built alongside it
+    sys.path.insert(0, str(ext_path.parent))
+    spec = importlib.util.spec_from_file_location(name, ext_path)
+    if (spec is None) or (spec.loader is None):
+        raise ImportError(f'Could not load extension module {ext_path}')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+
+if __name__ == '__main__':
+    (ext_path, main_path) = (Path(sys.argv[1]).resolve(), Path(sys.argv[2]).resolve())
+    # imports are resolved as if the main program were run directly (rather than this script)
+    sys.path[0] = str(main_path.parent)
+    load_extension(ext_path)
+    sys.argv = [str(main_path), *sys.argv[3:]]
+    runpy.run_path(str(main_path), run_name = '__main__')
@@ -0,0 +1,156 @@
+"""Runs a Python puzzle solution under a profiler, saving the results to files with a common path prefix.
+
+The scaffold's main module is imported, and its parse and part functions are wrapped so that each phase is profiled separately (reading the input is excluded).
+    - cpu: profiles with cProfile, saving the combined statistics (<prefix>.pstats), and call stacks weighted by time in microseconds (<prefix>.collapsed)
+    - mem: traces allocations with tracemalloc, saving the call stacks of the allocations still alive at the end of each phase, weighted by size in bytes (<prefix>.collapsed)
+The collapsed stacks (one 'frame;frame;... weight' line per stack, rooted at the phase) can be rendered with flamegraph tools.
+A summary of the hottest functions (or largest allocation sites) is saved to <prefix>.json.
+
+Since this script is run within the puzzle's own Python environment, it must not import anything from aoctool.
+
+Usage: python python_profiler.py <cpu|mem> <output_prefix> <main_path> <part>
+"""
+
+from collections import defaultdict
+import cProfile
+import importlib.util
+import json
+from pathlib import Path
+import pstats
+import sys
+import tracemalloc
+from typing import Any, Callable
+
+
+# number of entries in the summary
+TOP_N = 20
+
+# maximum number of frames stored for each allocation traced by tracemalloc
+MAX_FRAMES = 64
+
+# stacks whose time (in seconds) is below this threshold are omitted when reconstructing stacks from cProfile's call graph
+MIN_STACK_TIME = 1e-6
+
+# pstats key for a function: (filename, line number, function name)
+FuncKey = tuple[str, int, str]
+
+
+def func_label(key: FuncKey) -> str:
+    (filename, line, name) = key
+    if (filename == '~'):  # built-in function
+        return name
+    return f'{name} ({Path(filename).name}:{line})'
+
+def collapse_stats(stats: dict[FuncKey, Any], phase: str, stacks: dict[str, float]) -> None:
+    """Reconstructs call stacks from cProfile's call graph, accumulating the self time of each stack (rooted at the phase) into a dict.
+    cProfile only records the time spent in each caller-callee edge, so each function's time is divided among its callers in proportion to the time of each edge (as most flame graph converters for cProfile do)."""
+    callees: dict[FuncKey, dict[FuncKey, float]] = defaultdict(dict)
+    for (key, (_, _, _, _, callers)) in stats.items():
+        for (caller, (_, _, _, edge_time)) in callers.items():
+            callees[caller][key] = edge_time
+    roots = [key for (key, (_, _, _, _, callers)) in stats.items() if (not callers) and ('_lsprof' not in key[2])]
+
+    def visit(key: FuncKey, path: list[FuncKey], weight: float) -> None:
+        # weight is the fraction of the function's total time spent along this path
+        (_, _, self_time, total_time, _) = stats[key]
+        stack = ';'.join([phase] + [func_label(k) for k in path])
+        stacks[stack] += self_time * weight
+        for (callee, edge_time) in callees[key].items():
+            callee_time = stats[callee][3]
+            if (callee in path) or (callee_time <= 0) or (weight * edge_time < MIN_STACK_TIME):
+                continue
+            visit(callee, path + [callee], weight * edge_time / callee_time)
+
+    for root in roots:
+        visit(root, [root], 1.0)
+
+def summarize_pstats(stats: dict[FuncKey, Any]) -> list[dict[str, Any]]:
+    """Gets the functions with the highest self time."""
+    rows = [
+        {'function': func_label(key), 'calls': num_calls, 'self_time': self_time, 'total_time': total_time}
+        for (key, (_, num_calls, self_time, total_time, _)) in stats.items() if ('_lsprof' not in key[2])
+    ]
+    rows.sort(key = lambda row: row['self_time'], reverse = True)
+    return rows[:TOP_N]
+
+
+class PhaseProfiler:
+    """Wraps the functions of each phase of a solution to profile them, and saves the results."""
+
+    def __init__(self, profiler: str) -> None:
+        if (profiler not in ['cpu', 'mem']):
+            raise ValueError(f'Invalid profiler {profiler!r}')
+        self.profiler = profiler
+        self.cpu_profiles: list[cProfile.Profile] = []
+        # collapsed stacks, with weights in seconds (cpu) or bytes (mem)
+        self.stacks: dict[str, float] = defaultdict(float)
+        self.phases: dict[str, dict[str, Any]] = {}
+
+    def wrap(self, phase: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapped(*args: Any) -> Any:
+            if (self.profiler == 'cpu'):
+                prof = cProfile.Profile()
+                result = prof.runcall(func, *args)
+                self.cpu_profiles.append(prof)
+                stats = pstats.Stats(prof).stats  # type: ignore[attr-defined]
+                collapse_stats(stats, phase, self.stacks)
+            else:
+                tracemalloc.start(MAX_FRAMES)
+                try:
+                    result = func(*args)
+                    # the result is still referenced, so the snapshot includes the memory it occupies
+                    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+                    (retained, peak) = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                for stat in snapshot.statistics('traceback'):
+                    stack = ';'.join([phase] + [f'{Path(frame.filename).name}:{frame.lineno}' for frame in stat.traceback])
+                    self.stacks[stack] += stat.size
+                top = [{'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}', 'size': stat.size, 'count': stat.count} for stat in snapshot.statistics('lineno')[:TOP_N]]
+                self.phases[phase] = {'peak': peak, 'retained': retained, 'top': top}
+            return result
+        return wrapped
+
+    def save(self, output_prefix: Path) -> None:
+        summary: dict[str, Any] = {'profiler': self.profiler}
+        collapsed_path = output_prefix.with_name(output_prefix.name + '.collapsed')
+        if (self.profiler == 'cpu'):
+            (first, *rest) = self.cpu_profiles
+            stats = pstats.Stats(first)
+            for prof in rest:
+                stats.add(prof)
+            pstats_path = output_prefix.with_name(output_prefix.name + '.pstats')
+            stats.dump_stats(pstats_path)
+            summary['pstats'] = str(pstats_path)
+            summary['top'] = summarize_pstats(stats.stats)  # type: ignore[attr-defined]
+            lines = [f'{stack} {round(weight * 1e6)}' for (stack, weight) in self.stacks.items() if (round(weight * 1e6) > 0)]
+        else:
+            summary['phases'] = self.phases
+            lines = [f'{stack} {int(weight)}' for (stack, weight) in self.stacks.items() if (weight > 0)]
+        collapsed_path.write_text(''.join(line + '\n' for line in lines))
+        summary['collapsed'] = str(collapsed_path)
+        with open(output_prefix.with_name(output_prefix.name + '.json'), 'w') as f:
+            json.dump(summary, f, indent = 4)
+
+
+if __name__ == '__main__':
+
+    (profiler, output_prefix, main_path, part) = (sys.argv[1], Path(sys.argv[2]), Path(sys.argv[3]).resolve(), int(sys.argv[4]))
+    sys.path.insert(0, str(main_path.parent))
+    spec = importlib.util.spec_from_file_location('__aoc_main__', main_path)
+    assert (spec is not None)
+    assert (spec.loader is not None)
+    # typed as Any, since the parse and solve_funcs attributes are replaced below
+    main: Any = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main)
+    phase_profiler = PhaseProfiler(profiler)
+    if hasattr(main, 'parse') and hasattr(main, 'solve_funcs'):
+        main.parse = phase_profiler.wrap('parse', main.parse)
+        main.solve_funcs = {p: phase_profiler.wrap(f'part{p}', func) for (p, func) in main.solve_funcs.items()}
+        solution = main.solve(part)
+    else:  # non-standard main program: profile the whole solve function as one phase
+        solution = phase_profiler.wrap('solve', main.solve)(part)
+    phase_profiler.save(output_prefix)
+    if (solution is None):
+        sys.exit(1)
+    print(solution)
@@ -0,0 +1,142 @@
+"""Persistent worker process which runs a Python puzzle solution on request.
+
+The worker imports the scaffold's main module once, then answers requests (one JSON line per connection) over a Unix socket.
+The solution modules are only reloaded when the content of a source file in the scaffold directory changes.
+
+Since this script is run within the puzzle's own Python environment, it must not import anything from aoctool.
+
+Usage: python python_worker.py <scaffold_dir> <socket_path>
+"""
+
+from contextlib import redirect_stderr, redirect_stdout
+import hashlib
+import importlib.util
+from io import StringIO
+import json
+from pathlib import Path
+import resource
+import socket
+import sys
+import time
+import traceback
+from types import ModuleType
+from typing import Any, Optional
+
+
+class SolverWorker:
+    """Holds the loaded main module of a Python scaffold, reloading it when the source files change."""
+
+    def __init__(self, scaffold_dir: Path) -> None:
+        self.scaffold_dir = scaffold_dir
+        self.main: Optional[ModuleType] = None
+        # (mtime, size) and content hash of each source file, as of the last load
+        self.stats: dict[Path, tuple[int, int]] = {}
+        self.hashes: dict[Path, str] = {}
+
+    def is_stale(self) -> bool:
+        """Checks whether any source file has changed since the modules were loaded.
+        Files whose mtime and size are unchanged are not rehashed."""
+        paths = sorted(self.scaffold_dir.glob('*.py'))
+        stale = (self.main is None) or (set(paths) != set(self.stats))
+        for path in set(self.stats).difference(paths):
+            del self.stats[path]
+            del self.hashes[path]
+        for path in paths:
+            st = path.stat()
+            stat = (st.st_mtime_ns, st.st_size)
+            if (self.stats.get(path) != stat):
+                self.stats[path] = stat
+                digest = hashlib.sha256(path.read_bytes()).hexdigest()
+                if (self.hashes.get(path) != digest):
+                    self.hashes[path] = digest
+                    stale = True
+        return stale
+
+    def load(self) -> None:
+        """(Re)imports the main module, along with any modules it imports from the scaffold directory."""
+        for (name, mod) in list(sys.modules.items()):
+            mod_file = getattr(mod, '__file__', None)
+            if mod_file and (Path(mod_file).parent == self.scaffold_dir):
+                del sys.modules[name]
+        self.main = None
+        spec = importlib.util.spec_from_file_location('__aoc_main__', self.scaffold_dir / 'main.py')
+        assert (spec is not None)
+        assert (spec.loader is not None)
+        main = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(main)
+        except BaseException:
+            # force a retry on the next request
+            self.stats.clear()
+            self.hashes.clear()
+            raise
+        self.main = main
+
+    def run(self, part: int) -> dict[str, Any]:
+        """Runs one part of the puzzle, emulating a run of main.py as a subprocess.
+        Returns a dict with the return code, captured stdout/stderr, and resource usage of the worker process during the run."""
+        stdout, stderr = StringIO(), StringIO()
+        returncode = 0
+        t0 = time.perf_counter()
+        ru0 = resource.getrusage(resource.RUSAGE_SELF)
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                if self.is_stale():
+                    self.load()
+                assert (self.main is not None)
+                solution = self.main.solve(part)
+                if (solution is None):
+                    returncode = 1
+                else:
+                    print(solution)
+            except SystemExit as e:
+                returncode = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+        ru1 = resource.getrusage(resource.RUSAGE_SELF)
+        resources = {
+            'wall_time': time.perf_counter() - t0,
+            'user_time': ru1.ru_utime - ru0.ru_utime,
+            'system_time': ru1.ru_stime - ru0.ru_stime,
+            # peak memory is over the lifetime of the worker
+            'max_rss': ru1.ru_maxrss * 1024,
+            'minor_faults': ru1.ru_minflt - ru0.ru_minflt,
+            'major_faults': ru1.ru_majflt - ru0.ru_majflt,
+            'voluntary_switches': ru1.ru_nvcsw - ru0.ru_nvcsw,
+            'involuntary_switches': ru1.ru_nivcsw - ru0.ru_nivcsw,
+        }
+        return {'returncode': returncode, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'resources': resources}
+
+
+def serve(worker: SolverWorker, socket_path: Path) -> None:
+    """Serves requests on a Unix socket until a 'stop' request is received."""
+    if socket_path.exists():
+        socket_path.unlink()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path))
+        server.listen()
+        try:
+            while True:
+                (conn, _) = server.accept()
+                with conn, conn.makefile('rb') as f:
+                    request = json.loads(f.readline())
+                    command = request.get('command')
+                    if (command == 'run'):
+                        response = worker.run(request['part'])
+                    elif (command in ['ping', 'stop']):
+                        response = {'status': 'ok'}
+                    else:
+                        response = {'error': f'invalid command {command!r}'}
+                    conn.sendall(json.dumps(response).encode() + b'\n')
+                if (command == 'stop'):
+                    break
+        finally:
+            socket_path.unlink(missing_ok = True)
+
+
+if __name__ == '__main__':
+
+    scaffold_dir = Path(sys.argv[1]).resolve()
+    sys.path.insert(0, str(scaffold_dir))
+    serve(SolverWorker(scaffold_dir), Path(sys.argv[2]))
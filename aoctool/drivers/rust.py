@@ -1,38 +1,152 @@
+import os
 from pathlib import Path
 import subprocess
+import threading
+from typing import TYPE_CHECKING, Any, Optional
 
 import toml
 
-from aoctool.drivers._base import LanguageDriver
-from aoctool.utils import Puzzle, command2str, log
+from aoctool.drivers._base import DEFAULT_VARIANT, LanguageDriver
+from aoctool.profiling import get_perf_record_args, load_perf_profile, perf_is_available
+from aoctool.utils import DEFAULT_INPUT_MODE, InputMode, Profiler, command2str, log
+
+
+if TYPE_CHECKING:
+    from aoctool.puzzle import Puzzle
+    from aoctool.scheduler import JobServer
+
+
+# crates needed by the main program for each input mode
+INPUT_MODE_DEPENDENCIES: dict[str, dict[str, str]] = {
+    'path': {},
+    'stdin': {},
+    'fd': {},
+    'mmap': {'memmap2': '0.9'},
+}
+
+# extra cargo options for each build variant
+CARGO_OPTIONS = {
+    'release': [],
+    # keep debug symbols and frame pointers, so that profilers can resolve functions and walk call stacks
+    'profile': ['--config', 'profile.release.debug=true', '--config', 'build.rustflags=["-C", "force-frame-pointers=yes"]'],
+}
+
+# guards updates to workspace manifests, since multiple scaffolds may be created concurrently
+_workspace_lock = threading.Lock()
+
+
+def _write_manifest(manifest: dict[str, Any], path: Path) -> None:
+    """Writes a Cargo manifest atomically, so that concurrent readers never see a partial file."""
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}')
+    with open(tmp_path, 'w') as f:
+        toml.dump(manifest, f)
+    tmp_path.replace(path)
 
 
 class RustDriver(LanguageDriver):
 
     language = 'rust'
     file_extension = 'rs'
-    is_compiled = True
+    compiled = True
+    manifest_patterns = ['Cargo.toml', 'Cargo.lock']
+    toolchain_version_cmds = [['cargo', '--version'], ['rustc', '--version']]
+    variants = list(CARGO_OPTIONS)
+    input_types = {'path': '&str', 'stdin': '&[u8]', 'fd': '&[u8]', 'mmap': '&[u8]'}
+    profilers = ['cpu']
+
+    def get_workspace_dir(self, scaffold_dir: Path) -> Optional[Path]:
+        """If the scaffold directory belongs to a season-level Cargo workspace, returns the workspace directory.
+        Otherwise, returns None."""
+        workspace_dir = scaffold_dir.parent.parent
+        manifest_path = workspace_dir / 'Cargo.toml'
+        if manifest_path.exists() and ('workspace' in toml.load(manifest_path)):
+            return workspace_dir
+        return None
 
-    def make_scaffold(self, puzzle: Puzzle, input_data_path: Path, scaffold_dir: Path) -> None:
-        super().make_scaffold(puzzle, input_data_path, scaffold_dir)
+    def _register_workspace_members(self, workspace_dir: Path) -> None:
+        """Registers every Rust scaffold in the season directory as a member of its Cargo workspace."""
+        manifest_path = workspace_dir / 'Cargo.toml'
+        with _workspace_lock:
+            manifest = toml.load(manifest_path)
+            workspace = manifest['workspace']
+            members = set(workspace.get('members', []))
+            new_members = {str(path.parent.relative_to(workspace_dir)) for path in workspace_dir.glob(f'[0-9][0-9]/{self.language}/Cargo.toml')}
+            if (not new_members.issubset(members)):
+                workspace['members'] = sorted(members | new_members)
+                _write_manifest(manifest, manifest_path)
+                log(f'Registered workspace member(s) {", ".join(sorted(new_members - members))} in {manifest_path}')
+
+    def make_shared_project(self, season_dir: Path) -> None:
+        # create a Cargo workspace, so that all days share one lock file and target directory
+        manifest_path = season_dir / 'Cargo.toml'
+        if (not manifest_path.exists()):
+            manifest = {'workspace': {'members': [], 'resolver': '2'}}
+            _write_manifest(manifest, manifest_path)
+            log(f'Created workspace {manifest_path}')
+        self._register_workspace_members(season_dir)
+
+    def make_scaffold(self, puzzle: 'Puzzle', input_data_path: Path, scaffold_dir: Path, input_mode: InputMode = DEFAULT_INPUT_MODE) -> None:
+        super().make_scaffold(puzzle, input_data_path, scaffold_dir, input_mode = input_mode)
         # create a Cargo.toml file in the same directory as the source file
         manifest_path = scaffold_dir / 'Cargo.toml'
         src_path = self.get_src_path(puzzle, scaffold_dir)
         manifest = {
             'package': {'name': src_path.stem, 'version': '0.1.0'},
             'bin': [{'name': src_path.stem, 'path': 'main.rs'}],
-            'dependencies': {},
+            'dependencies': dict(INPUT_MODE_DEPENDENCIES[input_mode]),
         }
-        with open(manifest_path, 'w') as f:
-            toml.dump(manifest, f)
+        _write_manifest(manifest, manifest_path)
         log(f'Created {manifest_path}')
+        workspace_dir = self.get_workspace_dir(scaffold_dir)
+        if (workspace_dir is not None):
+            self._register_workspace_members(workspace_dir)
+
+    def get_build_inputs(self, scaffold_dir: Path) -> list[Path]:
+        paths = super().get_build_inputs(scaffold_dir)
+        workspace_dir = self.get_workspace_dir(scaffold_dir)
+        if (workspace_dir is not None):
+            paths += [path for path in [workspace_dir / 'Cargo.toml', workspace_dir / 'Cargo.lock'] if path.exists()]
+        return paths
+
+    def get_target_dir(self, scaffold_dir: Path, build_dir: Path) -> Path:
+        """Gets cargo's target directory. Scaffolds in a workspace share a target directory (one for each build variant)."""
+        workspace_dir = self.get_workspace_dir(scaffold_dir)
+        if (workspace_dir is None):
+            return build_dir
+        return workspace_dir / ('target' if (self.variant == DEFAULT_VARIANT) else f'target-{self.variant}')
 
     def get_exec_path(self, src_path: Path, build_dir: Path) -> Path:
-        return build_dir / 'release' / src_path.stem
+        return self.get_target_dir(src_path.parent, build_dir) / 'release' / src_path.stem
 
-    def compile_source(self, scaffold_dir: Path, src_path: Path, build_dir: Path) -> None:
-        manifest_path = scaffold_dir / 'Cargo.toml'
-        build_cmd = ['cargo', 'build', '--release', '--manifest-path', str(manifest_path), '--target-dir', str(build_dir)]
+    def get_build_flags(self) -> list[str]:
+        return ['--release', *CARGO_OPTIONS[self.variant]]
+
+    def get_shared_build_dir(self, scaffold_dir: Path, build_dir: Path) -> Optional[Path]:
+        return None if (self.get_workspace_dir(scaffold_dir) is None) else self.get_target_dir(scaffold_dir, build_dir)
+
+    def compile_source(self, scaffold_dir: Path, src_path: Path, build_dir: Path, jobserver: Optional['JobServer'] = None) -> None:
+        workspace_dir = self.get_workspace_dir(scaffold_dir)
+        target_dir = self.get_target_dir(scaffold_dir, build_dir)
+        if (workspace_dir is None):
+            manifest_path = scaffold_dir / 'Cargo.toml'
+            build_cmd = ['cargo', 'build', *self.get_build_flags(), '--manifest-path', str(manifest_path), '--target-dir', str(target_dir)]
+        else:  # build only this day's package, within the shared target directory
+            manifest_path = workspace_dir / 'Cargo.toml'
+            build_cmd = ['cargo', 'build', *self.get_build_flags(), '--manifest-path', str(manifest_path), '--package', src_path.stem, '--target-dir', str(target_dir)]
         build_cmd_str = command2str(build_cmd)
         log(build_cmd_str)
-        subprocess.run(build_cmd)
+        # cargo joins the jobserver, limiting its parallel rustc jobs to the available tokens
+        kwargs = {} if (jobserver is None) else jobserver.get_subprocess_kwargs()
+        subprocess.run(build_cmd, **kwargs)
+
+    def get_profile_run_args(self, exec_path: Path, profiler: Profiler, output_prefix: Path) -> list[str]:
+        if (profiler != 'cpu'):
+            return super().get_profile_run_args(exec_path, profiler, output_prefix)
+        if (not perf_is_available()):
+            raise RuntimeError('Profiling Rust executables requires perf, which was not found')
+        if (self.variant != 'profile'):
+            log('For function names and complete call stacks, compile with --variant profile')
+        return get_perf_record_args(output_prefix) + self.get_run_args(exec_path)
+
+    def load_profile(self, output_prefix: Path) -> Optional[dict[str, Any]]:
+        return load_perf_profile(output_prefix)
@@ -0,0 +1,124 @@
+"""Persistent history of profiled runs, stored in a local SQLite database."""
+
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import platform
+import sqlite3
+import subprocess
+from typing import Any, Optional
+import uuid
+
+from aoctool.utils import AnyPath, Part, flatten_dict
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    year INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    language TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    part INTEGER NOT NULL,
+    tag TEXT,
+    source_hash TEXT NOT NULL,
+    toolchain TEXT NOT NULL,
+    git_revision TEXT,
+    host TEXT NOT NULL,
+    solution INTEGER,
+    returncode INTEGER NOT NULL,
+    run_info TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_puzzle ON runs (year, day, language, variant, part, timestamp);
+"""
+
+
+def get_host_info() -> dict[str, Any]:
+    """Gets information about the machine, since measurements from different machines are not comparable."""
+    return {
+        'hostname': platform.node(),
+        'system': platform.system(),
+        'release': platform.release(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+def get_git_revision(path: AnyPath, rev: str = 'HEAD') -> Optional[str]:
+    """Resolves a git revision (e.g. 'HEAD', a branch, or a short hash) to a full commit hash, within the repository containing the given path.
+    Returns None if the path is not in a git repository or the revision does not exist."""
+    try:
+        proc = subprocess.run(['git', 'rev-parse', '--verify', '--quiet', f'{rev}^{{commit}}'], cwd = path, capture_output = True, text = True)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return proc.stdout.strip() if ((proc.returncode == 0) and proc.stdout.strip()) else None
+
+def new_session_id() -> str:
+    """Generates a unique ID for a session (a group of runs measured together)."""
+    return uuid.uuid4().hex
+
+
+@dataclass
+class RunRecord:
+    """A profiled run of a puzzle solution, as stored in the history."""
+    session: str
+    timestamp: float
+    year: int
+    day: int
+    language: str
+    variant: str
+    part: Part
+    tag: Optional[str]
+    source_hash: str
+    toolchain: str
+    git_revision: Optional[str]
+    host: dict[str, Any]
+    solution: Optional[int]
+    returncode: int
+    run_info: dict[str, Any]
+
+    @property
+    def metrics(self) -> dict[str, float]:
+        """Gets all numeric metrics from the run info, as a flat dict with dot-separated names (e.g. 'timings.part1')."""
+        return {key: float(val) for (key, val) in flatten_dict(self.run_info).items() if isinstance(val, int | float) and (not isinstance(val, bool))}
+
+
+@dataclass
+class RunHistory:
+    """Stores a record of every profiled run in an SQLite database."""
+    db_path: Path
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents = True, exist_ok = True)
+        # wait on locks, since multiple processes may record runs concurrently
+        conn = sqlite3.connect(self.db_path, timeout = 60)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SCHEMA)
+        return conn
+
+    def add(self, record: RunRecord) -> None:
+        """Appends a run record to the history."""
+        row = {**record.__dict__, 'host': json.dumps(record.host), 'run_info': json.dumps(record.run_info)}
+        columns = ', '.join(row)
+        placeholders = ', '.join(f':{key}' for key in row)
+        with self._connect() as conn:
+            conn.execute(f'INSERT INTO runs ({columns}) VALUES ({placeholders})', row)
+        conn.close()
+
+    def get_records(self, year: int, day: int, language: str, variant: str, part: Part, **filters: Any) -> list[RunRecord]:
+        """Gets all records of successful runs of a puzzle solution, in chronological order.
+        Additional keyword arguments filter on other columns."""
+        conditions = {'year': year, 'day': day, 'language': language, 'variant': variant, 'part': part, **filters}
+        where = ' AND '.join(f'{key} = :{key}' for key in conditions)
+        with self._connect() as conn:
+            rows = conn.execute(f'SELECT * FROM runs WHERE {where} AND returncode = 0 ORDER BY timestamp, id', conditions).fetchall()
+        conn.close()
+        records = []
+        for row in rows:
+            fields = {key: row[key] for key in row.keys() if (key != 'id')}
+            fields.update(host = json.loads(fields['host']), run_info = json.loads(fields['run_info']))
+            records.append(RunRecord(**fields))
+        return records
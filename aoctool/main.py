@@ -2,31 +2,49 @@
 
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
 from importlib import import_module
+import sys
 from types import ModuleType
+from typing import NamedTuple, Optional
 
 from aoctool.utils import validate_args
 
 
-COMMANDS = [
-    'download',
-    'scaffold',
-    'compile',
-    'run',
-]
+class Command(NamedTuple):
+    """Subcommand of the CLI, which can be registered without importing the module implementing it."""
+    module: str       # name of the module implementing the command (with configure_parser and run functions)
+    description: str  # description of the command, shown in the help
+
+
+# table of commands, which is the only place their descriptions are kept, so that the top-level help can be displayed without importing every command
+COMMANDS = {
+    'download': Command('aoctool.commands.download', 'Download data from Advent of Code website.'),
+    'scaffold': Command('aoctool.commands.scaffold', 'Create a scaffold for solving a puzzle in a particular programming language.'),
+    'compile': Command('aoctool.commands.compile', 'Compile a source file to an executable for a particular programming language.'),
+    'run': Command('aoctool.commands.run', 'Run an executable to compute the puzzle solution.'),
+    'test': Command('aoctool.commands.test', 'Check puzzle solutions against the examples in the puzzle description and the real input, running the checks concurrently.'),
+    'scale': Command('aoctool.commands.scale', 'Run a puzzle solution on synthetic inputs of growing size to estimate its empirical complexity.'),
+    'bench': Command('aoctool.commands.bench', 'Benchmark puzzle solutions with repeated runs, comparing them across languages and against earlier runs to detect performance regressions.'),
+    'profile': Command('aoctool.commands.profile', 'Compile and run many puzzle solutions in parallel, gathering diagnostics into a single file.'),
+    'worker': Command('aoctool.commands.worker', 'Start or stop a persistent worker process which runs a puzzle solution without per-run startup costs.'),
+}
 
 def get_module_for_command(name: str) -> ModuleType:
-    return import_module(f'aoctool.commands.{name}')
+    return import_module(COMMANDS[name].module)
 
-def main() -> None:
+def main(argv: Optional[list[str]] = None) -> None:
+    argv = sys.argv[1:] if (argv is None) else argv
     parser = ArgumentParser(description = __doc__, formatter_class = ArgumentDefaultsHelpFormatter)
     subparsers = parser.add_subparsers(help = 'command', dest = 'command')
-    for name in COMMANDS:
-        mod = get_module_for_command(name)
-        doc = mod.__doc__ or ''
-        help_str = doc[0].lower() + doc[1:].rstrip('.')
-        subparser = subparsers.add_parser(name, help = help_str, description = doc, formatter_class = ArgumentDefaultsHelpFormatter)
-        mod.configure_parser(subparser)
-    args = parser.parse_args()
+    # the top-level parser has no options other than help, so the first positional argument is the command
+    # only that command's module is imported, to configure its arguments
+    selected = next((arg for arg in argv if not arg.startswith('-')), None)
+    for (name, command) in COMMANDS.items():
+        desc = command.description
+        help_str = desc[0].lower() + desc[1:].rstrip('.')
+        subparser = subparsers.add_parser(name, help = help_str, description = desc, formatter_class = ArgumentDefaultsHelpFormatter)
+        if (name == selected):
+            get_module_for_command(name).configure_parser(subparser)
+    args = parser.parse_args(argv)
     validate_args(args)
     mod = get_module_for_command(args.command)
     mod.run(args)
@@ -0,0 +1,103 @@
+"""Collecting and summarizing the results of profilers."""
+
+from collections import Counter
+from pathlib import Path
+import re
+import shutil
+import subprocess
+from typing import Any, Mapping, Optional
+
+from aoctool.utils import log
+
+
+# number of entries in a profile's summary
+TOP_N = 20
+
+# sampling frequency (Hz) of perf, so that each sample accounts for a known amount of CPU time
+PERF_FREQUENCY = 999
+
+# a frame of a call chain printed by 'perf script': address, symbol (with an offset), and the object file (DSO) containing it
+PERF_FRAME_PATTERN = re.compile(r'^\s+[0-9a-f]+\s+(.+?)\s+\((.*)\)$')
+PERF_OFFSET_PATTERN = re.compile(r'\+0x[0-9a-f]+$')
+
+
+def get_profile_path(output_prefix: Path, suffix: str) -> Path:
+    """Gets the path of one of the files saved by a profiler, given the common prefix of their paths."""
+    return output_prefix.with_name(output_prefix.name + suffix)
+
+def write_collapsed_stacks(stacks: Mapping[str, float], path: Path) -> None:
+    """Writes call stacks in the collapsed format used by flame graph tools: one 'frame;frame;... weight' line per stack (root first), with integer weights."""
+    lines = [f'{stack} {round(weight)}' for (stack, weight) in stacks.items() if (round(weight) > 0)]
+    path.write_text(''.join(line + '\n' for line in lines))
+
+def log_profile_summary(summary: Mapping[str, Any]) -> None:
+    """Logs the paths of the files saved by a profiler, along with the functions with the most self time."""
+    for key in ['pstats', 'perf_data', 'prof', 'collapsed']:
+        if (key in summary):
+            log(f'Saved profile to {summary[key]}')
+    top = [row for row in summary.get('top', []) if ('self_time' in row)][:5]
+    if top:
+        log('Functions with the most self time:\n' + '\n'.join(f'{row["self_time"]:10.6f}s  {row["function"]}' for row in top))
+
+
+########
+# PERF #
+########
+
+def perf_is_available() -> bool:
+    return shutil.which('perf') is not None
+
+def get_perf_record_args(output_prefix: Path) -> list[str]:
+    """Gets the arguments to prefix a command with, so that it is sampled by 'perf record' (following call chains via frame pointers)."""
+    data_path = get_profile_path(output_prefix, '.perf.data')
+    return ['perf', 'record', '--quiet', '--freq', str(PERF_FREQUENCY), '--call-graph', 'fp', '--output', str(data_path), '--']
+
+def parse_perf_script(output: str) -> Counter[tuple[str, ...]]:
+    """Parses the output of 'perf script' into the number of samples of each call stack (root first).
+    Symbols are stripped of their offsets; unresolved symbols are labeled by their object file."""
+    stacks: Counter[tuple[str, ...]] = Counter()
+    for block in re.split(r'\n\s*\n', output):
+        frames = []
+        for line in block.splitlines():
+            if (match := PERF_FRAME_PATTERN.match(line)):
+                (symbol, dso) = match.groups()
+                symbol = PERF_OFFSET_PATTERN.sub('', symbol)
+                if (symbol == '[unknown]'):
+                    symbol = f'[{Path(dso).name}]'
+                frames.append(symbol)
+        if frames:
+            stacks[tuple(reversed(frames))] += 1
+    return stacks
+
+def summarize_perf_stacks(stacks: Counter[tuple[str, ...]]) -> list[dict[str, Any]]:
+    """Gets the functions with the most samples in which they are the innermost frame (i.e. the most self time)."""
+    total = sum(stacks.values())
+    self_samples: Counter[str] = Counter()
+    for (stack, count) in stacks.items():
+        self_samples[stack[-1]] += count
+    return [
+        {'function': func, 'samples': count, 'self_time': count / PERF_FREQUENCY, 'self_fraction': count / total}
+        for (func, count) in self_samples.most_common(TOP_N)
+    ]
+
+def load_perf_profile(output_prefix: Path) -> Optional[dict[str, Any]]:
+    """After a run under 'perf record', extracts the call stacks from its data file, saving them in collapsed format.
+    Returns a summary of the profile, or None if there is no data."""
+    data_path = get_profile_path(output_prefix, '.perf.data')
+    if (not data_path.exists()):
+        return None
+    proc = subprocess.run(['perf', 'script', '--input', str(data_path), '--fields', 'ip,sym,dso'], capture_output = True, text = True)
+    if (proc.returncode != 0):
+        log(f'Failed to read perf data {data_path}: {proc.stderr.strip()}')
+        return None
+    stacks = parse_perf_script(proc.stdout)
+    collapsed_path = get_profile_path(output_prefix, '.collapsed')
+    # weights are microseconds of CPU time
+    write_collapsed_stacks({';'.join(stack): count / PERF_FREQUENCY * 1e6 for (stack, count) in stacks.items()}, collapsed_path)
+    return {
+        'profiler': 'cpu',
+        'perf_data': str(data_path),
+        'collapsed': str(collapsed_path),
+        'samples': sum(stacks.values()),
+        'top': summarize_perf_stacks(stacks),
+    }
@@ -0,0 +1,91 @@
+"""Advent of Code puzzles.
+This is kept separate from aoctool.utils since importing aocd is slow, and most commands only need it when run."""
+
+from argparse import Namespace
+from functools import cache
+import time
+
+from aocd.exceptions import AocdError
+import aocd.models
+from aocd.models import User
+from urllib3.exceptions import HTTPError
+
+from aoctool.cache import PUZZLE_STATE_TTL, PuzzleState, PuzzleStateCache, get_puzzle_state_key, get_user_cache_dir
+from aoctool.utils import Part, get_default_session_cookie, log
+
+
+@cache
+def get_user(token: str) -> User:
+    """Gets the AoC user with the given session token.
+    Users are cached, so that the user ID (which may require a request to the server) is only looked up once."""
+    return User(token)
+
+def get_puzzle_state_cache() -> PuzzleStateCache:
+    return PuzzleStateCache(get_user_cache_dir() / 'puzzle_state.json')
+
+
+class Puzzle(aocd.models.Puzzle):
+    # time (seconds) for which a cached unanswered state is trusted
+    state_ttl: float = PUZZLE_STATE_TTL
+
+    @property
+    def name(self) -> str:
+        return f'aoc{self.year}{self.day:02d}'
+
+    @property
+    def date_string(self) -> str:
+        return f'{self.year}-12-{self.day:02d}'
+
+    @property
+    def state_key(self) -> str:
+        return get_puzzle_state_key(self.user.token, self.year, self.day)
+
+    @property
+    def current_part(self) -> Part:
+        """Gets the current part of the puzzle.
+        If part 1 is not complete, returns 1.
+        Otherwise, returns 2.
+        The local puzzle state cache is consulted first; the AoC server is only checked if the cached state is missing or has expired.
+        If the server cannot be reached, an expired state is used instead."""
+        state = get_puzzle_state_cache().get(self.state_key)
+        if (state is not None) and state.is_fresh(self.state_ttl):
+            return state.current_part
+        try:
+            return self.fetch_current_part()
+        except (AocdError, HTTPError) as e:
+            if (state is None):
+                raise
+            log(f'WARNING: failed to check the state of puzzle {self.date_string} ({e}), using cached state')
+            return state.current_part
+
+    def fetch_current_part(self) -> Part:
+        """Gets the current part of the puzzle from aocd (which may make a request to the AoC server), saving it to the puzzle state cache."""
+        part: Part = 2 if self.answered_a else 1
+        self.save_state()
+        return part
+
+    @property
+    def local_answers(self) -> dict[str, str]:
+        """Gets the correct answers to the solved parts (keyed by part number), as recorded by aocd on the local filesystem.
+        Unlike answer_a and answer_b, this never makes a request to the AoC server."""
+        answers = {}
+        for (part, path) in [('1', self.answer_a_path), ('2', self.answer_b_path)]:
+            if path.is_file():
+                answers[part] = path.read_text().strip()
+        return answers
+
+    def save_state(self) -> None:
+        """Saves the puzzle's answered parts (as recorded by aocd on the local filesystem) to the puzzle state cache."""
+        get_puzzle_state_cache().put(self.state_key, PuzzleState(self.local_answers, time.time()))
+
+    @classmethod
+    def from_token(cls, year: int, day: int, token: str) -> 'Puzzle':
+        return cls(year, day, user = get_user(token))
+
+    @classmethod
+    def from_args(cls, args: Namespace) -> 'Puzzle':
+        if (getattr(args, 'session', None) is None):
+            token = get_default_session_cookie()
+        else:
+            token = args.session
+        return cls.from_token(args.year, args.day, token)
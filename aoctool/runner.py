@@ -0,0 +1,344 @@
+"""Running subprocesses while capturing their output and resource usage."""
+
+import codecs
+from collections import deque
+from dataclasses import asdict, dataclass, fields
+import gzip
+import itertools
+import os
+from pathlib import Path
+import re
+import resource
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import IO, Any, Literal, NamedTuple, Optional, TextIO
+
+
+CHUNK_SIZE = 65536
+
+# default maximum number of characters of each output stream kept in memory
+MAX_CAPTURE_SIZE = 1 << 20
+
+# default maximum number of characters of each output stream echoed to the terminal per second
+ECHO_RATE = 1 << 18
+
+CGROUP_ROOT = Path('/sys/fs/cgroup')
+
+# messages printed by various language runtimes when memory allocation fails
+OUT_OF_MEMORY_PATTERN = re.compile(r'MemoryError|memory allocation of \d+ bytes failed|[Oo]ut of memory|[Hh]eap exhausted|Cannot allocate memory')
+
+# type of limit which caused a process to be terminated
+LimitType = Literal['timeout', 'memory']
+
+_cgroup_counter = itertools.count()
+
+
+@dataclass
+class ResourceUsage:
+    """Resources used by a child process (including any descendants it waited for)."""
+    wall_time: float           # elapsed time (seconds)
+    user_time: float           # user CPU time (seconds)
+    system_time: float         # system CPU time (seconds)
+    max_rss: int               # peak resident set size (bytes)
+    minor_faults: int          # page faults not requiring I/O
+    major_faults: int          # page faults requiring I/O
+    voluntary_switches: int    # context switches due to the process blocking
+    involuntary_switches: int  # context switches due to preemption
+
+    @classmethod
+    def from_rusage(cls, rusage: Any, wall_time: float) -> 'ResourceUsage':
+        return cls(
+            wall_time = wall_time,
+            user_time = rusage.ru_utime,
+            system_time = rusage.ru_stime,
+            max_rss = rusage.ru_maxrss * 1024,  # Linux reports kilobytes
+            minor_faults = rusage.ru_minflt,
+            major_faults = rusage.ru_majflt,
+            voluntary_switches = rusage.ru_nvcsw,
+            involuntary_switches = rusage.ru_nivcsw,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class ResourceLimits:
+    """Limits on the resources a child process (and its descendants) may use."""
+    timeout: Optional[float] = None   # wall-clock time (seconds)
+    max_memory: Optional[int] = None  # memory (bytes)
+    cpus: Optional[int] = None        # number of CPUs
+    affinity: Optional[list[int]] = None  # specific CPUs to pin the process to
+
+    @property
+    def is_set(self) -> bool:
+        """True if any limit is set."""
+        return any(getattr(self, fld.name) is not None for fld in fields(self))
+
+
+class OutputCapture:
+    """Captures the text of an output stream as it is produced, keeping a bounded amount of it in memory.
+    The end of the stream is kept in a ring buffer of complete lines, holding roughly max_size characters. Lines dropped from the buffer are discarded, except those beginning with one of the keep_prefixes.
+    If a log path is given, once the stream overflows the buffer, its full text is saved to a gzip-compressed file.
+    If an echo stream is given, the text is also echoed to it, but at most echo_rate characters per second (the rest is skipped, with a note saying how much)."""
+
+    def __init__(self, max_size: int = MAX_CAPTURE_SIZE, keep_prefixes: tuple[str, ...] = (), log_path: Optional[Path] = None, echo: Optional[TextIO] = None, echo_rate: int = ECHO_RATE) -> None:
+        self.max_size = max_size
+        self.keep_pattern = re.compile('^(?:' + '|'.join(map(re.escape, keep_prefixes)) + ').*\n', re.MULTILINE) if keep_prefixes else None
+        self.log_path = log_path
+        self.echo = echo
+        self.echo_rate = echo_rate
+        self.chunks: deque[str] = deque()  # complete lines at the end of the stream
+        self.size = 0                      # total length of the chunks
+        self.partial = ''                  # incomplete line at the end of the stream
+        self.kept: list[str] = []          # lines kept after being dropped from the buffer
+        self.num_dropped = 0               # number of characters dropped from the buffer
+        self._log: Optional[TextIO] = None
+        self._echo_window_start = time.monotonic()
+        self._echo_window_size = 0
+        self._echo_skipped = 0
+
+    def write(self, text: str) -> None:
+        """Captures the next piece of text from the stream."""
+        if (self.echo is not None):
+            self._write_echo(text)
+        text = self.partial + text
+        end = text.rfind('\n') + 1
+        if (end == 0):
+            if (len(text) <= self.max_size):
+                self.partial = text
+                return
+            # a single very long line is split
+            end = len(text)
+        (complete, self.partial) = (text[:end], text[end:])
+        self.chunks.append(complete)
+        self.size += len(complete)
+        while (self.size > self.max_size) and (len(self.chunks) > 1):
+            self._drop(self.chunks.popleft())
+
+    def _drop(self, chunk: str) -> None:
+        self.size -= len(chunk)
+        self.num_dropped += len(chunk)
+        if (self.keep_pattern is not None):
+            self.kept.extend(self.keep_pattern.findall(chunk))
+        if (self.log_path is not None):
+            if (self._log is None):
+                # favor speed over compression ratio, since the output may be large
+                self._log = gzip.open(self.log_path, 'wt', compresslevel = 1)
+            self._log.write(chunk)
+
+    def _write_echo(self, text: str) -> None:
+        assert (self.echo is not None)
+        now = time.monotonic()
+        if (now - self._echo_window_start >= 1.0):
+            self._flush_echo_note()
+            (self._echo_window_start, self._echo_window_size) = (now, 0)
+        shown = text[:max(0, self.echo_rate - self._echo_window_size)]
+        if shown:
+            self.echo.write(shown)
+            self.echo.flush()
+            self._echo_window_size += len(shown)
+        self._echo_skipped += len(text) - len(shown)
+
+    def _flush_echo_note(self) -> None:
+        if (self.echo is not None) and (self._echo_skipped > 0):
+            self.echo.write(f'\n[... {self._echo_skipped:,} characters not shown ...]\n')
+            self.echo.flush()
+            self._echo_skipped = 0
+
+    def close(self) -> None:
+        """Finishes capturing the stream, saving the rest of it to the log file (if the stream overflowed)."""
+        self._flush_echo_note()
+        if (self._log is not None):
+            self._log.writelines(self.chunks)
+            self._log.write(self.partial)
+            self._log.close()
+            self._log = None
+
+    @property
+    def text(self) -> str:
+        """Captured text: a note saying how much was dropped (if anything), then the kept lines, then the end of the stream."""
+        if (self.num_dropped == 0):
+            return ''.join(self.chunks) + self.partial
+        note = f'[... {self.num_dropped:,} characters omitted'
+        note += f' (full output saved to {self.log_path})' if (self.log_path is not None) else ''
+        return note + ' ...]\n' + ''.join(self.kept) + ''.join(self.chunks) + self.partial
+
+
+@dataclass
+class CaptureOptions:
+    """Options for capturing the output of a child process."""
+    max_size: int = MAX_CAPTURE_SIZE     # approximate number of characters at the end of each stream kept in memory
+    keep_stdout: tuple[str, ...] = ()    # prefixes of lines of stdout which are kept even if they are not at the end
+    keep_stderr: tuple[str, ...] = ()    # prefixes of lines of stderr which are kept even if they are not at the end
+    log_prefix: Optional[Path] = None    # if set, streams which overflow are saved in full to <prefix>.stdout.gz and <prefix>.stderr.gz
+    echo_rate: int = ECHO_RATE           # maximum number of characters of each stream echoed to the terminal per second (if echoing)
+
+    def make_capture(self, name: str, keep_prefixes: tuple[str, ...], echo: Optional[TextIO]) -> OutputCapture:
+        """Creates an OutputCapture for one of a process's output streams (stdout or stderr)."""
+        log_path = None if (self.log_prefix is None) else self.log_prefix.with_name(f'{self.log_prefix.name}.{name}.gz')
+        return OutputCapture(self.max_size, keep_prefixes, log_path = log_path, echo = echo, echo_rate = self.echo_rate)
+
+
+class ProcessResult(NamedTuple):
+    """Result of running a subprocess."""
+    returncode: int
+    stdout: str
+    stderr: str
+    resources: ResourceUsage
+    limit_exceeded: Optional[LimitType] = None
+
+
+def _create_cgroup(limits: ResourceLimits) -> Optional[Path]:
+    """Attempts to create a (v2) cgroup enforcing memory and CPU limits, nested within the current process's cgroup.
+    Returns the path to the cgroup directory, or None if this is not possible (e.g. cgroup v2 is not available, or the cgroup is not writable)."""
+    try:
+        (hierarchy, _, rel_path) = Path('/proc/self/cgroup').read_text().splitlines()[0].split(':', 2)
+        if (hierarchy != '0'):
+            return None
+        parent_dir = CGROUP_ROOT / rel_path.lstrip('/')
+        controllers = (parent_dir / 'cgroup.subtree_control').read_text().split()
+        if ((limits.max_memory is not None) and ('memory' not in controllers)) or ((limits.cpus is not None) and ('cpu' not in controllers)):
+            return None
+        cgroup_dir = parent_dir / f'aoctool-{os.getpid()}-{next(_cgroup_counter)}'
+        cgroup_dir.mkdir()
+        if (limits.max_memory is not None):
+            (cgroup_dir / 'memory.max').write_text(str(limits.max_memory))
+        if (limits.cpus is not None):
+            period = 100_000
+            (cgroup_dir / 'cpu.max').write_text(f'{limits.cpus * period} {period}')
+        return cgroup_dir
+    except (OSError, ValueError):
+        return None
+
+def _apply_limits(pid: int, limits: ResourceLimits, cgroup_dir: Optional[Path]) -> None:
+    """Applies resource limits to a child process (and its future descendants) from the parent, just after the child has started.
+    This is done with a cgroup if one is available, otherwise with prlimit and CPU affinity. (The number of CPUs is limited by choosing the first few of the CPUs available, i.e. after any pinning.)
+    Limits are not applied in the child between fork and exec (via preexec_fn), since that may deadlock when the parent has other threads."""
+    try:
+        if (limits.affinity is not None):
+            os.sched_setaffinity(pid, limits.affinity)
+        if (cgroup_dir is not None):
+            try:
+                (cgroup_dir / 'cgroup.procs').write_text(str(pid))
+                return
+            except OSError:
+                pass
+        if (limits.max_memory is not None):
+            # RLIMIT_DATA (rather than RLIMIT_AS) permits the large virtual address reservations made by some runtimes (e.g. GHC)
+            resource.prlimit(pid, resource.RLIMIT_DATA, (limits.max_memory, limits.max_memory))
+        if (limits.cpus is not None):
+            cpus = sorted(os.sched_getaffinity(pid))[:limits.cpus]
+            os.sched_setaffinity(pid, cpus)
+    except ProcessLookupError:  # the child has already exited
+        pass
+
+def _cgroup_oom_killed(cgroup_dir: Path) -> bool:
+    try:
+        for line in (cgroup_dir / 'memory.events').read_text().splitlines():
+            (key, val) = line.split()
+            if (key == 'oom_kill') and (int(val) > 0):
+                return True
+    except OSError:
+        pass
+    return False
+
+def _check_memory_exceeded(limits: ResourceLimits, cgroup_dir: Optional[Path], returncode: int, stderr: str) -> Optional[LimitType]:
+    """Determines whether a failed process was terminated due to exceeding its memory limit.
+    With a cgroup, this is reported by the kernel; otherwise, it is inferred from the runtime's error message."""
+    if (limits.max_memory is None) or (returncode == 0):
+        return None
+    if ((cgroup_dir is not None) and _cgroup_oom_killed(cgroup_dir)) or OUT_OF_MEMORY_PATTERN.search(stderr):
+        return 'memory'
+    return None
+
+
+class _GroupKiller:
+    """Kills a child's entire process group, either on demand or after a timeout expires."""
+
+    def __init__(self, pid: int, timeout: Optional[float]) -> None:
+        self.pid = pid
+        self.timed_out = False
+        self.timer = None if (timeout is None) else threading.Timer(timeout, self._on_timeout)
+
+    def _on_timeout(self) -> None:
+        self.timed_out = True
+        self.kill()
+
+    def start(self) -> None:
+        if (self.timer is not None):
+            self.timer.start()
+
+    def cancel(self) -> None:
+        if (self.timer is not None):
+            self.timer.cancel()
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _read_stream(stream: IO[bytes], capture: OutputCapture) -> None:
+    decoder = codecs.getincrementaldecoder('utf-8')(errors = 'replace')
+    while (data := stream.read1(CHUNK_SIZE)):  # type: ignore[attr-defined]
+        capture.write(decoder.decode(data))
+    capture.write(decoder.decode(b'', final = True))
+    capture.close()
+
+def run_process(args: list[str], tee: bool = False, limits: Optional[ResourceLimits] = None, capture: Optional[CaptureOptions] = None, **kwargs: Any) -> ProcessResult:
+    """Runs a command as a subprocess, capturing its stdout and stderr.
+    Only a bounded amount of each stream is kept in memory (mostly from the end), as determined by the capture options.
+    If tee = True, also mirrors the output to the terminal as it is produced (up to a maximum rate).
+    The child is reaped with wait4, so that its resource usage can be recorded.
+    If limits are given, memory and CPU limits are enforced with a cgroup when one is available (otherwise with prlimit and CPU affinity), applied to the child as soon as it starts.
+    The child may also be pinned to specific CPUs (e.g. to reduce variability when benchmarking).
+    The child runs in its own process group, which is killed entirely if the timeout expires (or if the parent is interrupted).
+    Extra keyword arguments are passed to subprocess.Popen."""
+    limits = limits or ResourceLimits()
+    cgroup_dir = _create_cgroup(limits) if ((limits.max_memory is not None) or (limits.cpus is not None)) else None
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(args, stdout = subprocess.PIPE, stderr = subprocess.PIPE, process_group = 0, **kwargs)
+    if limits.is_set:
+        _apply_limits(proc.pid, limits, cgroup_dir)
+    killer = _GroupKiller(proc.pid, limits.timeout)
+    capture = capture or CaptureOptions()
+    stdout_capture = capture.make_capture('stdout', capture.keep_stdout, sys.stdout if tee else None)
+    stderr_capture = capture.make_capture('stderr', capture.keep_stderr, sys.stderr if tee else None)
+    readers = [
+        threading.Thread(target = _read_stream, args = (proc.stdout, stdout_capture)),
+        threading.Thread(target = _read_stream, args = (proc.stderr, stderr_capture)),
+    ]
+    for reader in readers:
+        reader.start()
+    killer.start()
+    try:
+        for reader in readers:
+            reader.join()
+        (_, status, rusage) = os.wait4(proc.pid, 0)
+    except BaseException:
+        killer.kill()
+        raise
+    finally:
+        killer.cancel()
+    wall_time = time.perf_counter() - t0
+    # let the Popen object know the process has been reaped
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    for stream in (proc.stdout, proc.stderr):
+        assert (stream is not None)
+        stream.close()
+    (stdout, stderr) = (stdout_capture.text, stderr_capture.text)
+    if killer.timed_out:
+        limit_exceeded: Optional[LimitType] = 'timeout'
+    else:
+        limit_exceeded = _check_memory_exceeded(limits, cgroup_dir, proc.returncode, stderr)
+    if (cgroup_dir is not None):
+        try:
+            cgroup_dir.rmdir()
+        except OSError:
+            pass
+    return ProcessResult(proc.returncode, stdout, stderr, ResourceUsage.from_rusage(rusage, wall_time), limit_exceeded)
@@ -0,0 +1,116 @@
+"""Generating inputs of growing size from a puzzle's input, and estimating the empirical complexity of solutions from their runtimes."""
+
+import importlib.util
+import math
+from pathlib import Path
+from statistics import fmean
+from typing import Callable, NamedTuple, Optional
+
+from aoctool.stats import linear_fit
+
+
+# function generating an input (roughly) some multiple of the size of a puzzle's input, given the input data and the factor
+Generator = Callable[[str, float], str]
+
+# name of the file in a puzzle directory which may define a custom input generator
+GENERATOR_FILENAME = 'scale.py'
+
+# default multiples of the puzzle input's size at which to run solutions
+DEFAULT_FACTORS = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0]
+
+
+def replicate_lines(input_data: str, factor: float) -> str:
+    """Generates an input with (roughly) factor times as many lines, by cycling through the input's lines (or truncating them, if factor < 1)."""
+    lines = input_data.splitlines()
+    if (not lines):
+        raise ValueError('input is empty')
+    num_lines = max(1, round(factor * len(lines)))
+    return ''.join(lines[i % len(lines)] + '\n' for i in range(num_lines))
+
+def replicate_grid(input_data: str, factor: float) -> str:
+    """Treating the input as a rectangular grid of characters, generates a grid with (roughly) factor times as many cells, by tiling (or cropping) the grid in both dimensions."""
+    rows = input_data.splitlines()
+    if (not rows) or (len({len(row) for row in rows}) > 1) or (not rows[0]):
+        raise ValueError('input is not a rectangular grid')
+    scale = math.sqrt(factor)
+    num_rows = max(1, round(scale * len(rows)))
+    num_cols = max(1, round(scale * len(rows[0])))
+    reps = num_cols // len(rows[0]) + 1
+    return ''.join((rows[i % len(rows)] * reps)[:num_cols] + '\n' for i in range(num_rows))
+
+# built-in input generators
+GENERATORS: dict[str, Generator] = {
+    'lines': replicate_lines,
+    'grid': replicate_grid,
+}
+
+def load_generator(path: Path) -> Generator:
+    """Loads a custom input generator from a Python file, which must define a function generate(input_data: str, factor: float) -> str."""
+    spec = importlib.util.spec_from_file_location(f'aoc_generator_{path.stem}', path)
+    if (spec is None) or (spec.loader is None):
+        raise ValueError(f'Could not load input generator from {path}')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    generate = getattr(module, 'generate', None)
+    if (not callable(generate)):
+        raise ValueError(f'{path} does not define a generate function')
+    return generate  # type: ignore[no-any-return]
+
+def get_generator(name_or_path: Optional[str], puzzle_dir: Path) -> Generator:
+    """Gets an input generator: either a built-in generator (by name) or a custom one (by the path to a Python file).
+    If none is given, uses the custom generator in the puzzle directory if it exists, and otherwise replicates lines."""
+    if (name_or_path is None):
+        path = puzzle_dir / GENERATOR_FILENAME
+        return load_generator(path) if path.exists() else replicate_lines
+    if (name_or_path in GENERATORS):
+        return GENERATORS[name_or_path]
+    return load_generator(Path(name_or_path))
+
+
+class ScalePoint(NamedTuple):
+    """Measurements of a solution's runs on a generated input."""
+    factor: float            # multiple of the puzzle input's size
+    size: int                # size of the input (bytes)
+    time: float              # median time of the runs (seconds)
+    max_rss: Optional[int]   # median peak resident set size of the runs (bytes)
+
+
+# candidate complexity classes, as functions of the input size
+COMPLEXITY_CLASSES: dict[str, Callable[[float], float]] = {
+    'O(1)': lambda n: 1.0,
+    'O(log n)': math.log,
+    'O(n)': lambda n: n,
+    'O(n log n)': lambda n: n * math.log(n),
+    'O(n^2)': lambda n: n ** 2,
+    'O(n^3)': lambda n: n ** 3,
+}
+
+
+class ComplexityFit(NamedTuple):
+    """Empirical complexity of a solution, fit to its times on inputs of different sizes."""
+    exponent: float     # exponent b of the power law time = c * size^b
+    coefficient: float  # coefficient c of the power law
+    r_squared: float    # goodness of fit of the power law (on a log-log scale)
+    complexity: str     # complexity class which best fits the times
+
+    def predict(self, size: float) -> float:
+        """Extrapolates the time for an input of the given size, using the power law."""
+        return self.coefficient * size ** self.exponent
+
+def fit_complexity(sizes: list[int], times: list[float]) -> ComplexityFit:
+    """Fits a power law to times as a function of input sizes, by least squares on a log-log scale.
+    Also finds the complexity class that best fits the times: each class f is fit as time = c * f(size), and the one with the smallest squared error of the log times is chosen.
+    Requires at least two distinct sizes greater than 1."""
+    if any(size <= 1 for size in sizes):
+        raise ValueError('sizes must be greater than 1')
+    # guard against times that are too small to have been measured
+    log_times = [math.log(max(time, 1e-9)) for time in times]
+    fit = linear_fit([math.log(size) for size in sizes], log_times)
+
+    def error(func: Callable[[float], float]) -> float:
+        residuals = [log_time - math.log(func(size)) for (size, log_time) in zip(sizes, log_times)]
+        mean = fmean(residuals)
+        return sum((r - mean) ** 2 for r in residuals)
+
+    complexity = min(COMPLEXITY_CLASSES, key = lambda name: error(COMPLEXITY_CLASSES[name]))
+    return ComplexityFit(fit.slope, math.exp(fit.intercept), fit.r_squared, complexity)
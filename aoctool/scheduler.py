@@ -0,0 +1,122 @@
+"""Scheduling concurrent builds, which share a GNU make-compatible jobserver so that their total concurrency stays within a limit."""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import os
+import select
+import threading
+import time
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Iterator, NamedTuple, Optional, Sequence
+
+from aoctool.utils import log
+
+
+if TYPE_CHECKING:
+    from aoctool.drivers._base import AoCBuilder
+
+
+# byte written to the jobserver's pipe for each token
+TOKEN = b'+'
+
+
+class JobServer:
+    """GNU make-compatible jobserver: a pipe holding tokens, each of which grants the right to run one job.
+    Builds started by the scheduler each hold one token while they run. Tools which understand the jobserver protocol (e.g. cargo) treat that token as their own, and read additional tokens from the pipe to run more jobs in parallel (writing them back when they are done)."""
+
+    def __init__(self, num_jobs: int) -> None:
+        if (num_jobs < 1):
+            raise ValueError('jobserver needs at least one job slot')
+        self.num_jobs = num_jobs
+        (self.read_fd, self.write_fd) = os.pipe()
+        os.write(self.write_fd, TOKEN * num_jobs)
+        # serializes nonblocking acquisition of extra tokens
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'JobServer':
+        return self
+
+    def __exit__(self, exc_type: Optional[type[BaseException]], exc_value: Optional[BaseException], traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    def close(self) -> None:
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    @property
+    def makeflags(self) -> str:
+        """Value of MAKEFLAGS which tells a client to use the jobserver."""
+        return f'-j{self.num_jobs} --jobserver-auth={self.read_fd},{self.write_fd}'
+
+    def get_subprocess_kwargs(self) -> dict[str, Any]:
+        """Gets extra keyword arguments to subprocess.run which let the subprocess join the jobserver."""
+        env = {**os.environ, 'MAKEFLAGS': self.makeflags, 'CARGO_MAKEFLAGS': self.makeflags}
+        return {'pass_fds': (self.read_fd, self.write_fd), 'env': env}
+
+    @contextmanager
+    def token(self) -> Iterator[None]:
+        """Context manager which holds a token, blocking until one is available."""
+        token = os.read(self.read_fd, 1)
+        try:
+            yield
+        finally:
+            os.write(self.write_fd, token)
+
+    @contextmanager
+    def extra_tokens(self, max_tokens: int) -> Iterator[int]:
+        """Context manager which holds up to max_tokens extra tokens, taking only those available without waiting.
+        This is for tools which do not understand the jobserver protocol, but accept a fixed number of parallel jobs.
+        Yields the number of tokens held."""
+        tokens = b''
+        with self._lock:
+            while (len(tokens) < max_tokens) and select.select([self.read_fd], [], [], 0)[0]:
+                tokens += os.read(self.read_fd, 1)
+        try:
+            yield len(tokens)
+        finally:
+            if tokens:
+                os.write(self.write_fd, tokens)
+
+
+class CompileResult(NamedTuple):
+    """Result of compiling a puzzle solution."""
+    error: Optional[str]  # error message, if compilation failed
+    compile_time: float   # wall-clock time of the build, excluding time spent waiting for a token (seconds)
+
+
+def get_build_groups(builders: Sequence['AoCBuilder']) -> list[list[int]]:
+    """Groups builders which share a build directory (and hence the builds of their dependencies), as lists of indices.
+    Builders without a shared build directory are in their own groups. Groups are in decreasing order of size, with ties broken by the order of the builders."""
+    groups: dict[Any, list[int]] = {}
+    for (i, builder) in enumerate(builders):
+        shared_dir = builder.driver.get_shared_build_dir(builder.scaffold_dir, builder.build_dir)
+        groups.setdefault(i if (shared_dir is None) else shared_dir.resolve(), []).append(i)
+    return sorted(groups.values(), key = len, reverse = True)
+
+def _compile_group(builders: list['AoCBuilder'], jobserver: JobServer, use_cache: bool) -> list[CompileResult]:
+    results = []
+    for builder in builders:
+        with jobserver.token():
+            t0 = time.perf_counter()
+            try:
+                builder.do_compile(use_cache = use_cache, jobserver = jobserver)
+            except Exception as e:
+                results.append(CompileResult(f'{type(e).__name__}: {e}', time.perf_counter() - t0))
+            else:
+                results.append(CompileResult(None, time.perf_counter() - t0))
+    return results
+
+def compile_all(builders: Sequence['AoCBuilder'], max_jobs: int, use_cache: bool = True) -> list[CompileResult]:
+    """Compiles many puzzle solutions concurrently, keeping the total number of jobs (across all build tools) within max_jobs.
+    Builders sharing a build directory are compiled one after another, so the first build compiles their shared dependencies (using as many job slots as it can get), and the others reuse them rather than contending for the directory's lock.
+    Larger groups are started first, since they take the longest.
+    Errors are caught and recorded in the results, which are in the same order as the builders."""
+    results: list[Optional[CompileResult]] = [None] * len(builders)
+    groups = get_build_groups(builders)
+    log(f'Compiling {len(builders)} solution(s) with up to {max_jobs} parallel job(s)')
+    with JobServer(max_jobs) as jobserver, ThreadPoolExecutor(max_workers = max(1, min(max_jobs, len(groups)))) as pool:
+        futures = [pool.submit(_compile_group, [builders[i] for i in group], jobserver, use_cache) for group in groups]
+        for (group, future) in zip(groups, futures):
+            for (i, res) in zip(group, future.result()):
+                results[i] = res
+    return [res for res in results if (res is not None)]
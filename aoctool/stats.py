@@ -0,0 +1,138 @@
+"""Statistical tests for comparing samples of measurements, and fitting models to them."""
+
+import math
+from statistics import correlation, fmean, linear_regression, median, quantiles, stdev
+from typing import Literal, NamedTuple, Sequence
+
+
+# alternative hypothesis of a test: the first sample tends to be greater than, less than, or different from the second
+Alternative = Literal['greater', 'less', 'two-sided']
+
+
+class StatTestResult(NamedTuple):
+    statistic: float
+    p_value: float
+
+
+class Summary(NamedTuple):
+    """Summary statistics of a sample, including a confidence interval for its median."""
+    n: int
+    minimum: float
+    median: float
+    mean: float
+    stddev: float
+    ci_low: float
+    ci_high: float
+
+    @property
+    def rel_ci_half_width(self) -> float:
+        """Half the width of the confidence interval, relative to the median."""
+        return (self.ci_high - self.ci_low) / 2 / self.median if (self.median != 0) else 0.0
+
+
+class LinearFit(NamedTuple):
+    """Least-squares fit of a line y = slope * x + intercept."""
+    slope: float
+    intercept: float
+    r_squared: float  # coefficient of determination
+
+
+def rank(values: Sequence[float]) -> list[float]:
+    """Gets the (1-based) ranks of some values, assigning tied values the average of their ranks."""
+    order = sorted(range(len(values)), key = values.__getitem__)
+    ranks = [0.0] * len(values)
+    i = 0
+    while (i < len(order)):
+        j = i
+        while (j + 1 < len(order)) and (values[order[j + 1]] == values[order[i]]):
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    return ranks
+
+def normal_sf(z: float) -> float:
+    """Survival function (1 - CDF) of the standard normal distribution."""
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def mann_whitney_u(xs: Sequence[float], ys: Sequence[float], alternative: Alternative = 'two-sided') -> StatTestResult:
+    """Performs a Mann-Whitney U test of whether values in xs tend to differ from those in ys.
+    This makes no assumptions about the distributions (e.g. timings are often skewed), only that samples are independent.
+    Returns the U statistic for xs, and a p-value from the normal approximation (with corrections for ties and continuity)."""
+    (n1, n2) = (len(xs), len(ys))
+    if (n1 == 0) or (n2 == 0):
+        raise ValueError('samples must be non-empty')
+    ranks = rank([*xs, *ys])
+    u = sum(ranks[:n1]) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    mean = n1 * n2 / 2
+    tie_counts: dict[float, int] = {}
+    for r in ranks:
+        tie_counts[r] = tie_counts.get(r, 0) + 1
+    tie_term = sum(t ** 3 - t for t in tie_counts.values()) / (n * (n - 1)) if (n > 1) else 0.0
+    var = n1 * n2 / 12 * ((n + 1) - tie_term)
+    if (var <= 0):  # all values are identical
+        return StatTestResult(u, 1.0)
+    sd = math.sqrt(var)
+    if (alternative == 'greater'):
+        p_value = normal_sf((u - mean - 0.5) / sd)
+    elif (alternative == 'less'):
+        p_value = normal_sf((mean - u - 0.5) / sd)
+    else:
+        p_value = min(1.0, 2 * normal_sf((abs(u - mean) - 0.5) / sd))
+    return StatTestResult(u, p_value)
+
+def binom_cdf(k: int, n: int, p: float = 0.5) -> float:
+    """Cumulative distribution function P(X <= k) of a binomial distribution with n trials and success probability p."""
+    if (k < 0):
+        return 0.0
+    if (k >= n):
+        return 1.0
+    (log_p, log_q) = (math.log(p), math.log1p(-p))
+    return sum(math.exp(math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1) + i * log_p + (n - i) * log_q) for i in range(k + 1))
+
+def median_ci(values: Sequence[float], confidence: float = 0.95) -> tuple[float, float]:
+    """Computes a distribution-free confidence interval for the median of a sample, bounded by a pair of order statistics.
+    The number of values below the true median is Binomial(n, 1/2), which determines the coverage of each pair.
+    If the sample is too small to attain the desired confidence, returns the full range of the sample."""
+    if (not values):
+        raise ValueError('sample must be non-empty')
+    xs = sorted(values)
+    n = len(xs)
+    alpha = 1 - confidence
+    # largest j such that P(X < j) <= alpha / 2, so that [x_(j), x_(n + 1 - j)] (1-based) covers the median
+    j = 0
+    while (j + 1 <= n // 2) and (binom_cdf(j, n) <= alpha / 2):
+        j += 1
+    if (j == 0):
+        return (xs[0], xs[-1])
+    return (xs[j - 1], xs[n - j])
+
+def reject_outliers(values: Sequence[float], k: float = 1.5) -> list[float]:
+    """Removes outliers from a sample using Tukey's fences: values more than k interquartile ranges outside the quartiles.
+    (Timings are skewed by interference from other processes, so the outliers removed are usually slow runs.)
+    Samples with fewer than 4 values are returned unchanged."""
+    if (len(values) < 4):
+        return list(values)
+    (q1, _, q3) = quantiles(values, n = 4, method = 'inclusive')
+    iqr = q3 - q1
+    (low, high) = (q1 - k * iqr, q3 + k * iqr)
+    return [val for val in values if (low <= val <= high)]
+
+def summarize(values: Sequence[float], confidence: float = 0.95) -> Summary:
+    """Computes summary statistics of a (non-empty) sample."""
+    if (not values):
+        raise ValueError('sample must be non-empty')
+    (ci_low, ci_high) = median_ci(values, confidence)
+    sd = stdev(values) if (len(values) > 1) else 0.0
+    return Summary(len(values), min(values), median(values), fmean(values), sd, ci_low, ci_high)
+
+def linear_fit(xs: Sequence[float], ys: Sequence[float]) -> LinearFit:
+    """Fits a line to some points by ordinary least squares.
+    Requires at least two points, whose x values are not all equal."""
+    if (len(xs) != len(ys)) or (len(xs) < 2) or (len(set(xs)) < 2):
+        raise ValueError('need at least two points with distinct x values')
+    (slope, intercept) = linear_regression(xs, ys)
+    # a constant y is fit perfectly by a horizontal line
+    r_squared = correlation(xs, ys) ** 2 if (len(set(ys)) > 1) else 1.0
+    return LinearFit(slope, intercept, r_squared)
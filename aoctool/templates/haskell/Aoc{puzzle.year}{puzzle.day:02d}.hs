@@ -4,15 +4,21 @@
 
 module Aoc{{puzzle.year}}{{'%02d' % puzzle.day}} where
 
+import Data.ByteString (ByteString)
+-- parse ASCII input without unpacking it to a String, e.g. with BC.lines and BC.readInt
+import qualified Data.ByteString.Char8 as BC
+
 
 -- define your own Value type for the problem
+-- (it must be an instance of NFData so that it can be fully evaluated when timing;
+-- for a custom data type, derive Generic and add an empty NFData instance)
 type Value = ()
 
 
 -- fill these in
 
 --- Parse input into the Value type
-parse :: String -> Maybe Value
+parse :: {{input_type}} -> Maybe Value
 parse inputData = Nothing
 
 --- Solve part 1
@@ -4,31 +4,142 @@
 
 module Main where
 
+import Control.DeepSeq (NFData, force)
+import Control.Exception (SomeException, displayException, evaluate, try)
+import Control.Monad (unless)
+import Data.ByteString (ByteString)
+import qualified Data.ByteString as BS
+import qualified Data.ByteString.Char8 as BC
 import Data.Char (toLower)
-import System.Environment (getArgs)
+import Data.IORef (modifyIORef, newIORef, readIORef)
+import Data.List (intercalate)
+{% if input_mode in ['path', 'mmap'] %}
+import Data.Maybe (fromMaybe)
+{% endif %}
+import Data.Word (Word64)
+import GHC.Clock (getMonotonicTimeNSec)
+import System.Environment (getArgs{% if input_mode in ['path', 'mmap'] %}, lookupEnv{% elif input_mode == 'fd' %}, getEnv{% endif %})
+import System.IO (BufferMode (..), hIsEOF, hPutStrLn, hSetBuffering, stderr, stdin, stdout)
+{% if input_mode == 'fd' %}
+import System.Posix.IO (fdToHandle)
+import System.Posix.Types (Fd (..))
+{% elif input_mode == 'mmap' %}
+import System.IO.MMap (mmapFileByteString)
+{% endif %}
+import Text.Printf (printf)
 
 import Aoc{{puzzle.year}}{{'%02d' % puzzle.day}} (parse, part1, part2)
 
 
-inputDataPath :: FilePath
-inputDataPath = "{{input_data_path}}"
+{% if input_mode in ['path', 'mmap'] %}
+defaultInputDataPath :: FilePath
+defaultInputDataPath = "{{input_data_path}}"
+
+--- Gets the path to the input file (which may be overridden by an environment variable)
+getInputDataPath :: IO FilePath
+getInputDataPath = fromMaybe defaultInputDataPath <$> lookupEnv "AOC_INPUT_PATH"
+
+{% endif %}
+{% if input_mode == 'mmap' %}
+--- Maps the file into memory, so that no copy is made
+readInputFile :: FilePath -> IO ByteString
+readInputFile path = mmapFileByteString path Nothing
+{% else %}
+readInputFile :: FilePath -> IO ByteString
+readInputFile = BS.readFile
+{% endif %}
+
+{% if input_mode in ['path', 'mmap'] %}
+readInput :: IO ByteString
+readInput = getInputDataPath >>= readInputFile
+{% elif input_mode == 'stdin' %}
+readInput :: IO ByteString
+readInput = BS.getContents
+{% else %}
+--- Reads from the file descriptor inherited from the parent process
+readInput :: IO ByteString
+readInput = do
+    fd <- read <$> getEnv "AOC_INPUT_FD"
+    handle <- fdToHandle (Fd fd)
+    BS.hGetContents handle
+{% endif %}
 
 data Part = Part1 | Part2 deriving (Enum, Eq, Show)
 
-solve :: Part -> IO (Maybe Int)
-solve part = do
+--- Reports the elapsed time (in nanoseconds) of a phase
+type TimeRecorder = String -> Word64 -> IO ()
+
+--- Writes the elapsed time of a phase to stderr
+logTime :: TimeRecorder
+logTime phase nanos = hPutStrLn stderr $ "AOC_TIME " ++ phase ++ " " ++ show nanos
+
+--- Runs an action, fully evaluating its result, and reports the elapsed time
+--- (forcing the result ensures lazy evaluation does not shift the cost into a later phase)
+timed :: NFData a => TimeRecorder -> String -> IO a -> IO a
+timed record phase action = do
+    t0 <- getMonotonicTimeNSec
+    result <- action >>= evaluate . force
+    t1 <- getMonotonicTimeNSec
+    record phase (t1 - t0)
+    return result
+
+--- Solves a part of the puzzle, reading the input data with the given action
+solve :: TimeRecorder -> IO {{input_type}} -> Part -> IO (Maybe Int)
+solve record readData part = do
     let solver = if part == Part1 then part1 else part2
-    inputData <- readFile inputDataPath
-    let solution = case parse inputData of
-                    Nothing    -> error "parse not implemented"
-                    Just value -> solver value
-    return solution
+    inputData <- timed record "read" readData
+    parsed <- timed record "parse" $ return $ parse inputData
+    value <- case parsed of
+        Nothing    -> error "parse not implemented"
+        Just value -> return value
+    timed record (toLower <$> show part) $ return $ solver value
+
+--- Encodes a string as a JSON string literal
+jsonString :: String -> String
+jsonString s = "\"" ++ concatMap escape s ++ "\""
+  where
+    escape '"' = "\\\""
+    escape '\\' = "\\\\"
+    escape c
+        | c < ' '   = printf "\\u%04x" (fromEnum c)
+        | otherwise = [c]
+
+--- Runs a batch of jobs read from stdin, writing a JSON line with the result of each job to stdout
+--- (each job is a header line '<part> path <path>' or '<part> data <numBytes>', followed by that many bytes of input data)
+--- A job that fails is reported as an error, and the remaining jobs still run.
+runBatch :: IO ()
+runBatch = hSetBuffering stdout LineBuffering >> loop (0 :: Int)
+  where
+    loop job = do
+        eof <- hIsEOF stdin
+        unless eof $ do
+            header <- BC.unpack <$> BS.hGetLine stdin
+            let (partStr, rest) = break (== ' ') header
+                (kind, arg) = break (== ' ') (drop 1 rest)
+                part = toEnum (read partStr - 1) :: Part
+            readData <- if kind == "path"
+                then return $ readInputFile (drop 1 arg)
+                else return . return <$> BS.hGet stdin (read (drop 1 arg))
+            timings <- newIORef []
+            result <- try (solve (\phase nanos -> modifyIORef timings (++ [(phase, nanos)])) readData part) :: IO (Either SomeException (Maybe Int))
+            recorded <- readIORef timings
+            let partName = toLower <$> show part
+                outcome = case result of
+                    Left err         -> "\"error\": " ++ jsonString (displayException err)
+                    Right Nothing    -> "\"error\": " ++ jsonString (partName ++ " not implemented")
+                    Right (Just sol) -> "\"solution\": " ++ show sol
+                timingsJson = intercalate ", " [jsonString phase ++ ": " ++ show nanos | (phase, nanos) <- recorded]
+            putStrLn $ "{\"job\": " ++ show job ++ ", \"part\": " ++ show (fromEnum part + 1) ++ ", " ++ outcome ++ ", \"timings\": {" ++ timingsJson ++ "}}"
+            loop (job + 1)
 
 main :: IO ()
 main = do
     args <- getArgs
-    let part = toEnum $ read (head args) - 1
-    solution <- solve part
-    case solution of
-        Nothing -> error $ toLower <$> show part ++ " not implemented"
-        Just sol -> print sol
+    case args of
+        ["batch"] -> runBatch
+        _ -> do
+            let part = toEnum $ read (head args) - 1
+            solution <- solve logTime readInput part
+            case solution of
+                Nothing -> error $ toLower <$> show part ++ " not implemented"
+                Just sol -> print sol
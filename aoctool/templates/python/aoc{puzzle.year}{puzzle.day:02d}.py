@@ -11,7 +11,7 @@ Value: TypeAlias = object
 
 # fill these in
 
-def parse(input_data: str) -> Optional[Value]:
+def parse(input_data: {{input_type}}) -> Optional[Value]:
     """Parse input into the Value type."""
     return None
 
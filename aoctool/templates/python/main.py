@@ -3,31 +3,122 @@
 # Language: {{language}}
 
 import argparse
-from typing import Optional, TypeAlias
+from functools import partial
+import json
+{% if input_mode == 'mmap' %}
+import mmap
+{% endif %}
+import os
+import sys
+import time
+from typing import Callable, Optional, TypeAlias
 
 from aoc{{puzzle.year}}{{'%02d' % puzzle.day}} import parse, part1, part2
 
 
-INPUT_DATA_PATH = '{{input_data_path}}'
+INPUT_DATA_PATH = os.environ.get('AOC_INPUT_PATH', '{{input_data_path}}')
 
 solve_funcs = {1: part1, 2: part2}
 
-def solve(part: int) -> Optional[int]:
+{% if input_mode == 'path' %}
+def read_input_file(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+def read_input() -> str:
+    return read_input_file(INPUT_DATA_PATH)
+
+def from_inline_data(data: bytes) -> str:
+    return data.decode()
+{% elif input_mode in ['stdin', 'fd'] %}
+def read_input_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+{% if input_mode == 'stdin' %}
+def read_input() -> bytes:
+    return sys.stdin.buffer.read()
+{% else %}
+def read_input() -> bytes:
+    # read from the file descriptor inherited from the parent process
+    with open(int(os.environ['AOC_INPUT_FD']), 'rb') as f:
+        return f.read()
+{% endif %}
+
+def from_inline_data(data: bytes) -> bytes:
+    return data
+{% elif input_mode == 'mmap' %}
+def read_input_file(path: str) -> memoryview:
+    # map the file into memory, so that no copy is made (the mapping remains valid after the file is closed)
+    with open(path, 'rb') as f:
+        return memoryview(mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ))
+
+def read_input() -> memoryview:
+    return read_input_file(INPUT_DATA_PATH)
+
+def from_inline_data(data: bytes) -> memoryview:
+    return memoryview(data)
+{% endif %}
+
+def log_time(phase: str, t0: int, timings: Optional[dict[str, int]] = None) -> None:
+    """Records the elapsed time (in nanoseconds) of a phase in a dict, or if none is given, writes it to stderr."""
+    elapsed = time.perf_counter_ns() - t0
+    if (timings is None):
+        print(f'AOC_TIME {phase} {elapsed}', file = sys.stderr)
+    else:
+        timings[phase] = elapsed
+
+def solve(part: int, reader: Callable[[], {{input_type}}] = read_input, timings: Optional[dict[str, int]] = None) -> Optional[int]:
     solver = solve_funcs[part]
-    with open(INPUT_DATA_PATH) as f:
-        input_data = f.read()
+    t0 = time.perf_counter_ns()
+    input_data = reader()
+    log_time('read', t0, timings)
+    t0 = time.perf_counter_ns()
     value = parse(input_data)
+    log_time('parse', t0, timings)
     if (value is None):
         raise NotImplementedError
-    return solver(value)
+    t0 = time.perf_counter_ns()
+    solution = solver(value)
+    log_time(f'part{part}', t0, timings)
+    return solution
+
+def run_batch() -> None:
+    """Runs a batch of jobs read from stdin, writing a JSON line with the result of each job to stdout.
+    Each job is a header line '<part> path <path>' or '<part> data <num_bytes>' (followed by that many bytes of input data)."""
+    stdin = sys.stdin.buffer
+    for (job, header) in enumerate(iter(stdin.readline, b'')):
+        (part_str, kind, arg) = header.decode().rstrip('\n').split(' ', 2)
+        part = int(part_str)
+        if (kind == 'path'):
+            reader = partial(read_input_file, arg)
+        else:
+            data = stdin.read(int(arg))
+            reader = partial(from_inline_data, data)
+        timings: dict[str, int] = {}
+        result: dict[str, object] = {'job': job, 'part': part}
+        try:
+            solution = solve(part, reader, timings)
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+        else:
+            if (solution is None):
+                result['error'] = f'part{part} not implemented'
+            else:
+                result['solution'] = solution
+        result['timings'] = timings
+        print(json.dumps(result), flush = True)
 
 
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser(description = 'Run Advent of Code puzzle for {{puzzle.date_string}}')
-    parser.add_argument('part', type = int, choices = (1, 2), help = 'which part of the puzzle to run')
+    parser.add_argument('part', choices = ('1', '2', 'batch'), help = "which part of the puzzle to run (or 'batch' to run a batch of jobs read from stdin)")
     args = parser.parse_args()
-    solution = solve(args.part)
+    if (args.part == 'batch'):
+        run_batch()
+        exit(0)
+    solution = solve(int(args.part))
     if (solution is None):
         exit(1)
     else:
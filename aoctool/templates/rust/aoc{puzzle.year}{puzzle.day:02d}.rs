@@ -10,7 +10,7 @@ type Value = ();
 // fill these in
 
 /// Parse input into the Value type
-pub fn parse(input_data: &str) -> Option<Value> {
+pub fn parse(input_data: {{input_type}}) -> Option<Value> {
     None
 }
 
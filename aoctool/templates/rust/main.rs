@@ -4,27 +4,164 @@
 
 use std::env;
 use std::fs;
+use std::io::{self, BufRead, Read};
+use std::ops::Deref;
+{% if input_mode == 'fd' %}
+use std::os::fd::FromRawFd;
+{% endif %}
+use std::panic::{self, AssertUnwindSafe};
 use std::process;
+use std::time::Instant;
 
 mod aoc{{puzzle.year}}{{'%02d' % puzzle.day}};
 use aoc{{puzzle.year}}{{'%02d' % puzzle.day}}::{parse, part1, part2};
 
 
+{% if input_mode in ['path', 'mmap'] %}
 const INPUT_DATA_PATH: &str = "{{input_data_path}}";
 
-fn solve(part: i32) -> Option<i64> {
+/// Gets the path to the input file (which may be overridden by an environment variable)
+fn input_data_path() -> String {
+    env::var("AOC_INPUT_PATH").unwrap_or_else(|_| INPUT_DATA_PATH.to_string())
+}
+
+{% endif %}
+{% if input_mode == 'path' %}
+fn read_input_file(path: &str) -> String {
+    fs::read_to_string(path).expect("Could not read file.")
+}
+
+fn read_input() -> String {
+    read_input_file(&input_data_path())
+}
+
+fn from_inline_data(data: Vec<u8>) -> String {
+    String::from_utf8(data).expect("Input data is not valid UTF-8.")
+}
+{% elif input_mode in ['stdin', 'fd'] %}
+fn read_input_file(path: &str) -> Vec<u8> {
+    fs::read(path).expect("Could not read file.")
+}
+
+{% if input_mode == 'stdin' %}
+fn read_input() -> Vec<u8> {
+    let mut input_data = Vec::new();
+    io::stdin().lock().read_to_end(&mut input_data).expect("Could not read stdin.");
+    input_data
+}
+{% else %}
+/// Reads from the file descriptor inherited from the parent process
+fn read_input() -> Vec<u8> {
+    let fd: i32 = env::var("AOC_INPUT_FD").expect("AOC_INPUT_FD is not set.").parse().expect("Invalid file descriptor.");
+    let mut file = unsafe { fs::File::from_raw_fd(fd) };
+    let mut input_data = Vec::new();
+    file.read_to_end(&mut input_data).expect("Could not read file descriptor.");
+    input_data
+}
+{% endif %}
+
+fn from_inline_data(data: Vec<u8>) -> Vec<u8> {
+    data
+}
+{% elif input_mode == 'mmap' %}
+/// Maps the file into memory, so that no copy is made
+fn read_input_file(path: &str) -> memmap2::Mmap {
+    let file = fs::File::open(path).expect("Could not read file.");
+    unsafe { memmap2::Mmap::map(&file) }.expect("Could not map file.")
+}
+
+fn read_input() -> memmap2::Mmap {
+    read_input_file(&input_data_path())
+}
+
+fn from_inline_data(data: Vec<u8>) -> Vec<u8> {
+    data
+}
+{% endif %}
+
+/// Writes the elapsed time (in nanoseconds) of a phase to stderr
+fn log_time(phase: &str, nanos: u128) {
+    eprintln!("AOC_TIME {phase} {nanos}");
+}
+
+/// Solves a part of the puzzle, reading the input data with the given function.
+/// The elapsed time (in nanoseconds) of each phase is reported to the given function.
+fn solve<D: Deref<Target = {% if input_mode == 'path' %}str{% else %}[u8]{% endif %}>>(part: i32, read: impl FnOnce() -> D, record_time: &mut dyn FnMut(&str, u128)) -> Option<i64> {
     let solver = if part == 1 { part1 } else { part2 };
-    let input_data = fs::read_to_string(INPUT_DATA_PATH).expect("Could not read file.");
+    let t0 = Instant::now();
+    let input_data = read();
+    record_time("read", t0.elapsed().as_nanos());
+    let t0 = Instant::now();
     let value = parse(&input_data).expect("parse not implemented");
-    solver(value)
+    record_time("parse", t0.elapsed().as_nanos());
+    let t0 = Instant::now();
+    let solution = solver(value);
+    record_time(&format!("part{part}"), t0.elapsed().as_nanos());
+    solution
+}
+
+/// Encodes a string as a JSON string literal
+fn json_string(s: &str) -> String {
+    let mut encoded = String::from("\"");
+    for c in s.chars() {
+        match c {
+            '"' => encoded.push_str("\\\""),
+            '\\' => encoded.push_str("\\\\"),
+            c if (c as u32) < 0x20 => encoded.push_str(&format!("\\u{:04x}", c as u32)),
+            c => encoded.push(c),
+        }
+    }
+    encoded.push('"');
+    encoded
+}
+
+/// Runs a batch of jobs read from stdin, writing a JSON line with the result of each job to stdout.
+/// Each job is a header line '<part> path <path>' or '<part> data <num_bytes>' (followed by that many bytes of input data).
+/// A job that panics is reported as an error, and the remaining jobs still run.
+fn run_batch() {
+    let mut stdin = io::stdin().lock();
+    let mut header = String::new();
+    let mut job = 0;
+    while stdin.read_line(&mut header).expect("Could not read stdin.") > 0 {
+        let fields: Vec<&str> = header.trim_end_matches('\n').splitn(3, ' ').collect();
+        let part: i32 = fields[0].parse().expect("Invalid part.");
+        let mut timings: Vec<(String, u128)> = Vec::new();
+        let mut record_time = |phase: &str, nanos: u128| timings.push((phase.to_string(), nanos));
+        let result = if fields[1] == "path" {
+            let path = fields[2].to_string();
+            panic::catch_unwind(AssertUnwindSafe(|| solve(part, || read_input_file(&path), &mut record_time)))
+        } else {
+            let mut data = vec![0; fields[2].parse().expect("Invalid data size.")];
+            stdin.read_exact(&mut data).expect("Could not read stdin.");
+            panic::catch_unwind(AssertUnwindSafe(|| solve(part, || from_inline_data(data), &mut record_time)))
+        };
+        let outcome = match result {
+            Ok(Some(solution)) => format!("\"solution\": {solution}"),
+            Ok(None) => format!("\"error\": \"part{part} not implemented\""),
+            Err(err) => {
+                let message = err.downcast_ref::<&str>().map(|s| s.to_string())
+                    .or_else(|| err.downcast_ref::<String>().cloned())
+                    .unwrap_or_else(|| "panicked".to_string());
+                format!("\"error\": {}", json_string(&message))
+            }
+        };
+        let timings: Vec<String> = timings.iter().map(|(phase, nanos)| format!("{}: {nanos}", json_string(phase))).collect();
+        println!("{}\"job\": {job}, \"part\": {part}, {outcome}, \"timings\": {}{}{}", '{', '{', timings.join(", "), "}}");
+        job += 1;
+        header.clear();
+    }
 }
 
 fn main() {
     let args: Vec<String> = env::args().collect();
+    if args.len() > 1 && args[1] == "batch" {
+        run_batch();
+        return;
+    }
     let part: i32 = match args[1].parse() {
         Err(_) => { process::exit(1) },
         Ok(part) => part
     };
-    let solution: i64 = solve(part).expect("part{part} not implemented");
+    let solution: i64 = solve(part, read_input, &mut log_time).expect("part{part} not implemented");
     println!("{solution}");
 }
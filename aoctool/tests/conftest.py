@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from aoctool.drivers import AoCBuilder, get_driver
+from aoctool.drivers._base import DEFAULT_VARIANT
+from aoctool.puzzle import Puzzle
+from aoctool.utils import DEFAULT_INPUT_MODE, InputMode, Part
+
+
+# bodies of the parse and part1 functions of a Python solution which sums the lines of its input (part 2 is left unimplemented)
+SUM_SOLUTION = ('return [int(line) for line in input_data.split()]', 'return sum(value)')
+
+# input data for the summing solution (whose part 1 answer is 6)
+SUM_INPUT_DATA = '1\n2\n3\n'
+
+
+@dataclass
+class MockPuzzle(Puzzle):
+    year: int
+    day: int
+    tmpdir: Path
+
+    def __post_init__(self) -> None:
+        with open(self.input_data_path, 'w') as f:
+            f.write(self.input_data)
+        with open(self.prose0_path, 'w') as f:
+            f.write(self.prose0)
+
+    @property
+    def input_data_path(self) -> Path:
+        return self.tmpdir / 'input_data.txt'
+
+    @property
+    def prose0_path(self) -> Path:
+        return self.tmpdir / 'prose0.txt'
+
+    @property
+    def input_data(self) -> str:
+        return 'input_data'
+
+    @property
+    def prose0(self) -> str:
+        return 'prose0'
+
+    @property
+    def current_part(self) -> Part:
+        return 1
+
+
+def make_builder(tmpdir, language: str = 'python', variant: str = DEFAULT_VARIANT, input_mode: InputMode = DEFAULT_INPUT_MODE, input_data: Optional[str] = SUM_INPUT_DATA, puzzle: Optional[Puzzle] = None) -> AoCBuilder:
+    """Scaffolds a solution to a puzzle (by default, a mock puzzle for day 1), and writes its input data (unless it is None)."""
+    puzzle = puzzle or MockPuzzle(2023, 1, tmpdir)
+    builder = AoCBuilder(get_driver(language, variant), puzzle, Path(tmpdir))
+    builder.do_scaffold(input_mode = input_mode)
+    if (input_data is not None):
+        builder.input_data_path.write_text(input_data)
+    return builder
+
+def fill_python_solution(builder: AoCBuilder, bodies: tuple[str, ...]) -> None:
+    """Fills in the bodies of the functions of a scaffolded Python solution (parse, part1, part2, in order), which initially return None."""
+    src = builder.src_path.read_text()
+    for body in bodies:
+        src = src.replace('return None', body, 1)
+    builder.src_path.write_text(src)
+
+def make_python_builder(tmpdir, bodies: tuple[str, ...] = SUM_SOLUTION, **kwargs) -> AoCBuilder:
+    """Scaffolds a Python solution with the given function bodies (by default, summing the lines of the input in part 1).
+    Extra keyword arguments are passed to make_builder."""
+    builder = make_builder(tmpdir, **kwargs)
+    fill_python_solution(builder, bodies)
+    return builder
+
+
+@pytest.fixture
+def solved_python_builder(tmpdir) -> AoCBuilder:
+    """Builder for a Python solution to a mock puzzle, which sums the lines of its input (1, 2, 3) in part 1."""
+    return make_python_builder(tmpdir)
@@ -0,0 +1,40 @@
+from dataclasses import replace
+import os
+
+import pytest
+
+from aoctool.benchmark import BenchmarkConfig, format_metric
+from aoctool.tests.conftest import SUM_SOLUTION, fill_python_solution, make_builder
+
+
+def test_format_metric():
+    assert format_metric('max_rss', 3 * (1 << 20)) == '3.0 MiB'
+    assert format_metric('total', 2.5) == '2.500 s'
+    assert format_metric('timings.part1', 0.0042) == '4.200 ms'
+    assert format_metric('user_time', 5e-6) == '5.000 µs'
+    assert format_metric('minor_faults', 12) == '12'
+
+def test_benchmark(tmpdir):
+    builder = make_builder(tmpdir)
+    builder.do_compile()
+    # runs of an unfinished solution fail
+    with pytest.raises(RuntimeError, match = 'Run of part 1 failed'):
+        builder.do_benchmark(part = 1, config = BenchmarkConfig(warmup = 0))
+    fill_python_solution(builder, SUM_SOLUTION)
+    # target is unattainable, so the maximum number of runs is made
+    config = BenchmarkConfig(warmup = 1, min_runs = 3, max_runs = 4, max_time = 60, target_ci = 0.0, affinity = [max(os.sched_getaffinity(0))])
+    result = builder.do_benchmark(part = 1, config = config, tag = 'bench')
+    assert result.solution == 6
+    assert result.num_runs == 4
+    assert not result.converged
+    assert {'timings.read', 'timings.parse', 'timings.part1', 'resources.wall_time', 'total'}.issubset(result.summaries)
+    total = result.summaries['total']
+    assert total.minimum <= total.ci_low <= total.median <= total.ci_high
+    # only measured runs are recorded, with a common session
+    records = builder.history.get_records(2023, 1, 'python', 'release', 1, tag = 'bench')
+    assert records == result.records
+    assert len({record.session for record in records}) == 1
+    # target is easily attained, so the minimum number of runs is made
+    result = builder.do_benchmark(part = 1, config = replace(config, warmup = 0, target_ci = float('inf')))
+    assert result.num_runs == 3
+    assert result.converged
@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import time
+
+from aocd.exceptions import AocdError
+from aocd.models import User
+import pytest
+
+from aoctool.cache import AnswerCache, BuildCache, CachedAnswer, PuzzleState, PuzzleStateCache, get_puzzle_state_key, hash_file, hash_files
+from aoctool.puzzle import Puzzle
+
+
+def test_hash_files(tmpdir):
+    root = Path(tmpdir)
+    (root / 'a').mkdir()
+    (root / 'b').mkdir()
+    for subdir in ['a', 'b']:
+        (root / subdir / 'main.rs').write_text('fn main() {}')
+    # hash depends only on relative paths and contents
+    key_a = hash_files([root / 'a' / 'main.rs'], root / 'a', extra = ['--release'])
+    key_b = hash_files([root / 'b' / 'main.rs'], root / 'b', extra = ['--release'])
+    assert key_a == key_b
+    assert hash_files([root / 'a' / 'main.rs'], root / 'a') != key_a
+    (root / 'b' / 'main.rs').write_text('fn main() { }')
+    assert hash_files([root / 'b' / 'main.rs'], root / 'b', extra = ['--release']) != key_a
+
+def test_build_cache(tmpdir):
+    root = Path(tmpdir)
+    cache = BuildCache(root / 'cache')
+    exec_path = root / 'exec'
+    exec_path.write_bytes(b'binary')
+    exec_path.chmod(0o755)
+    assert cache.get_artifact_path('key1') is None
+    assert not cache.restore('key1', root / 'restored')
+    artifact_path = cache.put('key1', exec_path)
+    assert artifact_path.name == hash_file(exec_path)
+    # identical artifacts are stored only once
+    assert cache.put('key2', exec_path) == artifact_path
+    assert len(list(cache.artifact_dir.iterdir())) == 1
+    dest_path = root / 'build' / 'restored'
+    assert cache.restore('key2', dest_path)
+    assert dest_path.read_bytes() == b'binary'
+    assert dest_path.stat().st_mode & 0o777 == 0o755
+
+def test_answer_cache(tmpdir):
+    cache = AnswerCache(Path(tmpdir) / 'answers')
+    assert cache.get('key') is None
+    cache.put('key', CachedAnswer(42, 1.5))
+    assert cache.get('key') == CachedAnswer(42, 1.5)
+    # corrupt entries are ignored
+    (cache.cache_dir / 'bad.json').write_text('{')
+    assert cache.get('bad') is None
+
+def test_puzzle_state_cache(tmpdir):
+    cache = PuzzleStateCache(Path(tmpdir) / 'state.json')
+    key = get_puzzle_state_key('token', 2023, 1)
+    assert 'token' not in key
+    assert key != get_puzzle_state_key('token2', 2023, 1)
+    assert cache.get(key) is None
+    state = PuzzleState({}, time.time())
+    cache.put(key, state)
+    cache.put('other', PuzzleState({'1': '7'}, 0.0))
+    assert cache.get(key) == state
+    assert state.current_part == 1
+    assert state.is_fresh()
+    assert not state.is_fresh(ttl = 0.0)
+    # answered first part never expires
+    assert cache.get('other').current_part == 2
+    assert cache.get('other').is_fresh(ttl = 0.0)
+    # corrupt file is ignored
+    cache.path.write_text('{')
+    assert cache.get(key) is None
+
+def test_puzzle_state_cache_concurrent_puts(tmpdir):
+    cache = PuzzleStateCache(Path(tmpdir) / 'state.json')
+    keys = [f'key{i}' for i in range(50)]
+    with ThreadPoolExecutor(max_workers = 8) as pool:
+        list(pool.map(lambda key: cache.put(key, PuzzleState({}, 0.0)), keys))
+    # no update is lost, and no temporary files are left behind
+    assert all(cache.get(key) is not None for key in keys)
+    assert sorted(path.name for path in Path(tmpdir).iterdir()) == ['state.json', 'state.json.lock']
+
+
+class OfflinePuzzle(Puzzle):
+    """Puzzle whose answers are stored in a local directory, and whose checks against the AoC server are counted (or fail, if offline)."""
+
+    def __init__(self, year: int, day: int, answer_dir: Path) -> None:
+        self.year = year
+        self.day = day
+        self._user = User('token')
+        self.answer_a_path = answer_dir / f'{day:02d}a_answer.txt'
+        self.answer_b_path = answer_dir / f'{day:02d}b_answer.txt'
+        self.num_fetches = 0
+        self.offline = False
+
+    @property
+    def answered_a(self) -> bool:
+        self.num_fetches += 1
+        if self.offline:
+            raise AocdError('offline')
+        return self.answer_a_path.is_file()
+
+def test_puzzle_current_part(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+    puzzle = OfflinePuzzle(2023, 1, Path(tmpdir))
+    assert puzzle.current_part == 1
+    assert puzzle.num_fetches == 1
+    # fresh state is used without checking the server
+    assert puzzle.current_part == 1
+    assert puzzle.num_fetches == 1
+    # part 1 answered (e.g. on the website): expired state is refreshed
+    puzzle.answer_a_path.write_text('42\n')
+    puzzle.state_ttl = 0.0
+    assert puzzle.current_part == 2
+    assert puzzle.num_fetches == 2
+    assert puzzle.current_part == 2
+    assert puzzle.num_fetches == 2
+    # expired state is used if the server cannot be reached
+    other = OfflinePuzzle(2023, 2, Path(tmpdir))
+    other.save_state()
+    other.state_ttl = 0.0
+    other.offline = True
+    assert other.current_part == 1
+    # no cached state
+    other = OfflinePuzzle(2023, 3, Path(tmpdir))
+    other.offline = True
+    with pytest.raises(AocdError, match = 'offline'):
+        _ = other.current_part
+
+def test_cached_answers(solved_python_builder, tmpdir, capsys, monkeypatch):
+    builder = solved_python_builder
+    builder.do_compile()
+    builder.do_run(part = 1)
+    assert capsys.readouterr().out.strip() == '6'
+    # the cached answer is used, without running the executable
+    builder.do_run(part = 1)
+    (out, err) = capsys.readouterr()
+    assert out == '6\n'
+    assert 'Using cached solution' in err
+    assert 'Running executable' not in err
+    # answers are cached separately for each part
+    assert builder.get_cached_answer(2) is None
+    # cache is bypassed with use_cache = False, or when profiling
+    builder.do_run(part = 1, use_cache = False)
+    assert 'Running executable' in capsys.readouterr().err
+    builder.do_run(part = 1, profile = True)
+    assert 'Running executable' in capsys.readouterr().err
+    # the answer is recomputed when the input data or source changes
+    builder.input_data_path.write_text('1\n2\n3\n4\n')
+    assert builder.get_cached_answer(1) is None
+    builder.do_run(part = 1)
+    assert capsys.readouterr().out.strip() == '10'
+    assert builder.get_cached_answer(1).solution == 10
+    builder.src_path.write_text(builder.src_path.read_text() + '\n')
+    assert builder.get_cached_answer(1) is None
+    # overriding the input path also changes the key
+    other_input_path = Path(tmpdir) / 'other_input.txt'
+    other_input_path.write_text('1\n2\n3\n4\n')
+    key = builder.get_answer_key(1)
+    monkeypatch.setenv('AOC_INPUT_PATH', str(other_input_path))
+    assert builder.get_answer_key(1) == key
+    other_input_path.write_text('5')
+    assert builder.get_answer_key(1) != key
@@ -1,46 +1,25 @@
-from dataclasses import dataclass
+import csv
+from dataclasses import dataclass, replace
+import json
 from operator import itemgetter
 from pathlib import Path
 
+from aocd.examples import Example
 import pytest
+import toml
 
+from aoctool.benchmark import BenchmarkConfig, BenchmarkResult, get_benchmark_metrics, summarize_metrics
+from aoctool.commands.bench import compare_languages, compare_metrics, select_baseline
 from aoctool.commands.download import DataDownloader
+from aoctool.commands.profile import find_profile_jobs, write_diagnostics
+from aoctool.commands.scaffold import scaffold_all
+from aoctool.commands.test import Check, get_checks, get_examples, run_checks
 from aoctool.drivers import DRIVERS, AoCBuilder
-from aoctool.utils import Part, Puzzle
+from aoctool.history import RunHistory, RunRecord
+from aoctool.tests.conftest import SUM_SOLUTION, MockPuzzle, make_python_builder
+from aoctool.utils import Part
 
 
-@dataclass
-class MockPuzzle(Puzzle):
-    year: int
-    day: int
-    tmpdir: Path
-
-    def __post_init__(self) -> None:
-        with open(self.input_data_path, 'w') as f:
-            f.write(self.input_data)
-        with open(self.prose0_path, 'w') as f:
-            f.write(self.prose0)
-
-    @property
-    def input_data_path(self) -> Path:
-        return self.tmpdir / 'input_data.txt'
-
-    @property
-    def prose0_path(self) -> Path:
-        return self.tmpdir / 'prose0.txt'
-
-    @property
-    def input_data(self) -> str:
-        return 'input_data'
-
-    @property
-    def prose0(self) -> str:
-        return 'prose0'
-
-    @property
-    def current_part(self) -> Part:
-        return 1
-
 def test_download(tmpdir, capsys):
     puzzle = MockPuzzle(2023, 1, tmpdir)
     downloader = DataDownloader(puzzle, Path(tmpdir))
@@ -127,6 +106,15 @@ def test_builder(params, tmpdir, capsys):
     else:
         assert ('No compilation required' in err)
     assert builder.exec_path.exists()
+    if driver.is_compiled:
+        # compiling again is a no-op, since nothing changed
+        builder.do_compile()
+        assert 'is up to date' in capsys.readouterr().err
+        # executable can be restored from the build cache
+        builder.exec_path.unlink()
+        builder.do_compile()
+        assert 'restored executable' in capsys.readouterr().err
+        assert builder.exec_path.exists()
 
     # test running
     builder.do_run(part = 1)
@@ -143,4 +131,169 @@ def test_builder(params, tmpdir, capsys):
     result = capsys.readouterr()
     assert '❌' in result.out
     assert params['not_implemented_err'] in result.err
+    # time to read the input was logged before failing
+    assert 'AOC_TIME read ' in result.err
     # TODO: simulate filling in implementations for successful run (use regex replacements?)
+
+def test_scaffold_all(tmpdir):
+    output_dir = Path(tmpdir)
+    builders = [AoCBuilder(DRIVERS[language], MockPuzzle(2023, day, tmpdir), output_dir) for day in range(1, 4) for language in ['python', 'rust']]
+    assert scaffold_all(builders[::2], max_workers = 4) == []
+    assert scaffold_all(builders[1::2], shared = True, max_workers = 4) == []
+    for builder in builders:
+        assert builder.src_path.exists()
+    # all Rust scaffolds were registered with the shared workspace
+    manifest = toml.load(output_dir / '2023' / 'Cargo.toml')
+    assert manifest['workspace']['members'] == [f'{day:02d}/rust' for day in range(1, 4)]
+    # existing scaffolds are not overwritten, but the others are still created
+    builders.append(AoCBuilder(DRIVERS['rust'], MockPuzzle(2023, 4, tmpdir), output_dir))
+    failed = scaffold_all(builders, max_workers = 4)
+    assert failed == builders[:-1]
+    assert builders[-1].src_path.exists()
+
+def test_find_profile_jobs(tmpdir):
+    output_dir = Path(tmpdir)
+    for (year, day, language) in [(2022, 1, 'python'), (2022, 1, 'rust'), (2023, 5, 'haskell'), (2023, 6, 'python')]:
+        (output_dir / str(year) / f'{day:02d}' / language).mkdir(parents = True)
+    # non-puzzle directories are ignored
+    (output_dir / 'misc').mkdir()
+    (output_dir / '2023' / '05' / 'other').mkdir()
+    jobs = find_profile_jobs(output_dir)
+    assert [tuple(job) for job in jobs] == [(2022, 1, 'python'), (2022, 1, 'rust'), (2023, 5, 'haskell'), (2023, 6, 'python')]
+    jobs = find_profile_jobs(output_dir, years = [2023])
+    assert [tuple(job) for job in jobs] == [(2023, 5, 'haskell'), (2023, 6, 'python')]
+    jobs = find_profile_jobs(output_dir, days = [1, 6], languages = ['python'])
+    assert [tuple(job) for job in jobs] == [(2022, 1, 'python'), (2023, 6, 'python')]
+
+@pytest.mark.parametrize('suffix', ['.json', '.csv'])
+def test_write_diagnostics(suffix, tmpdir):
+    rows = [
+        {'year': 2023, 'day': 1, 'language': 'python', 'part': 1, 'solution': 42, 'run_info': {'time': 0.5}},
+        {'year': 2023, 'day': 1, 'language': 'rust', 'part': 1, 'error': 'RuntimeError: Failed to compile'},
+    ]
+    path = Path(tmpdir) / f'diagnostics{suffix}'
+    write_diagnostics(rows, path)
+    with open(path) as f:
+        if (suffix == '.json'):
+            assert json.load(f) == rows
+        else:
+            csv_rows = list(csv.DictReader(f))
+            assert csv_rows[0]['run_info.time'] == '0.5'
+            assert csv_rows[0]['error'] == ''
+            assert csv_rows[1]['error'] == 'RuntimeError: Failed to compile'
+
+def make_run_record(session, part1_time, tag = None, git_revision = None):
+    run_info = {'timings': {'read': 0.001, 'part1': part1_time}, 'resources': {'wall_time': part1_time + 0.01, 'max_rss': 1 << 20}, 'limit_exceeded': None}
+    return RunRecord(session, 0.0, 2023, 1, 'python', 'release', 1, tag, 'abc', 'Python 3', git_revision, {}, 42, 0, run_info)
+
+def test_run_history(tmpdir):
+    history = RunHistory(Path(tmpdir) / 'history.sqlite')
+    assert history.get_records(2023, 1, 'python', 'release', 1) == []
+    records = [make_run_record('s1', 1.0, tag = 'v1'), make_run_record('s2', 2.0)]
+    for record in records:
+        history.add(record)
+    history.add(replace(make_run_record('s3', 3.0), returncode = 1, solution = None))
+    # failed runs are excluded
+    assert history.get_records(2023, 1, 'python', 'release', 1) == records
+    assert history.get_records(2023, 1, 'python', 'release', 1, tag = 'v1') == records[:1]
+    assert history.get_records(2023, 1, 'python', 'release', 2) == []
+    assert records[0].metrics == {'timings.read': 0.001, 'timings.part1': 1.0, 'resources.wall_time': 1.01, 'resources.max_rss': float(1 << 20)}
+
+def test_bench_comparison(tmpdir):
+    baseline = [make_run_record('s1', 1.0 + 0.01 * i, tag = 'v1', git_revision = 'abcdef') for i in range(8)]
+    fast = [make_run_record('s2', 1.0 + 0.01 * i) for i in range(8)]
+    slow = [make_run_record('s3', 1.5 + 0.01 * i) for i in range(8)]
+    records = baseline + fast + slow
+    assert select_baseline(records, 'last', 's3', Path(tmpdir)) == fast
+    assert select_baseline(records, 'last', 's1', Path(tmpdir)) == slow
+    assert select_baseline(records, 'tag:v1', 's3', Path(tmpdir)) == baseline
+    assert select_baseline(records, 'rev:abc', 's3', Path(tmpdir)) == baseline
+    assert select_baseline(records[:8], 'last', 's1', Path(tmpdir)) == []
+    # single profiled runs are passed over for the last session with enough runs, or else pooled
+    singles = [make_run_record(f'r{i}', 1.0) for i in range(6)]
+    assert select_baseline(records + singles, 'last', 's4', Path(tmpdir)) == slow
+    assert select_baseline(singles, 'last', 's4', Path(tmpdir)) == singles[1:]
+    assert select_baseline(singles, 'last', 's4', Path(tmpdir), min_runs = 1) == singles[-1:]
+    # runs on other hosts are excluded
+    host = {'hostname': 'here'}
+    other_host = [replace(record, host = {'hostname': 'there'}) for record in slow]
+    assert select_baseline(fast + other_host, 'last', 's4', Path(tmpdir), host = host) == []
+    assert select_baseline(fast + other_host, 'last', 's4', Path(tmpdir), host = {}) == fast
+    with pytest.raises(ValueError, match = 'Invalid baseline'):
+        select_baseline(records, 'yesterday', 's3', Path(tmpdir))
+    comparisons = {comp.metric: comp for comp in compare_metrics(baseline, slow, ['timings.*', 'resources.max_rss'])}
+    assert set(comparisons) == {'timings.read', 'timings.part1', 'resources.max_rss'}
+    assert comparisons['timings.part1'].regression
+    assert comparisons['timings.part1'].change == pytest.approx(0.483, abs = 0.001)
+    assert not comparisons['timings.read'].regression
+    assert not any(comp.regression for comp in compare_metrics(baseline, fast, ['timings.*']))
+
+def test_compare_languages():
+    results = {}
+    for (language, part1_time) in [('rust', 0.1), ('python', 1.0)]:
+        records = [replace(make_run_record('s1', part1_time + 0.001 * i), language = language) for i in range(8)]
+        summaries = summarize_metrics([get_benchmark_metrics(record.run_info) for record in records], BenchmarkConfig())
+        results[language] = BenchmarkResult(1, 42, records, summaries, True)
+    assert get_benchmark_metrics(results['rust'].records[0].run_info) == {'timings.read': 0.001, 'timings.part1': 0.1, 'resources.wall_time': 0.11, 'total': 0.101}
+    comparisons = {comp.metric: comp for comp in compare_languages(results, ['timings.read', 'timings.part1', 'total'])}
+    assert {comp.language for comp in comparisons.values()} == {'python'}
+    assert comparisons['timings.read'].ratio == 1.0
+    assert comparisons['timings.read'].p_value == 1.0
+    assert comparisons['timings.part1'].ratio == pytest.approx(1.0035 / 0.1035)
+    assert comparisons['total'].p_value < 0.01
+
+
+@dataclass
+class ExamplePuzzle(MockPuzzle):
+    part: Part = 1
+    num_fetches: int = 0
+
+    @property
+    def current_part(self) -> Part:
+        return self.part
+
+    @property
+    def examples(self) -> list[Example]:
+        self.num_fetches += 1
+        examples = [Example('1\n2\n3\n', '6', None), Example('10\n', '10', None)]
+        if (self.part == 2):
+            examples[1] = Example('10\n', '10', '100')
+        return examples
+
+def test_get_examples(tmpdir):
+    puzzle = ExamplePuzzle(2023, 1, tmpdir)
+    examples_dir = Path(tmpdir) / 'examples'
+    examples = get_examples(puzzle, examples_dir)
+    assert [example.name for example in examples] == ['example1', 'example2']
+    assert examples[0].input_path.read_text() == '1\n2\n3\n'
+    assert [example.answers for example in examples] == [('6', None), ('10', None)]
+    # examples are cached
+    assert get_examples(puzzle, examples_dir) == examples
+    assert puzzle.num_fetches == 1
+    # examples are fetched again once part 2 is unlocked
+    puzzle.part = 2
+    examples = get_examples(puzzle, examples_dir)
+    assert puzzle.num_fetches == 2
+    assert examples[1].answers == ('10', '100')
+    checks = get_checks(['python', 'rust'], examples, [1, 2], {'1': '42'})
+    assert [(check.language, check.input_name, check.part, check.expected) for check in checks] == [
+        ('python', 'example1', 1, '6'), ('rust', 'example1', 1, '6'),
+        ('python', 'example2', 1, '10'), ('rust', 'example2', 1, '10'),
+        ('python', 'example2', 2, '100'), ('rust', 'example2', 2, '100'),
+        ('python', 'input', 1, '42'), ('rust', 'input', 1, '42'),
+        ('python', 'input', 2, None), ('rust', 'input', 2, None),
+    ]
+
+def test_run_checks(tmpdir):
+    puzzle = ExamplePuzzle(2023, 1, tmpdir, part = 2)
+    builder = make_python_builder(tmpdir, (*SUM_SOLUTION, 'return sum(x * x for x in value)'), input_data = '4\n5\n', puzzle = puzzle)
+    builders = {'python': builder, 'rust': AoCBuilder(DRIVERS['rust'], puzzle, Path(tmpdir))}
+    examples = get_examples(puzzle, builder.puzzle_dir / 'examples')
+    checks = get_checks(['python'], examples, [1, 2], {'1': '9', '2': '40'})
+    # rust is not scaffolded, so it fails to compile
+    checks.append(Check('rust', 'input', None, 1, '9'))
+    results = run_checks(builders, checks, max_workers = 4)
+    assert [res.check for res in results] == checks
+    assert [(res.status, res.solution) for res in results] == [('pass', 6), ('pass', 10), ('pass', 100), ('pass', 9), ('fail', 41), ('error', None)]
+    assert all(res.solve_time > 0 for res in results[:-1])
+    assert 'compilation failed' in results[-1].error
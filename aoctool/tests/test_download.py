@@ -0,0 +1,139 @@
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import threading
+import time
+
+import pytest
+
+from aoctool.commands.download import DOWNLOAD_METADATA_FILENAME, USER_AGENT, BulkDownloader, TokenBucket, puzzle_is_unlocked, run
+
+
+TOKEN = 'a' * 128
+ETAG = '"v1"'
+ARTICLE = '<article class="day-desc">...</article>'
+# year for which the server sends malformed responses
+MALFORMED_YEAR = 2016
+
+
+class FakeAoCHandler(BaseHTTPRequestHandler):
+    """Stand-in for the Advent of Code website, serving inputs and descriptions for any puzzle."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    requests: list[tuple[str, dict[str, str]]] = []
+    num_parts = 1
+
+    def do_GET(self):
+        type(self).requests.append((self.path, dict(self.headers)))
+        if self.path.startswith(f'/{MALFORMED_YEAR}/'):
+            self.wfile.write(b'garbage\r\n\r\n')
+            self.close_connection = True
+        elif (self.headers.get('Cookie') != f'session={TOKEN}'):
+            self._respond(400, b'')
+        elif self.path.endswith('/input'):
+            self._respond(200, f'input for {self.path}\n'.encode(), {'ETag': ETAG})
+        elif (self.headers.get('If-None-Match') == ETAG) and (type(self).num_parts == 1):
+            self._respond(304, b'')
+        else:
+            body = ('<main>' + ARTICLE * type(self).num_parts + '</main>').encode()
+            self._respond(200, body, {'ETag': ETAG})
+
+    def _respond(self, status, body, headers = None):
+        self.send_response(status)
+        for (key, val) in (headers or {}).items():
+            self.send_header(key, val)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FakeAoCHandler.requests = []
+    FakeAoCHandler.num_parts = 1
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), FakeAoCHandler)
+    thread = threading.Thread(target = httpd.serve_forever, daemon = True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_downloader(base_url, output_dir, token = TOKEN):
+    return BulkDownloader(token, output_dir, base_url = base_url, max_workers = 4, rate = 1000.0, burst = 100)
+
+def test_bulk_download(server, tmpdir):
+    output_dir = Path(tmpdir)
+    puzzles = [(2022, day) for day in range(1, 6)]
+    results = make_downloader(server, output_dir).download(puzzles)
+    assert all(result == {'input': 'downloaded', 'description': 'downloaded'} for result in results.values())
+    assert len(FakeAoCHandler.requests) == 10
+    assert all(headers['User-Agent'] == USER_AGENT for (_, headers) in FakeAoCHandler.requests)
+    puzzle_dir = output_dir / '2022' / '03'
+    assert (puzzle_dir / 'input.txt').read_text() == 'input for /2022/day/3/input\n'
+    assert (puzzle_dir / 'description.part1.html').exists()
+    metadata = json.loads((puzzle_dir / DOWNLOAD_METADATA_FILENAME).read_text())
+    assert metadata['input.txt']['etag'] == ETAG
+    # second download: inputs are skipped based on their hashes, descriptions are revalidated
+    FakeAoCHandler.requests = []
+    results = make_downloader(server, output_dir).download(puzzles)
+    assert all(result == {'input': 'unchanged', 'description': 'unchanged'} for result in results.values())
+    assert [path for (path, _) in FakeAoCHandler.requests if path.endswith('/input')] == []
+    assert all(headers['If-None-Match'] == ETAG for (_, headers) in FakeAoCHandler.requests)
+    # a modified input file is downloaded again
+    (puzzle_dir / 'input.txt').write_text('garbage')
+    results = make_downloader(server, output_dir).download([(2022, 3)])
+    assert results[(2022, 3)]['input'] == 'downloaded'
+    assert (puzzle_dir / 'input.txt').read_text() == 'input for /2022/day/3/input\n'
+    # once part 1 is solved, the description is saved under part 2
+    FakeAoCHandler.num_parts = 2
+    results = make_downloader(server, output_dir).download([(2022, 3)])
+    assert results[(2022, 3)]['description'] == 'downloaded'
+    assert (puzzle_dir / 'description.part2.html').read_text().count(ARTICLE) == 2
+
+def test_bulk_download_failure(server, tmpdir):
+    results = make_downloader(server, Path(tmpdir), token = 'b' * 128).download([(2022, 1)])
+    assert results[(2022, 1)] == {'input': 'failed', 'description': 'failed'}
+    assert not (Path(tmpdir) / '2022' / '01' / 'input.txt').exists()
+
+def test_bulk_download_malformed_response(server, tmpdir):
+    downloader = make_downloader(server, Path(tmpdir))
+    results = downloader.download([(2022, 1), (MALFORMED_YEAR, 1), (2022, 2)])
+    # the failure is recorded for the puzzle, without aborting the others
+    assert results[(MALFORMED_YEAR, 1)] == {'input': 'failed', 'description': 'failed'}
+    assert results[(2022, 1)] == results[(2022, 2)] == {'input': 'downloaded', 'description': 'downloaded'}
+    # the failed connections are not returned to the pool
+    (resp, _) = downloader.pool.request('/2022/day/1', {'Cookie': f'session={TOKEN}'})
+    assert resp.status == 200
+
+def test_bulk_download_corrupt_metadata(server, tmpdir):
+    output_dir = Path(tmpdir)
+    make_downloader(server, output_dir).download([(2022, 1), (2022, 2)])
+    metadata_path = output_dir / '2022' / '01' / DOWNLOAD_METADATA_FILENAME
+    metadata_path.write_text('{"input.txt": ')
+    # the corrupt metadata is treated as empty, without aborting the other puzzles
+    results = make_downloader(server, output_dir).download([(2022, 1), (2022, 2)])
+    assert all('failed' not in result.values() for result in results.values())
+    assert json.loads(metadata_path.read_text())['input.txt']['etag'] == ETAG
+
+def test_download_locked(tmpdir, capsys):
+    args = Namespace(year = [9999], day = [25], session = None, output_dir = Path(tmpdir), jobs = 4, rate = 1.0)
+    run(args)
+    assert 'No puzzles have been released' in capsys.readouterr().err
+    assert not (Path(tmpdir) / '9999').exists()
+
+def test_token_bucket():
+    bucket = TokenBucket(rate = 100.0, burst = 2)
+    t0 = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    # the burst is free, but the remaining 3 requests must wait for tokens to accumulate
+    assert time.monotonic() - t0 >= 0.029
+
+def test_puzzle_is_unlocked():
+    assert puzzle_is_unlocked(2015, 1)
+    assert not puzzle_is_unlocked(9999, 25)
@@ -0,0 +1,320 @@
+from dataclasses import replace
+import fcntl
+import json
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+import toml
+
+from aoctool.drivers import DRIVERS, AoCBuilder, get_driver
+from aoctool.drivers._base import BatchJob
+from aoctool.drivers.haskell import parse_prof_report
+from aoctool.drivers.python import COMPILE_CMDS, LOADER_SCRIPT_PATH, PYTHON_ENV_FILENAME, get_manifest_requirements, poetry_constraint_to_pep440
+from aoctool.tests.conftest import MockPuzzle, fill_python_solution, make_builder, make_python_builder
+
+
+@pytest.mark.parametrize('language', list(DRIVERS))
+def test_parse_timings(language):
+    driver = DRIVERS[language]
+    stderr = 'debug output\nAOC_TIME read 1500\nAOC_TIME parse 2000000\nAOC_TIME part1 3000000000\n'
+    run_info = driver.parse_run_info(stderr)
+    assert run_info['timings'] == {'read': 1.5e-6, 'parse': 0.002, 'part1': 3.0}
+    assert driver.parse_run_info('no timings here')['timings'] == {}
+
+def test_rust_workspace(tmpdir):
+    driver = DRIVERS['rust']
+    output_dir = Path(tmpdir)
+    season_dir = output_dir / '2023'
+    # first day is scaffolded before the workspace exists
+    builders = [AoCBuilder(driver, MockPuzzle(2023, day, tmpdir), output_dir) for day in (1, 2, 3)]
+    builders[0].do_scaffold()
+    assert driver.get_workspace_dir(builders[0].scaffold_dir) is None
+    builders[1].do_scaffold(shared = True)
+    builders[2].do_scaffold()
+    manifest = toml.load(season_dir / 'Cargo.toml')
+    assert manifest['workspace']['members'] == ['01/rust', '02/rust', '03/rust']
+    for builder in builders[:2]:
+        assert driver.get_workspace_dir(builder.scaffold_dir) == season_dir
+        assert builder.exec_path == season_dir / 'target' / 'release' / builder.puzzle.name
+        builder.do_compile()
+        assert builder.exec_path.exists()
+    assert not (builders[0].build_dir / 'release').exists()
+
+RTS_STATS_OUTPUT = '''\
+AOC_TIME read 1000
+          55,768 bytes allocated in the heap
+           3,272 bytes copied during GC
+          44,328 bytes maximum residency (1 sample(s))
+          25,304 bytes maximum slop
+               6 MiB total memory in use (0 MB lost due to fragmentation)
+
+                                     Tot time (elapsed)  Avg pause  Max pause
+  Gen  0         3 colls,     0 par    0.002s   0.002s     0.0000s    0.0000s
+  Gen  1         1 colls,     0 par    0.001s   0.001s     0.0003s    0.0003s
+
+  INIT    time    0.000s  (  0.000s elapsed)
+  MUT     time    0.125s  (  0.130s elapsed)
+  GC      time    0.003s  (  0.003s elapsed)
+  EXIT    time    0.000s  (  0.000s elapsed)
+  Total   time    0.128s  (  0.133s elapsed)
+'''
+
+def test_haskell_rts_stats():
+    driver = DRIVERS['haskell']
+    assert driver.get_run_args(Path('exec')) == ['exec', '+RTS', '-s', '-RTS']
+    run_info = driver.parse_run_info(RTS_STATS_OUTPUT)
+    assert run_info['timings'] == {'read': 1e-6}
+    assert run_info['rts'] == {
+        'bytes_allocated': 55768,
+        'bytes_copied': 3272,
+        'max_residency': 44328,
+        'gc_count': 4,
+        'mutator_time': 0.125,
+        'mutator_elapsed': 0.13,
+        'gc_time': 0.003,
+        'gc_elapsed': 0.003,
+        'total_time': 0.128,
+        'total_elapsed': 0.133,
+    }
+
+def test_variants(tmpdir):
+    with pytest.raises(ValueError, match = 'Invalid build variant'):
+        get_driver('rust', 'O2')
+    driver = get_driver('haskell', 'threaded')
+    assert driver.get_build_flags() == ['--ghc-options=-rtsopts -O2 -threaded']
+    assert driver.get_run_args(Path('exec')) == ['exec', '+RTS', '-s', '-N', '-RTS']
+    assert driver.get_build_key(Path(tmpdir)) != DRIVERS['haskell'].get_build_key(Path(tmpdir))
+    # non-default variants are built in a subdirectory
+    builder = AoCBuilder(driver, MockPuzzle(2023, 1, tmpdir), Path(tmpdir))
+    assert builder.build_dir == Path(tmpdir) / '2023' / '01' / 'haskell' / 'build' / 'threaded'
+    assert builder.exec_path == builder.build_dir / 'aoc202301'
+
+def test_cabal_project(tmpdir):
+    driver = DRIVERS['haskell']
+    season_dir = Path(tmpdir)
+    scaffold_dir = season_dir / '01' / 'haskell'
+    scaffold_dir.mkdir(parents = True)
+    assert driver.get_project_dir(scaffold_dir) is None
+    driver.make_shared_project(season_dir)
+    assert (season_dir / 'cabal.project').read_text() == 'packages: */haskell/*.cabal\n'
+    assert driver.get_project_dir(scaffold_dir) == season_dir
+    assert season_dir / 'cabal.project' in driver.get_build_inputs(scaffold_dir)
+
+# solution code (summing the integers in the input) for each language and input type
+SUM_SOLUTIONS = {
+    ('python', 'str'): 'int(n) for n in input_data.split()',
+    ('python', 'bytes'): 'int(n) for n in input_data.split()',
+    ('python', 'memoryview'): 'int(n) for n in bytes(input_data).split()',
+    ('rust', '&str'): 'input_data.split_whitespace().map(|n| n.parse::<i64>().unwrap())',
+    ('rust', '&[u8]'): 'std::str::from_utf8(input_data).unwrap().split_whitespace().map(|n| n.parse::<i64>().unwrap())',
+}
+
+def fill_sum_solution(builder, input_mode):
+    """Fills in a scaffold's solution: part 1 sums the integers in the input (part 2 is left unimplemented)."""
+    language = builder.driver.language
+    src = builder.src_path.read_text()
+    input_type = builder.driver.input_types[input_mode]
+    assert f'input_data: {input_type}' in src
+    solution = SUM_SOLUTIONS[(language, input_type)]
+    if (language == 'python'):
+        fill_python_solution(builder, (f'return sum({solution})', 'return value'))
+    else:
+        src = src.replace('type Value = ();', 'type Value = i64;').replace('None', f'Some({solution}.sum())', 1).replace('None', 'Some(value)', 1)
+        builder.src_path.write_text(src)
+
+@pytest.mark.parametrize(['language', 'input_mode'], [
+    ('python', 'path'),
+    ('python', 'stdin'),
+    ('python', 'fd'),
+    ('python', 'mmap'),
+    ('rust', 'path'),
+    ('rust', 'stdin'),
+    ('rust', 'fd'),
+])
+def test_input_modes(language, input_mode, tmpdir, monkeypatch):
+    builder = make_builder(tmpdir, language, input_mode = input_mode)
+    assert builder.input_mode == input_mode
+    fill_sum_solution(builder, input_mode)
+    builder.do_compile()
+    assert builder._get_run_result(part = 1, profile = True).solution == 6
+    # profiled runs are recorded in the history
+    builder.do_run(part = 1, profile = True)
+    [record] = builder.history.get_records(2023, 1, language, 'release', 1)
+    assert record.solution == 6
+    assert 'timings.read' in record.metrics
+    if (input_mode in ['path', 'mmap']):
+        # input path can be overridden by an environment variable
+        other_input_path = Path(tmpdir) / 'other_input.txt'
+        other_input_path.write_text('10 20')
+        monkeypatch.setenv('AOC_INPUT_PATH', str(other_input_path))
+        assert builder._get_run_result(part = 1, profile = True).solution == 30
+
+@pytest.mark.parametrize(['language', 'input_mode'], [
+    ('python', 'path'),
+    ('python', 'stdin'),
+    ('python', 'mmap'),
+    ('rust', 'path'),
+    ('rust', 'stdin'),
+])
+def test_batch(language, input_mode, tmpdir, capsys):
+    builder = make_builder(tmpdir, language, input_mode = input_mode)
+    assert builder.supports_batch
+    other_input_path = Path(tmpdir) / 'other_input.txt'
+    other_input_path.write_text('10 20')
+    fill_sum_solution(builder, input_mode)
+    builder.do_compile()
+    jobs = [
+        BatchJob(1),
+        BatchJob(1, input_path = other_input_path),
+        # failed jobs do not prevent the following jobs from running
+        BatchJob(2),
+        BatchJob(1, input_data = b'1 x'),
+        BatchJob(1, input_data = b'100\n200\n'),
+    ]
+    expected = [(6, True), (30, True), (None, False), (None, False), (300, True)]
+    capsys.readouterr()
+    results = builder.run_jobs(jobs)
+    assert 'on a batch of 5 jobs' in capsys.readouterr().err
+    assert [(res.solution, res.returncode == 0) for res in results] == expected
+    assert set(builder.get_run_info(results[0])['timings']) == {'read', 'parse', 'part1'}
+    assert 'part2 not implemented' in results[2].stderr
+    assert set(builder.get_run_info(results[2])['timings']) == {'read', 'parse', 'part2'}
+    assert set(builder.get_run_info(results[3])['timings']) == {'read'}
+    # scaffolds without batch support run each job in its own process
+    builder.scaffold_config_path.write_text(json.dumps({'input_mode': input_mode}))
+    assert not builder.supports_batch
+    results = builder.run_jobs(jobs)
+    assert 'on a batch of' not in capsys.readouterr().err
+    assert [(res.solution, res.returncode == 0) for res in results] == expected
+
+PROF_REPORT = '''\
+\tSat Dec 02 12:00 2023 Time and Allocation Profiling Report  (Final)
+
+\t   aoc202301 +RTS -s -p -po/tmp/profile_cpu -RTS 1
+
+\ttotal time  =        0.20 secs   (200 ticks @ 1000 us, 1 processor)
+\ttotal alloc = 1,234,567 bytes  (excludes profiling overheads)
+
+COST CENTRE MODULE    SRC                          %time %alloc
+
+part1       Aoc202301 Aoc202301.hs:(20,1)-(21,30)   75.0   10.0
+parse       Aoc202301 Aoc202301.hs:15:1-30          25.0   89.0
+
+
+                                                                              individual      inherited
+COST CENTRE  MODULE           SRC                         no.     entries  %time %alloc   %time %alloc
+
+MAIN         MAIN             <built-in>                  124          0    0.0    0.1   100.0  100.0
+ CAF         GHC.IO.Encoding  <entire-module>             200          0    0.0    0.0     0.0    0.0
+ main        Main             Main.hs:(30,1)-(40,20)      249          0    0.0    0.9   100.0   99.9
+  part1      Aoc202301        Aoc202301.hs:(20,1)-(21,30) 260          1   75.0   10.0    75.0   10.0
+  parse      Aoc202301        <no location info>          261          1   25.0   89.0    25.0   89.0
+'''
+
+def test_parse_prof_report():
+    (summary, stacks) = parse_prof_report(PROF_REPORT)
+    assert summary['total_time'] == 0.2
+    assert summary['total_alloc'] == 1234567
+    assert [row['function'] for row in summary['top']] == ['Aoc202301.part1', 'Aoc202301.parse']
+    assert summary['top'][0]['source'] == 'Aoc202301.hs:(20,1)-(21,30)'
+    assert summary['top'][0]['self_time'] == pytest.approx(0.15)
+    assert stacks['MAIN.MAIN;Main.main;Aoc202301.part1'] == pytest.approx(150_000)
+    assert stacks['MAIN.MAIN;Main.main;Aoc202301.parse'] == pytest.approx(50_000)
+    assert stacks['MAIN.MAIN;GHC.IO.Encoding.CAF'] == 0.0
+
+# stand-in for an ahead-of-time compiler, which "compiles" a module by copying it to a file with a platform-specific extension suffix
+FAKE_COMPILE_CMD = ['-c', 'import shutil, sys; shutil.copy(sys.argv[1], sys.argv[1].replace(".py", ".cpython-311-test.so"))']
+
+def test_python_backends(tmpdir, monkeypatch):
+    driver = get_driver('python', 'mypyc')
+    assert driver.is_compiled
+    assert not DRIVERS['python'].is_compiled
+    assert driver.parse_run_info('AOC_TIME parse 1000\n') == {'timings': {'parse': 1e-6}, 'backend': 'mypyc'}
+    assert DRIVERS['python'].parse_run_info('')['backend'] == 'cpython'
+    # the solution module is compiled to an extension module in the build directory
+    builder = make_python_builder(tmpdir, variant = 'mypyc')
+    assert builder.exec_path == builder.scaffold_dir / 'build' / 'mypyc' / 'aoc202301.so'
+    monkeypatch.setitem(COMPILE_CMDS, 'mypyc', FAKE_COMPILE_CMD)
+    builder.do_compile()
+    assert builder.exec_path.read_text() == builder.src_path.read_text()
+    assert sorted(path.name for path in builder.build_dir.iterdir()) == ['.build_key', 'aoc202301.so']
+    python_path = str(driver.get_python_path(builder.scaffold_dir))
+    # toolchain versions are those of the scaffold's environment
+    assert driver.get_toolchain_version_cmds(builder.scaffold_dir) == [[python_path, '--version'], [python_path, '-m', 'mypy', '--version']]
+    assert driver.get_run_args(builder.exec_path) == [python_path, str(LOADER_SCRIPT_PATH), str(builder.exec_path), str(builder.scaffold_dir / 'main.py')]
+    # a failed build raises an error, rather than leaving the previous extension module in place
+    monkeypatch.setitem(COMPILE_CMDS, 'mypyc', ['-c', 'import sys; sys.exit(1)'])
+    with pytest.raises(RuntimeError, match = 'exit code 1'):
+        builder.do_compile(use_cache = False)
+    assert not builder.exec_path.exists()
+    with pytest.raises(ValueError, match = 'requires the default build variant'):
+        driver.get_profile_run_args(builder.exec_path, 'cpu', Path('/tmp/profile_cpu'))
+    # PyPy runs the source directly, in a virtualenv with the scaffold's dependencies (here, created by CPython in place of PyPy)
+    driver = get_driver('python', 'pypy')
+    monkeypatch.setattr('aoctool.drivers.python.PYPY_CMD', sys.executable)
+    pypy_builder = replace(builder, driver = driver)
+    pypy_builder.do_compile()
+    venv_python = builder.scaffold_dir / '.venv-pypy' / 'bin' / 'python'
+    assert driver.get_run_args(builder.scaffold_dir / 'main.py') == [str(venv_python), str(builder.scaffold_dir / 'main.py')]
+    assert json.loads((venv_python.parents[1] / 'aoctool_sync.json').read_text())['requirements'] == []
+    assert pypy_builder._get_run_result(part = 1).solution == 6
+    monkeypatch.setattr('shutil.which', lambda cmd: None)
+    with pytest.raises(RuntimeError, match = 'requires PyPy'):
+        replace(builder, driver = driver).do_compile()
+
+@pytest.mark.parametrize(['constraint', 'spec'], [
+    ('^1.2.3', '>=1.2.3,<2'),
+    ('^0.2', '>=0.2,<0.3'),
+    ('~1.2', '>=1.2,<1.3'),
+    ('1.2', '==1.2'),
+    ('*', ''),
+    ('>= 1.0, < 3', '>=1.0,<3'),
+])
+def test_poetry_constraint(constraint, spec):
+    assert poetry_constraint_to_pep440(constraint) == spec
+
+def test_python_env(solved_python_builder):
+    builder = solved_python_builder
+    driver = builder.driver
+    manifest_path = builder.scaffold_dir / 'pyproject.toml'
+    manifest = toml.loads(manifest_path.read_text())
+    manifest['project']['dependencies'] = ['numpy>=1.26']
+    manifest.setdefault('tool', {}).setdefault('poetry', {})['dependencies'] = {'python': '^3.11', 'networkx': {'version': '^3.2'}}
+    manifest_path.write_text(toml.dumps(manifest))
+    assert get_manifest_requirements(manifest_path) == ['numpy>=1.26', 'networkx>=3.2,<4']
+    # the interpreter is resolved once, then cached until the manifest changes
+    manifest_path.write_text(toml.dumps({'project': {'name': 'aoc202301', 'version': '0.1.0'}}))
+    python_path = driver.get_python_path(builder.scaffold_dir)
+    assert python_path.exists()
+    cache_path = builder.scaffold_dir / PYTHON_ENV_FILENAME
+    cache_path.write_text(json.dumps({**json.loads(cache_path.read_text()), 'python': __file__}))
+    assert driver.get_python_path(builder.scaffold_dir) == Path(__file__)
+    manifest_path.write_text(manifest_path.read_text() + '\n')
+    assert driver.get_python_path(builder.scaffold_dir) == python_path
+
+def test_shared_python_env(tmpdir):
+    driver = DRIVERS['python']
+    builders = [make_python_builder(tmpdir), AoCBuilder(driver, MockPuzzle(2023, 2, tmpdir), Path(tmpdir))]
+    assert driver.get_shared_env_dir(builders[0].scaffold_dir) is None
+    builders[1].do_scaffold(shared = True)
+    venv_dir = builders[1].scaffold_dir.parent.parent / '.venv'
+    for builder in builders:
+        # every day in the season now runs in the shared virtualenv
+        assert driver.get_shared_env_dir(builder.scaffold_dir) == venv_dir
+        assert driver.get_python_path(builder.scaffold_dir) == venv_dir / 'bin' / 'python'
+    assert json.loads((venv_dir / 'aoctool_sync.json').read_text())['requirements'] == []
+    # syncing waits for the lock file, which another process may hold while installing
+    (venv_dir / 'aoctool_sync.json').unlink()
+    with open(venv_dir / 'aoctool_sync.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        thread = threading.Thread(target = driver.sync_shared_env, args = (venv_dir,))
+        thread.start()
+        thread.join(timeout = 0.5)
+        assert thread.is_alive()
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        thread.join()
+    assert (venv_dir / 'aoctool_sync.json').exists()
+    builders[0].do_compile()
+    assert builders[0]._get_run_result(part = 1).solution == 6
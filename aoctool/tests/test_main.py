@@ -0,0 +1,65 @@
+import subprocess
+import sys
+
+import pytest
+
+from aoctool.main import COMMANDS, get_module_for_command
+
+
+# third-party libraries which are slow to import, and should only be imported when needed
+HEAVY_MODULES = ['aocd', 'jinja2', 'subprocess_tee', 'toml']
+
+# imports everything a real 'aoctool run' does before it computes the solution (i.e. all but the driver's work)
+RUN_IMPORTS_SCRIPT = """
+from aoctool.main import get_module_for_command
+import aoctool.puzzle
+from aoctool.drivers import get_driver
+get_module_for_command('run')
+get_driver('python')
+"""
+
+CHECK_IMPORTS_SCRIPT = """
+import sys
+from aoctool.main import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print(' '.join(sorted(sys.modules)))
+"""
+
+
+def get_imported_modules(args):
+    proc = subprocess.run([sys.executable, '-c', CHECK_IMPORTS_SCRIPT, *args], capture_output = True, text = True, check = True)
+    return set(proc.stdout.splitlines()[-1].split())
+
+def test_commands():
+    for (name, command) in COMMANDS.items():
+        mod = get_module_for_command(name)
+        assert mod.__name__ == command.module
+        assert callable(mod.configure_parser)
+        assert callable(mod.run)
+        assert mod.__doc__
+
+@pytest.mark.parametrize('args', [['--help'], ['run', '--help'], ['compile', '--help'], ['scaffold', '--help']])
+def test_lazy_imports(args):
+    modules = get_imported_modules(args)
+    for name in HEAVY_MODULES:
+        assert name not in modules
+    # only the selected command is imported
+    commands = {mod.removeprefix('aoctool.commands.') for mod in modules if mod.startswith('aoctool.commands.')}
+    assert commands == set(args[:1]) - {'--help'}
+    if (args == ['--help']):
+        # no driver is loaded (nor the run history, which needs sqlite3)
+        assert not any(mod.startswith('aoctool.drivers') for mod in modules)
+        assert 'sqlite3' not in modules
+
+def test_run_imports():
+    script = RUN_IMPORTS_SCRIPT + "import sys; print(' '.join(sorted(sys.modules)))"
+    proc = subprocess.run([sys.executable, '-c', script], capture_output = True, text = True, check = True)
+    modules = set(proc.stdout.split())
+    # aocd is needed to look up the puzzle, but the others are not needed to run a solution
+    for name in set(HEAVY_MODULES) - {'aocd'}:
+        assert name not in modules
+    assert {mod for mod in modules if mod.startswith('aoctool.commands.')} == {'aoctool.commands.run'}
+    assert {mod for mod in modules if mod.startswith('aoctool.drivers.')} == {'aoctool.drivers._base', 'aoctool.drivers.python'}
@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from aoctool.drivers import DRIVERS, AoCBuilder, get_driver
+from aoctool.profiling import parse_perf_script, summarize_perf_stacks
+from aoctool.tests.conftest import MockPuzzle, make_builder
+
+
+PROFILED_SOLUTION = '''
+def slow_square(x):
+    return sum(x for _ in range(x))
+
+def parse(input_data):
+    return [int(line) for line in input_data.split()]
+
+def part1(value):
+    return sum(slow_square(x) for x in value)
+
+def part2(value):
+    return None
+'''
+
+@pytest.mark.parametrize('profiler', ['cpu', 'mem'])
+def test_python_profiler(profiler, tmpdir):
+    builder = make_builder(tmpdir, input_data = '\n'.join(map(str, range(1000, 1300))))
+    builder.src_path.write_text(PROFILED_SOLUTION)
+    builder.do_compile()
+    builder.do_run(part = 1, profiler = profiler)
+    with open(builder.run_info_path) as f:
+        run_info = json.load(f)
+    summary = run_info['profile']
+    assert summary['profiler'] == profiler
+    assert {'parse', 'part1'}.issubset(run_info['timings'])
+    prefix = builder.get_profile_prefix(profiler)
+    # summary is moved into the run info
+    assert not prefix.with_suffix('.json').exists()
+    collapsed = Path(summary['collapsed']).read_text().splitlines()
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in collapsed)
+    if (profiler == 'cpu'):
+        assert Path(summary['pstats']).exists()
+        # the hot helper has the most self time
+        assert summary['top'][0]['function'].startswith('<genexpr>') or summary['top'][0]['function'].startswith('slow_square')
+        assert any(line.startswith('part1;part1 (') and ';slow_square (' in line for line in collapsed)
+    else:
+        assert set(summary['phases']) == {'parse', 'part1'}
+        # the parsed list is retained at the end of the parse phase
+        assert summary['phases']['parse']['retained'] > 300 * 28
+        assert all(line.startswith(('parse;', 'part1;')) for line in collapsed)
+
+PERF_SCRIPT_OUTPUT = '''\
+\t    55d4c3a1b2c3 aoc202301::part1+0x23 (/data/aoc202301)
+\t    55d4c3a1b000 aoc202301::main+0x10 (/data/aoc202301)
+\t    7f0000001000 __libc_start_main+0xf3 (/usr/lib/libc.so.6)
+
+\t    55d4c3a1b2c8 aoc202301::part1+0x28 (/data/aoc202301)
+\t    55d4c3a1b000 aoc202301::main+0x10 (/data/aoc202301)
+\t    7f0000001000 __libc_start_main+0xf3 (/usr/lib/libc.so.6)
+
+\t    7f0000002000 [unknown] (/usr/lib/libc.so.6)
+\t    55d4c3a1b000 aoc202301::main+0x10 (/data/aoc202301)
+'''
+
+def test_parse_perf_script():
+    stacks = parse_perf_script(PERF_SCRIPT_OUTPUT)
+    assert stacks == {('__libc_start_main', 'aoc202301::main', 'aoc202301::part1'): 2, ('aoc202301::main', '[libc.so.6]'): 1}
+    top = summarize_perf_stacks(stacks)
+    assert [row['function'] for row in top] == ['aoc202301::part1', '[libc.so.6]']
+    assert top[0]['self_fraction'] == pytest.approx(2 / 3)
+
+def test_profile_variants(tmpdir, monkeypatch):
+    # Rust profile builds keep debug symbols and frame pointers, and have their own target directory
+    driver = get_driver('rust', 'profile')
+    assert driver.get_build_flags()[0] == '--release'
+    assert 'profile.release.debug=true' in driver.get_build_flags()
+    builder = AoCBuilder(driver, MockPuzzle(2023, 1, tmpdir), Path(tmpdir))
+    assert builder.exec_path == builder.scaffold_dir / 'build' / 'profile' / 'release' / 'aoc202301'
+    builder.do_setup_shared_project()
+    assert builder.exec_path == Path(tmpdir) / '2023' / 'target-profile' / 'release' / 'aoc202301'
+    assert AoCBuilder(DRIVERS['rust'], MockPuzzle(2023, 1, tmpdir), Path(tmpdir)).exec_path == Path(tmpdir) / '2023' / 'target' / 'release' / 'aoc202301'
+    # runs are profiled with perf, if it is available
+    monkeypatch.setattr('aoctool.drivers.rust.perf_is_available', lambda: True)
+    args = driver.get_profile_run_args(Path('exec'), 'cpu', Path('/tmp/profile_cpu'))
+    assert args[:2] == ['perf', 'record']
+    assert args[-2:] == ['--', 'exec']
+    monkeypatch.setattr('aoctool.drivers.rust.perf_is_available', lambda: False)
+    with pytest.raises(RuntimeError, match = 'requires perf'):
+        driver.get_profile_run_args(Path('exec'), 'cpu', Path('/tmp/profile_cpu'))
+    # Haskell profile builds have cost centres
+    driver = get_driver('haskell', 'profile')
+    assert driver.get_build_flags() == ['--enable-profiling', '--ghc-options=-rtsopts -fprof-auto']
+    assert driver.get_profile_run_args(Path('exec'), 'cpu', Path('/tmp/profile_cpu')) == ['exec', '+RTS', '-s', '-p', '-po/tmp/profile_cpu', '-RTS']
+    with pytest.raises(ValueError, match = 'requires the profile build variant'):
+        DRIVERS['haskell'].get_profile_run_args(Path('exec'), 'cpu', Path('/tmp/profile_cpu'))
+    with pytest.raises(NotImplementedError, match = 'mem profiler is not supported for haskell'):
+        driver.get_profile_run_args(Path('exec'), 'mem', Path('/tmp/profile_mem'))
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+import os
+from pathlib import Path
+import resource
+import signal
+import sys
+
+from aoctool.runner import CaptureOptions, OutputCapture, ResourceLimits, run_process
+
+
+def test_run_process(capsys):
+    code = 'import sys; x = bytearray(50_000_000); print(len(x)); print("err", file = sys.stderr); sys.exit(3)'
+    result = run_process([sys.executable, '-c', code])
+    assert result.returncode == 3
+    assert result.stdout == '50000000\n'
+    assert result.stderr == 'err\n'
+    assert result.resources.max_rss > 50_000_000
+    assert result.resources.wall_time > 0
+    assert result.resources.user_time + result.resources.system_time > 0
+    # output is not echoed unless tee = True
+    assert capsys.readouterr() == ('', '')
+    result = run_process([sys.executable, '-c', code], tee = True)
+    assert capsys.readouterr() == ('50000000\n', 'err\n')
+
+def test_timeout():
+    # the grandchild process is also killed
+    code = 'import subprocess, sys; subprocess.run([sys.executable, "-c", "import time; time.sleep(30)"])'
+    result = run_process([sys.executable, '-c', code], limits = ResourceLimits(timeout = 0.5))
+    assert result.limit_exceeded == 'timeout'
+    assert result.returncode == -signal.SIGKILL
+    assert 0.5 <= result.resources.wall_time < 10
+
+def test_max_memory():
+    code = 'x = bytearray(500_000_000); print(len(x))'
+    result = run_process([sys.executable, '-c', code], limits = ResourceLimits(max_memory = 200 * (1 << 20)))
+    assert result.returncode != 0
+    assert result.limit_exceeded == 'memory'
+    assert 'MemoryError' in result.stderr
+    # limit is not exceeded
+    result = run_process([sys.executable, '-c', code], limits = ResourceLimits(max_memory = 2 * (1 << 30)))
+    assert result.returncode == 0
+    assert result.limit_exceeded is None
+
+def test_cpus():
+    code = 'import os; print(len(os.sched_getaffinity(0)))'
+    result = run_process([sys.executable, '-c', code], limits = ResourceLimits(cpus = 1))
+    assert result.stdout.strip() == '1'
+
+def test_affinity():
+    cpu = max(os.sched_getaffinity(0))
+    code = 'import os; print(sorted(os.sched_getaffinity(0)))'
+    result = run_process([sys.executable, '-c', code], limits = ResourceLimits(affinity = [cpu]))
+    assert result.stdout.strip() == f'[{cpu}]'
+
+def test_limits_from_threads():
+    # limits are applied from the parent, so runs with limits can be made concurrently from several threads
+    code = 'import resource; print(resource.getrlimit(resource.RLIMIT_DATA)[0])'
+    limits = ResourceLimits(max_memory = 1 << 30, timeout = 30)
+    with ThreadPoolExecutor(max_workers = 4) as pool:
+        results = list(pool.map(lambda _: run_process([sys.executable, '-c', code], limits = limits), range(8)))
+    for result in results:
+        assert result.returncode == 0
+        # with a cgroup, the rlimit is left unset
+        assert result.stdout.strip() in [str(1 << 30), str(resource.RLIM_INFINITY)]
+
+def test_output_capture(tmpdir):
+    log_path = Path(tmpdir) / 'out.gz'
+    capture = OutputCapture(max_size = 100, keep_prefixes = ('KEEP ',), log_path = log_path)
+    lines = [f'KEEP {i}\n' if (i % 50 == 0) else f'line {i}\n' for i in range(1000)]
+    for i in range(0, len(lines), 7):
+        capture.write(''.join(lines[i:i + 7]))
+    capture.write('last')
+    capture.close()
+    text = capture.text
+    assert text.startswith(f'[... {capture.num_dropped:,} characters omitted (full output saved to {log_path}) ...]\n')
+    # dropped lines with the prefix are kept, along with the end of the stream
+    assert [line for line in text.splitlines()[1:] if line.startswith('KEEP')] == [f'KEEP {i}' for i in range(0, 1000, 50)]
+    assert text.endswith('line 998\nline 999\nlast')
+    assert len(text) < 500
+    with gzip.open(log_path, 'rt') as f:
+        assert f.read() == ''.join(lines) + 'last'
+    # short output is kept in full, and not logged
+    capture = OutputCapture(max_size = 100, log_path = Path(tmpdir) / 'short.gz')
+    capture.write('a\nb')
+    capture.close()
+    assert capture.text == 'a\nb'
+    assert not (Path(tmpdir) / 'short.gz').exists()
+
+def test_echo_rate():
+    echo = io.StringIO()
+    capture = OutputCapture(echo = echo, echo_rate = 10)
+    for _ in range(5):
+        capture.write('abcdef\n')
+    capture.close()
+    assert echo.getvalue() == 'abcdef\nabc\n[... 25 characters not shown ...]\n'
+    assert capture.text == 'abcdef\n' * 5
+
+def test_bounded_output():
+    code = 'import sys\nprint("AOC_TIME parse 5", file = sys.stderr)\nfor i in range(200_000): print(f"debug {i}"); print(i, file = sys.stderr)\nprint(42)'
+    result = run_process([sys.executable, '-c', code], capture = CaptureOptions(max_size = 10_000, keep_stderr = ('AOC_TIME ',)))
+    assert result.returncode == 0
+    assert len(result.stdout) < 100_000
+    assert result.stdout.endswith('debug 199999\n42\n')
+    # the timing line is kept, though it was printed first
+    assert result.stderr.splitlines()[1] == 'AOC_TIME parse 5'
+    assert result.stderr.endswith('199999\n')
@@ -0,0 +1,70 @@
+import math
+from pathlib import Path
+
+import pytest
+
+from aoctool.commands.scale import measure_scaling
+from aoctool.scaling import fit_complexity, get_generator, replicate_grid, replicate_lines
+from aoctool.tests.conftest import make_python_builder
+
+
+def test_replicate_lines():
+    data = 'a\nb\nc\nd\n'
+    assert replicate_lines(data, 1) == data
+    assert replicate_lines(data, 0.5) == 'a\nb\n'
+    assert replicate_lines(data, 2.5) == 'a\nb\nc\nd\n' * 2 + 'a\nb\n'
+    # at least one line is kept
+    assert replicate_lines(data, 0.01) == 'a\n'
+    with pytest.raises(ValueError, match = 'empty'):
+        replicate_lines('', 2)
+
+def test_replicate_grid():
+    data = 'ab\ncd\n'
+    assert replicate_grid(data, 1) == data
+    assert replicate_grid(data, 4) == 'abab\ncdcd\nabab\ncdcd\n'
+    assert replicate_grid(data, 0.25) == 'a\n'
+    with pytest.raises(ValueError, match = 'rectangular'):
+        replicate_grid('ab\nc\n', 2)
+
+def test_get_generator(tmpdir):
+    puzzle_dir = Path(tmpdir)
+    assert get_generator(None, puzzle_dir) is replicate_lines
+    assert get_generator('grid', puzzle_dir) is replicate_grid
+    # custom generator in the puzzle directory is the default
+    (puzzle_dir / 'scale.py').write_text('def generate(input_data, factor):\n    return str(int(input_data) * factor)\n')
+    assert get_generator(None, puzzle_dir)('3', 2) == '6'
+    path = puzzle_dir / 'bad.py'
+    path.write_text('x = 1\n')
+    with pytest.raises(ValueError, match = 'does not define a generate function'):
+        get_generator(str(path), puzzle_dir)
+
+@pytest.mark.parametrize(['func', 'exponent', 'complexity'], [
+    (lambda n: 5.0, 0.0, 'O(1)'),
+    (lambda n: 1e-6 * n, 1.0, 'O(n)'),
+    (lambda n: 1e-6 * n * math.log(n), None, 'O(n log n)'),
+    (lambda n: 1e-9 * n ** 2, 2.0, 'O(n^2)'),
+])
+def test_fit_complexity(func, exponent, complexity):
+    sizes = [1000 * 2 ** i for i in range(6)]
+    fit = fit_complexity(sizes, [func(n) for n in sizes])
+    assert fit.complexity == complexity
+    if (exponent is not None):
+        assert fit.exponent == pytest.approx(exponent)
+        assert fit.r_squared == pytest.approx(1.0)
+        assert fit.predict(100_000) == pytest.approx(func(100_000))
+    # noise does not change the class
+    noise = [1.05, 0.95, 1.02, 0.98, 1.03, 0.97]
+    assert fit_complexity(sizes, [func(n) * eps for (n, eps) in zip(sizes, noise)]).complexity == complexity
+    with pytest.raises(ValueError, match = 'greater than 1'):
+        fit_complexity([1, 2, 3], [1.0, 2.0, 3.0])
+
+def test_measure_scaling(tmpdir):
+    builder = make_python_builder(tmpdir, input_data = '1\n2\n3\n4\n')
+    builder.do_compile()
+    points = measure_scaling(builder, 1, replicate_lines, [4, 0.5, 2], repeat = 2)
+    assert [point.factor for point in points] == [0.5, 2, 4]
+    assert [point.size for point in points] == [4, 16, 32]
+    assert (builder.puzzle_dir / 'scale' / 'input_x0.5.txt').read_text() == '1\n2\n'
+    assert all((point.time > 0) and (point.max_rss > 0) for point in points)
+    # larger inputs are skipped once the time limit is exceeded
+    assert len(measure_scaling(builder, 1, replicate_lines, [1, 2, 4], max_time = 0)) == 1
@@ -0,0 +1,53 @@
+from pathlib import Path
+import subprocess
+import sys
+
+from aoctool.drivers import DRIVERS, AoCBuilder
+from aoctool.scheduler import JobServer, compile_all, get_build_groups
+from aoctool.tests.conftest import MockPuzzle
+
+
+# child process which takes a token from the jobserver named in MAKEFLAGS, then returns it
+CLIENT_SCRIPT = """
+import os
+auth = next(flag for flag in os.environ['MAKEFLAGS'].split() if flag.startswith('--jobserver-auth='))
+(read_fd, write_fd) = map(int, auth.split('=')[1].split(','))
+token = os.read(read_fd, 1)
+os.write(write_fd, token)
+print(token.decode())
+"""
+
+
+def test_jobserver():
+    with JobServer(3) as jobserver:
+        assert jobserver.makeflags == f'-j3 --jobserver-auth={jobserver.read_fd},{jobserver.write_fd}'
+        with jobserver.token():
+            with jobserver.extra_tokens(5) as num_extra:
+                # only the free tokens are taken
+                assert num_extra == 2
+                with jobserver.extra_tokens(1) as num_extra2:
+                    assert num_extra2 == 0
+            with jobserver.extra_tokens(1) as num_extra:
+                assert num_extra == 1
+            proc = subprocess.run([sys.executable, '-c', CLIENT_SCRIPT], capture_output = True, text = True, check = True, **jobserver.get_subprocess_kwargs())
+            assert proc.stdout.strip() == '+'
+        # all tokens are returned
+        with jobserver.extra_tokens(5) as num_extra:
+            assert num_extra == 3
+
+def test_compile_all(tmpdir):
+    output_dir = Path(tmpdir)
+    builders = [AoCBuilder(DRIVERS['rust'], MockPuzzle(2023, day, tmpdir), output_dir) for day in (1, 2)]
+    builders[0].do_scaffold()
+    builders[1].do_scaffold(shared = True)
+    builders.append(AoCBuilder(DRIVERS['python'], MockPuzzle(2023, 1, tmpdir), output_dir))
+    builders[2].do_scaffold()
+    # not scaffolded, so compilation fails
+    builders.append(AoCBuilder(DRIVERS['rust'], MockPuzzle(2023, 3, tmpdir), output_dir))
+    # the Rust builds share the workspace's target directory, so they are built one after the other
+    assert get_build_groups(builders) == [[0, 1, 3], [2]]
+    results = compile_all(builders, 2)
+    assert [res.error is None for res in results] == [True, True, True, False]
+    assert 'FileNotFoundError' in results[3].error
+    for builder in builders[:3]:
+        assert builder.exec_path.exists()
@@ -0,0 +1,73 @@
+import pytest
+
+from aoctool.stats import binom_cdf, linear_fit, mann_whitney_u, median_ci, rank, reject_outliers, summarize
+
+
+def test_rank():
+    assert rank([]) == []
+    assert rank([3.0, 1.0, 2.0]) == [3.0, 1.0, 2.0]
+    # ties get the average rank
+    assert rank([5.0, 1.0, 5.0, 5.0]) == [3.0, 1.0, 3.0, 3.0]
+
+def test_linear_fit():
+    fit = linear_fit([1.0, 2.0, 3.0, 4.0], [3.0, 5.0, 7.0, 9.0])
+    assert fit.slope == pytest.approx(2.0)
+    assert fit.intercept == pytest.approx(1.0)
+    assert fit.r_squared == pytest.approx(1.0)
+    fit = linear_fit([1.0, 2.0, 3.0, 4.0], [1.0, 3.0, 2.0, 4.0])
+    assert fit.slope == pytest.approx(0.8)
+    assert fit.r_squared == pytest.approx(0.64)
+    # constant values are fit exactly
+    assert linear_fit([1.0, 2.0], [5.0, 5.0]).r_squared == 1.0
+    with pytest.raises(ValueError, match = 'at least two points'):
+        linear_fit([1.0, 1.0], [1.0, 2.0])
+
+def test_mann_whitney_u():
+    xs = [1.0, 2.0, 3.0, 4.0, 5.0]
+    ys = [6.0, 7.0, 8.0, 9.0, 10.0]
+    (u, p_value) = mann_whitney_u(xs, ys, alternative = 'less')
+    assert u == 0
+    assert p_value == pytest.approx(0.00609, abs = 1e-5)
+    assert mann_whitney_u(ys, xs, alternative = 'greater').p_value == pytest.approx(p_value)
+    assert mann_whitney_u(xs, ys, alternative = 'greater').p_value > 0.99
+    assert mann_whitney_u(xs, ys).p_value == pytest.approx(2 * p_value)
+    # identical samples
+    assert mann_whitney_u([1.0, 1.0], [1.0, 1.0]).p_value == 1.0
+    # interleaved samples
+    assert mann_whitney_u([1.0, 3.0, 5.0], [2.0, 4.0, 6.0]).p_value > 0.5
+    with pytest.raises(ValueError, match = 'non-empty'):
+        mann_whitney_u([], [1.0])
+
+def test_binom_cdf():
+    assert binom_cdf(-1, 10) == 0.0
+    assert binom_cdf(10, 10) == 1.0
+    assert binom_cdf(0, 10) == pytest.approx(1 / 1024)
+    assert binom_cdf(5, 10) == pytest.approx(638 / 1024)
+    # large numbers of trials do not overflow
+    assert binom_cdf(1000, 2000) == pytest.approx(0.5, abs = 0.01)
+
+def test_median_ci():
+    # classic interval from order statistics 2 and 9 (coverage 97.9%)
+    assert median_ci([float(x) for x in range(10, 0, -1)]) == (2.0, 9.0)
+    assert median_ci([float(x) for x in range(1, 101)]) == (40.0, 61.0)
+    # too few values to attain the confidence level
+    assert median_ci([3.0, 1.0, 2.0]) == (1.0, 3.0)
+    with pytest.raises(ValueError, match = 'non-empty'):
+        median_ci([])
+
+def test_reject_outliers():
+    values = [1.0, 1.1, 1.2, 1.0, 1.05, 5.0]
+    assert reject_outliers(values) == values[:-1]
+    assert reject_outliers(values, k = 100) == values
+    # small samples are unchanged
+    assert reject_outliers([1.0, 5.0, 100.0]) == [1.0, 5.0, 100.0]
+
+def test_summarize():
+    summary = summarize([4.0, 1.0, 2.0, 3.0, 100.0])
+    assert summary.n == 5
+    assert summary.minimum == 1.0
+    assert summary.median == 3.0
+    assert summary.mean == 22.0
+    assert (summary.ci_low, summary.ci_high) == (1.0, 100.0)
+    assert summary.rel_ci_half_width == pytest.approx(99 / 6)
+    assert summarize([2.0]).stddev == 0.0
@@ -1,8 +1,9 @@
+from argparse import ArgumentTypeError
 from pathlib import Path
 
 import pytest
 
-from aoctool.utils import command2str, log, write_file
+from aoctool.utils import command2str, log, parse_int_range, parse_languages, parse_size, write_file
 
 
 def test_log(capsys):
@@ -24,3 +25,26 @@ def test_write_file(tmpdir, capsys):
 ])
 def test_command2str(cmd, cmd_str):
     assert command2str(cmd) == cmd_str
+
+@pytest.mark.parametrize(['s', 'vals'], [
+    ('2023', [2023]),
+    ('2015-2017', [2015, 2016, 2017]),
+    ('5,1-3,2', [1, 2, 3, 5]),
+])
+def test_parse_int_range(s, vals):
+    assert parse_int_range(s) == vals
+
+def test_parse_languages():
+    assert parse_languages('all') == ['haskell', 'python', 'rust']
+    assert parse_languages('rust,python') == ['rust', 'python']
+    with pytest.raises(ArgumentTypeError, match = 'invalid language'):
+        parse_languages('python,cobol')
+
+@pytest.mark.parametrize(['s', 'size'], [
+    ('1000', 1000),
+    ('512M', 512 * 1024 * 1024),
+    ('2GB', 2 * 1024 ** 3),
+    ('1.5k', 1536),
+])
+def test_parse_size(s, size):
+    assert parse_size(s) == size
@@ -0,0 +1,30 @@
+def test_python_worker(solved_python_builder, capsys):
+    builder = solved_python_builder
+    driver = builder.driver
+    src = builder.src_path.read_text()
+    assert driver.run_in_worker(builder.scaffold_dir, 1) is None
+    builder.do_start_worker()
+    try:
+        capsys.readouterr()
+        builder.do_run(part = 1)
+        result = capsys.readouterr()
+        assert 'persistent worker' in result.err
+        assert 'AOC_TIME part1 ' in result.err
+        assert result.out.strip() == '6'
+        # profiled runs bypass the worker, so that the resources they record are those of a fresh process
+        builder.do_run(part = 1, profile = True)
+        assert 'persistent worker' not in capsys.readouterr().err
+        [record] = builder.history.get_records(2023, 1, 'python', 'release', 1)
+        assert record.solution == 6
+        # modifying the source causes it to be reloaded
+        builder.src_path.write_text(src.replace('return sum(value)', 'return 10 * sum(value)'))
+        proc = driver.run_in_worker(builder.scaffold_dir, 1)
+        assert proc.returncode == 0
+        assert proc.stdout.strip() == '60'
+        # part 2 is not implemented
+        proc = driver.run_in_worker(builder.scaffold_dir, 2)
+        assert proc.returncode == 1
+    finally:
+        builder.do_stop_worker()
+    assert not driver.get_worker_socket_path(builder.scaffold_dir).exists()
+    assert driver.run_in_worker(builder.scaffold_dir, 1) is None
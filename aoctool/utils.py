@@ -1,14 +1,11 @@
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 from datetime import datetime
 import os
 from pathlib import Path
 import shlex
 import string
 import sys
-from typing import Iterable, Literal
-
-import aocd.models
-from aocd.models import User
+from typing import Any, Iterable, Literal
 
 
 AnyPath = str | Path
@@ -23,6 +20,21 @@ VALID_LANGUAGES = [
     'rust'
 ]
 
+# ways in which a scaffold's main program can receive the input data:
+#   - path: reads the file at a given path
+#   - stdin: reads the file from stdin
+#   - fd: reads the file from an inherited file descriptor
+#   - mmap: maps the file at a given path into memory
+InputMode = Literal['path', 'stdin', 'fd', 'mmap']
+INPUT_MODES: list[InputMode] = ['path', 'stdin', 'fd', 'mmap']
+DEFAULT_INPUT_MODE: InputMode = 'path'
+
+# profilers which a solution can be run under (with run --profile=<profiler>):
+#   - cpu: where time is spent
+#   - mem: where memory is allocated
+Profiler = Literal['cpu', 'mem']
+PROFILERS: list[Profiler] = ['cpu', 'mem']
+
 
 ####################
 # HELPER FUNCTIONS #
@@ -55,32 +67,56 @@ def write_file(text: str, path: AnyPath) -> None:
 def command2str(cmd: Iterable[str]) -> str:
     return ' '.join(map(shlex.quote, cmd))
 
-
-class Puzzle(aocd.models.Puzzle):
-
-    @property
-    def name(self) -> str:
-        return f'aoc{self.year}{self.day:02d}'
-
-    @property
-    def date_string(self) -> str:
-        return f'{self.year}-12-{self.day:02d}'
-
-    @property
-    def current_part(self) -> Part:
-        """Gets the current part of the puzzle.
-        If part 1 is not complete, returns 1.
-        Otherwise, returns 2."""
-        return 2 if self.answered_a else 1
-
-    @classmethod
-    def from_args(cls, args: Namespace) -> 'Puzzle':
-        if (getattr(args, 'session', None) is None):
-            token = get_default_session_cookie()
+def flatten_dict(d: dict[str, Any], prefix: str = '') -> dict[str, Any]:
+    """Flattens a nested dict into a single-level dict whose keys are dot-separated paths (e.g. {'a': {'b': 1}} becomes {'a.b': 1})."""
+    flat: dict[str, Any] = {}
+    for (key, val) in d.items():
+        if isinstance(val, dict):
+            flat.update(flatten_dict(val, prefix = f'{prefix}{key}.'))
+        else:
+            flat[f'{prefix}{key}'] = val
+    return flat
+
+def parse_int_range(s: str) -> list[int]:
+    """Parses a comma-separated list of integers or integer ranges (e.g. '2015-2017,2020') into a sorted list of integers."""
+    vals: set[int] = set()
+    for tok in s.split(','):
+        (start, sep, stop) = tok.strip().partition('-')
+        if sep:
+            vals.update(range(int(start), int(stop) + 1))
         else:
-            token = args.session
-        user = User(token)
-        return cls(args.year, args.day, user = user)
+            vals.add(int(start))
+    return sorted(vals)
+
+def parse_years(s: str) -> list[int]:
+    """Parses a range of years (e.g. '2015-2017,2020', or 'all') into a sorted list of years."""
+    if (s == 'all'):
+        return list(range(START_YEAR, datetime.now().year + 1))
+    return parse_int_range(s)
+
+def parse_days(s: str) -> list[int]:
+    """Parses a range of days (e.g. '1-10,12', or 'all') into a sorted list of days."""
+    if (s == 'all'):
+        return list(range(1, 26))
+    return parse_int_range(s)
+
+def parse_size(s: str) -> int:
+    """Parses a memory size (e.g. '512M', '2G', or a number of bytes) into a number of bytes."""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    s = s.strip().upper().removesuffix('B')
+    if s and (s[-1] in units):
+        return int(float(s[:-1]) * units[s[-1]])
+    return int(s)
+
+def parse_languages(s: str) -> list[str]:
+    """Parses a comma-separated list of languages (or 'all') into a list of valid languages."""
+    if (s == 'all'):
+        return list(VALID_LANGUAGES)
+    languages = [lang.strip() for lang in s.split(',')]
+    for lang in languages:
+        if (lang not in VALID_LANGUAGES):
+            raise ArgumentTypeError(f'invalid language {lang!r} (choose from {", ".join(VALID_LANGUAGES)})')
+    return languages
 
 
 ############
@@ -101,16 +137,32 @@ def configure_language_arg(parser: ArgumentParser) -> None:
 def configure_output_dir_arg(parser: ArgumentParser) -> None:
     parser.add_argument('-o', '--output-dir', type = Path, default = Path('data'), help = 'output root directory')
 
+def configure_variant_arg(parser: ArgumentParser) -> None:
+    parser.add_argument('--variant', default = 'release', help = 'build variant (for Python: release, pypy, mypyc, cython; for Rust: release, profile; for Haskell: release, O2, threaded, profile)')
+
+def configure_limits_args(parser: ArgumentParser) -> None:
+    parser.add_argument('--timeout', type = float, help = 'maximum wall-clock time (seconds) for each run')
+    parser.add_argument('--max-memory', type = parse_size, help = 'maximum memory for each run (e.g. 512M, 2G)')
+    parser.add_argument('--cpus', type = int, help = 'maximum number of CPUs for each run')
+    parser.add_argument('--affinity', type = parse_int_range, metavar = 'CPUS', help = 'CPUs to pin each run to, e.g. 2 or 0-3')
+
 parser_config = {
     'date': configure_date_args,
     'session': configure_session_arg,
     'language': configure_language_arg,
     'output_dir': configure_output_dir_arg,
+    'variant': configure_variant_arg,
+    'limits': configure_limits_args,
 }
 
 def validate_args(args: Namespace) -> None:
     now = datetime.now()
-    if hasattr(args, 'day'):
-        assert (1 <= args.day <= 25), 'day must be in range 1-25'
-    if hasattr(args, 'year'):
-        assert (START_YEAR <= args.year <= now.year), f'year must be in range {START_YEAR}-{now.year}'
+    # date arguments may be a single value, a list of values, or None (no filter)
+    days = getattr(args, 'day', None)
+    if (days is not None):
+        days = days if isinstance(days, list) else [days]
+        assert all((1 <= day <= 25) for day in days), 'day must be in range 1-25'
+    years = getattr(args, 'year', None)
+    if (years is not None):
+        years = years if isinstance(years, list) else [years]
+        assert all((START_YEAR <= year <= now.year) for year in years), f'year must be in range {START_YEAR}-{now.year}'